@@ -9,6 +9,8 @@ if nogui:  # completely disables graphics (avoids importing matplotlib)
     __gui__ = False
     
 elif not display or len(display) == 0:  # if no display env available (e.g. clusters) uses 'Agg' backend to plot
-    import matplotlib
-    matplotlib.use('Agg')
+    if 'matplotlib' in sys.modules:
+        sys.modules['matplotlib'].use('Agg')
+    else:
+        os.environ['MPLBACKEND'] = 'Agg'  # used when matplotlib is imported (avoids importing it here)
 
@@ -51,10 +51,16 @@ from .traces import plotTraces, plotEPSPAmp
 from .lfp import plotLFP
 
 
+# -------------------------------------------------------------------------------------------------------------------
+# Import spectral analysis functions
+# -------------------------------------------------------------------------------------------------------------------
+from .spectral import calculatePSD, calculateSpectrogram, clearSpectralCache
+
+
 # -------------------------------------------------------------------------------------------------------------------
 # Import information theory-related functions
 # -------------------------------------------------------------------------------------------------------------------
-from .info import nTE, granger
+from .info import nTE, nTEMatrix, granger, grangerMatrix
 
 
 # -------------------------------------------------------------------------------------------------------------------
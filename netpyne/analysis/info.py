@@ -44,26 +44,8 @@ def nTE(cells1 = [], cells2 = [], spks1 = None, spks2 = None, timeRange = None,
         - Returns nTE (float): normalized transfer entropy 
     '''
 
-    from neuron import h
-    import netpyne
     from .. import sim
-    import os
-            
-    root = os.path.dirname(netpyne.__file__)
-    
-    if 'nte' not in dir(h): 
-        try: 
-            print(' Warning: support/nte.mod not compiled; attempting to compile from %s via "nrnivmodl support"'%(root))
-            os.system('cd ' + root + '; nrnivmodl support')
-            from neuron import load_mechanisms
-            load_mechanisms(root)
-            print(' Compilation of support folder mod files successful')
-        except:
-            print(' Error compiling support folder mod files')
-            return
 
-    h.load_file(root+'/support/nte.hoc') # nTE code (also requires support/net.mod)
-    
     if not spks1:  # if doesnt contain a list of spk times, obtain from cells specified
         cells, cellGids, netStimPops = getCellsInclude(cells1)
         numNetStims = 0
@@ -122,18 +104,141 @@ def nTE(cells1 = [], cells2 = [], spks1 = None, spks2 = None, timeRange = None,
     else:
         timeRange = [0, max(spks1+spks2)]
 
-    inputVec = h.Vector()
-    outputVec = h.Vector()
     histo1 = np.histogram(spks1, bins = np.arange(timeRange[0], timeRange[1], binSize))
     histoCount1 = histo1[0] 
     histo2 = np.histogram(spks2, bins = np.arange(timeRange[0], timeRange[1], binSize))
     histoCount2 = histo2[0] 
 
-    inputVec.from_python(histoCount1)
-    outputVec.from_python(histoCount2)
-    out = h.normte(inputVec, outputVec, numShuffle)
-    TE, H, nTE, _, _ = out.to_python()
-    return nTE
+    return _nTEBatch(np.array([histoCount1]), histoCount2, numShuffle)[0]
+
+
+# -------------------------------------------------------------------------------------------------------------------
+## Calculate normalized transfer entropy between every pair of cell subsets
+# -------------------------------------------------------------------------------------------------------------------
+@exception
+def nTEMatrix(include = ['eachPop'], timeRange = None, binSize = 20, numShuffle = 30):
+    ''' 
+    Calculate normalized transfer entropy between every pair of cell subsets (eg. populations)
+        - include (['eachPop',|'allCells','allNetStims',|,120,|,'E1'|,('L2', 56)|,('L5',[4,5,6])]): Subsets of cells, one spike train per item (default: ['eachPop'])
+        - timeRange ([min, max]): Range of time to calculate nTE in ms (default: [0,cfg.duration])
+        - binSize (int): Bin size used to convert spike times into histogram 
+        - numShuffle (int): Number of times to shuffle each source spike train to calculate TEshuffled
+
+        - Returns labels (list) and nTE matrix (2D array) where nTE[i][j] is the nTE from labels[i] to labels[j]
+    '''
+
+    # bin spike trains of all subsets once
+    include, histoCounts = _binnedSpikeTrains(include, timeRange, binSize)
+
+    # all sources (and their shuffles) onto each target in a single batched call
+    nTEs = np.zeros((len(include), len(include)))
+    for j in range(len(include)):
+        nTEs[:, j] = _nTEBatch(histoCounts, histoCounts[j], numShuffle)
+
+    return include, nTEs
+
+
+# -------------------------------------------------------------------------------------------------------------------
+## Calculate granger causality between every pair of cell subsets
+# -------------------------------------------------------------------------------------------------------------------
+@exception
+def grangerMatrix(include = ['eachPop'], timeRange = None, binSize = 5, order = 10):
+    ''' 
+    Calculate spectral Granger causality between every pair of cell subsets (eg. populations)
+        - include (['eachPop',|'allCells','allNetStims',|,120,|,'E1'|,('L2', 56)|,('L5',[4,5,6])]): Subsets of cells, one spike train per item (default: ['eachPop'])
+        - timeRange ([min, max]): Range of time to calculate Granger causality in ms (default: [0,cfg.duration])
+        - binSize (int): Bin size used to convert spike times into histogram (default: 5)
+        - order (int): Order of the autoregressive model (default: 10)
+
+        - Returns labels (list), F (list of freqs) and Granger causality matrix (3D array) 
+            where G[i][j] is the causality from labels[i] to labels[j] at each freq
+    '''
+
+    from netpyne.support.bsmart import pairwiseGranger
+
+    include, histoCounts = _binnedSpikeTrains(include, timeRange, binSize)
+
+    # all pairs fitted together in a single batched call
+    fs = int(1000/binSize)
+    F, G, _ = pairwiseGranger(histoCounts, order, fs, int(fs/2))
+
+    return include, F, G
+
+
+# -------------------------------------------------------------------------------------------------------------------
+## Bin the spike trains of each cell subset in include
+# -------------------------------------------------------------------------------------------------------------------
+def _binnedSpikeTrains(include, timeRange, binSize):
+    from .. import sim
+
+    include = list(include)
+    if 'eachPop' in include:
+        include.remove('eachPop')
+        include.extend(list(sim.net.allPops.keys()))
+
+    if timeRange is None:
+        timeRange = [0, sim.cfg.duration]
+
+    bins = np.arange(timeRange[0], timeRange[1], binSize)
+    spkids, spkts = np.array(sim.allSimData['spkid']), np.array(sim.allSimData['spkt'])
+    histoCounts = []
+    for subset in include:
+        cells, cellGids, netStimPops = getCellsInclude([subset])
+        spks = list(spkts[np.isin(spkids, cellGids)]) if len(cellGids) > 0 else []
+        for netStimPop in netStimPops:
+            if 'stims' in sim.allSimData:
+                spks.extend([spkt for cellStim in sim.allSimData['stims'].values() if netStimPop in cellStim for spkt in cellStim[netStimPop]])
+        histoCounts.append(np.histogram(spks, bins = bins)[0])
+
+    return include, np.array(histoCounts)
+
+
+# -------------------------------------------------------------------------------------------------------------------
+## Conditional entropy H(X2F|X2P,X1P) for each row of X1 (vectorized using sparse joint histograms)
+# -------------------------------------------------------------------------------------------------------------------
+def _condEntropyBatch(X1, X2):
+    numRows, sz = X1.shape
+    n1, n2 = X1.max() + 1, X2.max() + 1
+    rows = np.repeat(np.arange(numRows, dtype=np.int64), sz-1)
+    key2 = (rows * n2 + np.tile(X2[:-1], numRows)) * n1 + X1[:, :-1].ravel()  # (row, X2 past, X1 past)
+    key3 = key2 * n2 + np.tile(X2[1:], numRows)  # (row, X2 past, X1 past, X2 future)
+
+    uniq2, counts2 = np.unique(key2, return_counts=True)
+    uniq3, counts3 = np.unique(key3, return_counts=True)
+    counts23 = counts2[np.searchsorted(uniq2, uniq3 // n2)]
+    terms = counts3 * np.log2(counts3 / counts23.astype(float))
+    
+    return -np.bincount(uniq3 // (n2 * n1 * n2), weights=terms, minlength=numRows) / (sz-1)
+
+
+# -------------------------------------------------------------------------------------------------------------------
+## Normalized transfer entropy from each row of X1s onto X2: (TE - TEShuffled)/H(X2F|X2P)
+# -------------------------------------------------------------------------------------------------------------------
+def _nTEBatch(X1s, X2, numShuffle = 30):
+    X1s = np.asarray(X1s, dtype=np.int64)
+    X2 = np.asarray(X2, dtype=np.int64)
+    numSources, sz = X1s.shape
+    if sz < 2 or X2.min() == X2.max():
+        return np.zeros(numSources)
+
+    # H(X2F|X2P) only depends on X2, so computed once
+    pairs = X2[1:] * (X2.max() + 1) + X2[:-1]
+    uniqP, countsP = np.unique(X2[:-1], return_counts=True)
+    uniqFP, countsFP = np.unique(pairs, return_counts=True)
+    countsPast = countsP[np.searchsorted(uniqP, uniqFP % (X2.max() + 1))]
+    norm = -np.sum(countsFP * np.log2(countsFP / countsPast.astype(float))) / (sz-1)
+
+    # unshuffled and shuffled versions of every source train, evaluated together
+    perms = np.argsort(np.random.rand(numSources, numShuffle, sz), axis=2)
+    X1shuffled = X1s[np.arange(numSources)[:, None, None], perms]
+    X1all = np.concatenate((X1s[:, None, :], X1shuffled), axis=1).reshape(-1, sz)
+    TEs = (norm - _condEntropyBatch(X1all, X2)).reshape(numSources, numShuffle+1)
+
+    TE, TEShuffled = TEs[:, 0], TEs[:, 1:].mean(axis=1) if numShuffle > 0 else 0.0
+    nTEs = (TE - TEShuffled) / norm if norm > 0 else np.zeros(numSources)
+    nTEs[X1s.min(axis=1) == X1s.max(axis=1)] = 0.0  # no variation in source
+
+    return nTEs
 
 
 # -------------------------------------------------------------------------------------------------------------------
@@ -243,6 +348,7 @@ def granger(cells1=[], cells2=[], spks1=None, spks2=None, label1='spkTrain1', la
 
     # check reliability
     if testGranger:
+        from netpyne.support.bsmart import grangerPairs
         import scipy
         ''' Option 1: granger causality tests -- not sure how to interpret results
         try:
@@ -254,17 +360,15 @@ def granger(cells1=[], cells2=[], spks1=None, spks2=None, label1='spkTrain1', la
         tests = gt(np.array([histoCount1, histoCount2]).T, maxlag=10)
         '''
 
-        # do N=25 shuffles of histoCount2
+        # do N=50 shuffles of histoCount2, all fitted together in a single batched call
         Nshuffle = 50
         #x2yShuffleMaxValues = []
-        y2xShuffleMaxValues = []
-        histoCount2Shuffled = np.array(histoCount2)
-        for ishuffle in range(Nshuffle):
-            # for each calculate max Granger value (starting at freq index 1) 
-            np.random.shuffle(histoCount2Shuffled)
-            _, _, _, Fx2yShuff, Fy2xShuff, _ = pwcausalr(np.array([histoCount1, histoCount2Shuffled]), 1, len(histoCount1), 10, fs, int(fs / 2))
-            #x2yShuffleMaxValues.append(max(Fx2yShuff[0][1:]))
-            y2xShuffleMaxValues.append(max(Fy2xShuff[0][1:]))
+        histoCount2Shuffled = np.array([np.random.permutation(histoCount2) for ishuffle in range(Nshuffle)])
+        pairsShuffled = np.stack((np.tile(histoCount1, (Nshuffle, 1)), histoCount2Shuffled), axis=1)
+        _, Fx2yShuff, Fy2xShuff, _, _, _ = grangerPairs(pairsShuffled, 1, len(histoCount1), 10, fs, F)
+        # for each calculate max Granger value (starting at freq index 1) 
+        #x2yShuffleMaxValues = np.max(Fx2yShuff[:,1:], axis=1)
+        y2xShuffleMaxValues = np.max(Fy2xShuff[:,1:], axis=1)
 
         # calculate z-score 
         # |z| > 1.65 = p-value < 0.1 = confidence interval 90% 
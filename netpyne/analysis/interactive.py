@@ -16,10 +16,10 @@ from netpyne import __gui__
 
 if __gui__:
     import matplotlib.pyplot as plt
-    from matplotlib import mlab
     from matplotlib_scalebar import scalebar
 from numbers import Number
 from .utils import colorList, exception, getSpktSpkid, _showFigure, _saveFigData, getCellsInclude, syncMeasure, _smooth1d
+from .spectral import calculatePSD, calculateSpectrogram
 
 import numpy as np
 import pandas as pd
@@ -875,12 +875,8 @@ def iplotRatePSD(include = ['allCells', 'eachPop'], timeRange = None, binSize =
         fig = figs[0]
         legendItems = []  
 
-    # Plot separate line for each entry in include
+    # Calculate rate histogram for each entry in include
     for iplot, subset in enumerate(include):
-        if not overlay:
-            figs.append(figure(title=str(subset), tools=TOOLS, x_axis_label="Frequency (HZ)", y_axis_label="Power Spectral Density (db/Hz)"))
-            fig = figs[iplot]
-            
         cells, cellGids, netStimLabels = getCellsInclude([subset])
         numNetStims = 0
 
@@ -916,21 +912,25 @@ def iplotRatePSD(include = ['allCells', 'eachPop'], timeRange = None, binSize =
 
         histData.append(histoCount)
 
-        Fs = 1000.0 / binSize
-        power = mlab.psd(histoCount, Fs=Fs, NFFT=NFFT, detrend=mlab.detrend_none, window=mlab.window_hanning,
-                         noverlap=noverlap, pad_to=None, sides='default', scale_by_freq=None)
+    # calculate PSD of all entries at once
+    Fs = 1000.0 / binSize
+    freqs, allPower = calculatePSD(histData, Fs, transformMethod='fft', NFFT=NFFT, noverlap=noverlap)
 
+    # Plot separate line for each entry in include
+    for iplot, subset in enumerate(include):
+        if not overlay:
+            figs.append(figure(title=str(subset), tools=TOOLS, x_axis_label="Frequency (HZ)", y_axis_label="Power Spectral Density (db/Hz)"))
+            fig = figs[iplot]
+
+        power = allPower[iplot]
         if smooth:
-            signal = _smooth1d(10*np.log10(power[0]), smooth)
+            signal = _smooth1d(10*np.log10(power), smooth)
         else:
-            signal = 10*np.log10(power[0])
-
-        freqs = power[1]
+            signal = 10*np.log10(power)
 
         color = popColorDict[subset] if subset in popColorDict else colors[iplot%len(colors)]
         
         allFreqs.append(freqs)
-        allPower.append(power)
         allSignal.append(signal)
         s = fig.line(freqs[freqs<maxFreq], signal[freqs<maxFreq], line_width = 2.0, color=color)
         if overlay: legendItems.append((subset, [s]))
@@ -1079,6 +1079,10 @@ def iplotLFP(electrodes = ['avg', 'all'], plots = ['timeSeries', 'PSD', 'spectro
     if 'all' in electrodes:
         electrodes.remove('all')
         electrodes.extend(list(range(int(sim.net.recXElectrode.nsites))))
+    invalid = [elec for elec in electrodes if elec != 'avg' and not (isinstance(elec, Number) and 0 <= elec < sim.net.recXElectrode.nsites)]
+    if invalid:
+        print('  Skipping electrodes not recorded: %s' % (invalid))
+        electrodes = [elec for elec in electrodes if elec not in invalid]
 
     figs = {}
     data = {'lfp': lfp}
@@ -1146,27 +1150,25 @@ def iplotLFP(electrodes = ['avg', 'all'], plots = ['timeSeries', 'PSD', 'spectro
         data['allFreqs'] = allFreqs
         data['allSignal'] = allSignal
 
+        # calculate PSD of all electrodes at once
+        Fs = int(1000.0/sim.cfg.recordStep)
+        lfpSignals = [np.mean(lfp, axis=1) if elec == 'avg' else lfp[:, elec] for elec in electrodes]
+        freqs, allPower = calculatePSD(lfpSignals, Fs, transformMethod='fft', NFFT=NFFT, noverlap=noverlap)
+
         for i,elec in enumerate(electrodes):
             p = figure(title="Electrode {}".format(str(elec)), tools=TOOLS, x_axis_label="Frequency (Hz)", y_axis_label="db/Hz")
 
             if elec == 'avg':
-                lfpPlot = np.mean(lfp, axis=1)
                 color = 'black'
                 lw=1.5
             elif isinstance(elec, Number) and elec <= sim.net.recXElectrode.nsites:
-                lfpPlot = lfp[:, elec]
                 color = colors[i%len(colors)]
                 lw=1.5
 
-            Fs = int(1000.0/sim.cfg.recordStep)
-            power = mlab.psd(lfpPlot, Fs=Fs, NFFT=NFFT, detrend=mlab.detrend_none, window=mlab.window_hanning,
-                             noverlap=noverlap, pad_to=None, sides='default', scale_by_freq=None)
-
             if smooth:
-                signal = _smooth1d(10*np.log10(power[0]), smooth)
+                signal = _smooth1d(10*np.log10(allPower[i]), smooth)
             else:
-                signal = 10*np.log10(power[0])
-            freqs = power[1]
+                signal = 10*np.log10(allPower[i])
 
             allFreqs.append(freqs)
             allSignal.append(signal)
@@ -1198,7 +1200,6 @@ def iplotLFP(electrodes = ['avg', 'all'], plots = ['timeSeries', 'PSD', 'spectro
         import matplotlib.cm as cm
         from bokeh.transform import linear_cmap
         from bokeh.models import ColorBar
-        from scipy import signal as spsig
 
         # numCols = np.round(len(electrodes) / maxPlots) + 1
         figs['spectro'] = []
@@ -1206,17 +1207,12 @@ def iplotLFP(electrodes = ['avg', 'all'], plots = ['timeSeries', 'PSD', 'spectro
 
         logx_spec = []
 
-        for i,elec in enumerate(electrodes):
-            if elec == 'avg':
-                lfpPlot = np.mean(lfp, axis=1)
-            elif isinstance(elec, Number) and elec <= sim.net.recXElectrode.nsites:
-                lfpPlot = lfp[:, elec]
-            # creates spectrogram over a range of data
-            # from: http://joelyancey.com/lfp-python-practice/
-            fs = int(1000.0/sim.cfg.recordStep)
-            f, t_spec, x_spec = spsig.spectrogram(lfpPlot, fs=fs, window='hanning',
-                                                  detrend=mlab.detrend_none, nperseg=nperseg, noverlap=noverlap, nfft=NFFT,  mode='psd')
-            x_mesh, y_mesh = np.meshgrid(t_spec*1000.0, f[f<maxFreq])
+        # calculate spectrogram of all electrodes at once
+        fs = int(1000.0/sim.cfg.recordStep)
+        lfpSignals = [np.mean(lfp, axis=1) if elec == 'avg' else lfp[:, elec] for elec in electrodes]
+        f, t_spec, allSpec = calculateSpectrogram(lfpSignals, fs, transformMethod='fft', NFFT=NFFT, noverlap=noverlap, nperseg=nperseg)
+        x_mesh, y_mesh = np.meshgrid(t_spec, f[f<maxFreq])
+        for x_spec in allSpec:
             logx_spec.append(10*np.log10(x_spec[f<maxFreq]))
 
         vmin = np.array(logx_spec).min()
@@ -24,10 +24,10 @@ from netpyne import __gui__
 
 if __gui__:
     import matplotlib.pyplot as plt
-    from matplotlib import mlab
 import numpy as np
 from numbers import Number
 from .utils import colorList, exception, _saveFigData, _showFigure, _smooth1d
+from .spectral import calculatePSD, calculateSpectrogram
 
 
 # -------------------------------------------------------------------------------------------------------------------
@@ -120,6 +120,10 @@ def plotLFP (electrodes = ['avg', 'all'], plots = ['timeSeries', 'PSD', 'spectro
     if 'all' in electrodes:
         electrodes.remove('all')
         electrodes.extend(list(range(int(sim.net.recXElectrode.nsites))))
+    invalid = [elec for elec in electrodes if elec != 'avg' and not (isinstance(elec, Number) and 0 <= elec < sim.net.recXElectrode.nsites)]
+    if invalid:
+        print('  Skipping electrodes not recorded: %s' % (invalid))
+        electrodes = [elec for elec in electrodes if elec not in invalid]
 
     # plotting
     figs = []
@@ -209,36 +213,24 @@ def plotLFP (electrodes = ['avg', 'all'], plots = ['timeSeries', 'PSD', 'spectro
         data['allFreqs'] = allFreqs
         data['allSignal'] = allSignal
 
+        # calculate PSD of all electrodes at once
+        Fs = int(1000.0/sim.cfg.recordStep)
+        lfpSignals = [np.mean(lfp, axis=1) if elec == 'avg' else lfp[:, elec] for elec in electrodes]
+        freqs, power = calculatePSD(lfpSignals, Fs, transformMethod=transformMethod, NFFT=NFFT, noverlap=noverlap,
+            minFreq=minFreq, maxFreq=maxFreq, stepFreq=stepFreq)
+
         for i,elec in enumerate(electrodes):
-            if elec == 'avg':
-                lfpPlot = np.mean(lfp, axis=1)
-            elif isinstance(elec, Number) and elec <= sim.net.recXElectrode.nsites:
-                lfpPlot = lfp[:, elec]
-            
             # Morlet wavelet transform method
             if transformMethod == 'morlet':
-                from ..support.morlet import MorletSpec, index2ms
-
-                Fs = int(1000.0/sim.cfg.recordStep)
-
-                #t_spec = np.linspace(0, index2ms(len(lfpPlot), Fs), len(lfpPlot))
-                morletSpec = MorletSpec(lfpPlot, Fs, freqmin=minFreq, freqmax=maxFreq, freqstep=stepFreq)
-                freqs = F = morletSpec.f
-                spec = morletSpec.TFR
-                signal = np.mean(spec, 1)
+                signal = power[i]
                 ylabel = 'Power'
 
             # FFT transform method
             elif transformMethod == 'fft':
-                Fs = int(1000.0/sim.cfg.recordStep)
-                power = mlab.psd(lfpPlot, Fs=Fs, NFFT=NFFT, detrend=mlab.detrend_none, window=mlab.window_hanning, 
-                    noverlap=noverlap, pad_to=None, sides='default', scale_by_freq=None)
-
                 if smooth:
-                    signal = _smooth1d(10*np.log10(power[0]), smooth)
+                    signal = _smooth1d(10*np.log10(power[i]), smooth)
                 else:
-                    signal = 10*np.log10(power[0])
-                freqs = power[1]
+                    signal = 10*np.log10(power[i])
                 ylabel = 'Power (dB/Hz)'
 
             allFreqs.append(freqs)
@@ -305,36 +297,31 @@ def plotLFP (electrodes = ['avg', 'all'], plots = ['timeSeries', 'PSD', 'spectro
         figs.append(plt.figure(figsize=(figSize[0]*numCols, figSize[1])))
         #t = np.arange(timeRange[0], timeRange[1], sim.cfg.recordStep)
         
+        # calculate spectrogram of all electrodes at once
+        fs = int(1000.0 / sim.cfg.recordStep)
+        lfpSignals = [np.mean(lfp, axis=1) if elec == 'avg' else lfp[:, elec] for elec in electrodes]
+        F, t_spec, allSpec = calculateSpectrogram(lfpSignals, fs, transformMethod=transformMethod, NFFT=NFFT, noverlap=noverlap,
+            nperseg=nperseg, minFreq=minFreq, maxFreq=maxFreq, stepFreq=stepFreq)
+
         # Morlet wavelet transform method
         if transformMethod == 'morlet':
-            from ..support.morlet import MorletSpec, index2ms
+            from ..support.morlet import MorletSpec
 
-            spec = []
-            
-            for i,elec in enumerate(electrodes):
-                if elec == 'avg':
-                    lfpPlot = np.mean(lfp, axis=1)
-                elif isinstance(elec, Number) and elec <= sim.net.recXElectrode.nsites:
-                    lfpPlot = lfp[:, elec]
-                fs = int(1000.0 / sim.cfg.recordStep)
-                t_spec = np.linspace(0, index2ms(len(lfpPlot), fs), len(lfpPlot))
-                spec.append(MorletSpec(lfpPlot, fs, freqmin=minFreq, freqmax=maxFreq, freqstep=stepFreq))
-                
             f = np.array(range(minFreq, maxFreq+1, stepFreq))  # only used as output for user
+            spec = []
 
-            vmin = np.array([s.TFR for s in spec]).min()
-            vmax = np.array([s.TFR for s in spec]).max()
+            vmin = allSpec.min()
+            vmax = allSpec.max()
             for i,elec in enumerate(electrodes):
                 plt.subplot(np.ceil(len(electrodes) / numCols), numCols, i + 1)
                 T = timeRange
-                F = spec[i].f
                 if normSpec:
-                    spec[i].TFR = spec[i].TFR / vmax
-                    S = spec[i].TFR
+                    S = allSpec[i] / vmax
                     vc = [0, 1]
                 else:
-                    S = spec[i].TFR
+                    S = allSpec[i].copy()  # not shared with the spectral cache
                     vc = [vmin, vmax]
+                spec.append(MorletSpec(lfpSignals[i], fs, freqmin=minFreq, freqmax=maxFreq, freqstep=stepFreq, TFR=S))  # same output as before
 
                 plt.imshow(S, extent=(np.amin(T), np.amax(T), np.amin(F), np.amax(F)), origin='lower', interpolation='None', aspect='auto', vmin=vc[0], vmax=vc[1], cmap=plt.get_cmap('viridis'))
                 plt.colorbar(label='Power')
@@ -345,22 +332,9 @@ def plotLFP (electrodes = ['avg', 'all'], plots = ['timeSeries', 'PSD', 'spectro
         
         # FFT transform method
         elif transformMethod == 'fft':
-
-            from scipy import signal as spsig
-            spec = []
-            
-            for i,elec in enumerate(electrodes):
-                if elec == 'avg':
-                    lfpPlot = np.mean(lfp, axis=1)
-                elif isinstance(elec, Number) and elec <= sim.net.recXElectrode.nsites:
-                    lfpPlot = lfp[:, elec]
-                # creates spectrogram over a range of data 
-                # from: http://joelyancey.com/lfp-python-practice/
-                fs = int(1000.0/sim.cfg.recordStep)
-                f, t_spec, x_spec = spsig.spectrogram(lfpPlot, fs=fs, window='hanning',
-                detrend=mlab.detrend_none, nperseg=nperseg, noverlap=noverlap, nfft=NFFT,  mode='psd')
-                x_mesh, y_mesh = np.meshgrid(t_spec*1000.0, f[f<maxFreq])
-                spec.append(10*np.log10(x_spec[f<maxFreq]))
+            f = F
+            x_mesh, y_mesh = np.meshgrid(t_spec, F[F<maxFreq])
+            spec = [10*np.log10(x_spec[F<maxFreq]) for x_spec in allSpec]
 
             vmin = np.array(spec).min()
             vmax = np.array(spec).max()
@@ -419,7 +393,7 @@ def plotLFP (electrodes = ['avg', 'all'], plots = ['timeSeries', 'PSD', 'spectro
         outputData.update({'allFreqs': allFreqs, 'allSignal': allSignal})
     
     if 'spectrogram' in plots:
-        outputData.update({'spec': spec, 't': t_spec*1000.0, 'freqs': f[f<=maxFreq]})
+        outputData.update({'spec': spec, 't': t_spec, 'freqs': f[f<=maxFreq]})
 
     #save figure data
     if saveData:
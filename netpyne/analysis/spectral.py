@@ -0,0 +1,163 @@
+"""
+analysis/spectral.py
+
+Batched spectral analysis (PSD and spectrograms) shared by the spike, LFP and interactive plotting functions
+
+All functions take a 2D array of signals (one row per signal, eg. one per population or electrode) and
+compute the transform along the last axis in a single vectorized call. Results are cached keyed by the
+signal contents and parameters, so replotting the same data with different styles does not recompute them.
+
+Contributors: salvadordura@gmail.com
+"""
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+from __future__ import absolute_import
+
+from future import standard_library
+standard_library.install_aliases()
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+_spectralCache = OrderedDict()  # (signal hash, params) -> result
+_spectralCacheSize = 32  # max number of results kept in cache
+
+
+# -------------------------------------------------------------------------------------------------------------------
+## Cache helpers
+# -------------------------------------------------------------------------------------------------------------------
+def _cacheKey(signals, func, params):
+    sigHash = hashlib.md5(np.ascontiguousarray(signals, dtype=float).tobytes()).hexdigest()
+    return (func, sigHash, signals.shape, tuple(sorted(params.items())))
+
+
+def _cacheGet(key):
+    if key in _spectralCache:
+        _spectralCache[key] = _spectralCache.pop(key)  # move to end (most recently used)
+        return _spectralCache[key]
+    return None
+
+
+def _cacheSet(key, value):
+    _spectralCache[key] = value
+    while len(_spectralCache) > _spectralCacheSize:
+        _spectralCache.popitem(last=False)
+    return value
+
+
+def clearSpectralCache():
+    _spectralCache.clear()
+
+
+# -------------------------------------------------------------------------------------------------------------------
+## Welch PSD of multiple signals (equivalent to mlab.psd with hanning window and no detrending)
+# -------------------------------------------------------------------------------------------------------------------
+def _welchPSD(signals, fs, NFFT, noverlap):
+    numSignals, numSamples = signals.shape
+    if numSamples < NFFT:  # zero pad to NFFT as mlab.psd does
+        signals = np.concatenate((signals, np.zeros((numSignals, NFFT-numSamples))), axis=1)
+        numSamples = NFFT
+    signals = np.ascontiguousarray(signals)
+
+    # view signals as (numSignals, numSegments, NFFT) overlapping segments
+    step = NFFT - noverlap
+    numSegs = (numSamples - noverlap) // step
+    segs = np.lib.stride_tricks.as_strided(signals, shape=(numSignals, numSegs, NFFT),
+        strides=(signals.strides[0], step*signals.strides[1], signals.strides[1]))
+
+    window = np.hanning(NFFT)
+    power = np.abs(np.fft.rfft(segs * window, axis=-1))**2
+    power = power.mean(axis=1) / (fs * (window**2).sum())
+
+    # one-sided spectrum: double all frequencies except DC (and Nyquist if NFFT even)
+    if NFFT % 2 == 0:
+        power[:, 1:-1] *= 2
+    else:
+        power[:, 1:] *= 2
+    freqs = np.fft.rfftfreq(NFFT, 1.0/fs)
+
+    return freqs, power
+
+
+# -------------------------------------------------------------------------------------------------------------------
+## Morlet spectrogram of multiple signals
+# -------------------------------------------------------------------------------------------------------------------
+def _morletSpec(signals, fs, minFreq, maxFreq, stepFreq):
+    import scipy.signal as sps
+    from ..support.morlet import MorletTransform
+
+    freqs = np.arange(minFreq, maxFreq + 1, stepFreq)  # same frequencies as MorletSpec
+    signals = sps.detrend(signals - signals.mean(axis=1, keepdims=True), axis=-1)  # as in MorletSpec.transform
+
+    return freqs, MorletTransform(signals, fs, freqs)
+
+
+# -------------------------------------------------------------------------------------------------------------------
+## Calculate PSD of multiple signals
+# -------------------------------------------------------------------------------------------------------------------
+def calculatePSD(signals, fs, transformMethod='morlet', NFFT=256, noverlap=128, minFreq=1, maxFreq=100, stepFreq=1):
+    '''
+    Power spectral density of each row of signals
+        - signals (2D array or list of 1D arrays of equal length): Signals to transform, one per row
+        - fs (float): Sampling frequency in Hz
+        - transformMethod ('morlet'|'fft'): Morlet wavelet (time-averaged) or Welch FFT method (default: 'morlet')
+        - NFFT (int): Number of data points used in each FFT block (default: 256)
+        - noverlap (int): Number of points of overlap between FFT blocks (default: 128)
+        - minFreq, maxFreq, stepFreq (float): Frequencies used for the Morlet transform (default: 1, 100, 1)
+
+        - Returns freqs (1D array) and power (2D array, one row per signal)
+    '''
+    signals = np.atleast_2d(np.asarray(signals, dtype=float))
+    if transformMethod == 'fft':
+        params = {'fs': fs, 'NFFT': int(NFFT), 'noverlap': int(noverlap)}
+    else:
+        params = {'fs': fs, 'minFreq': minFreq, 'maxFreq': maxFreq, 'stepFreq': stepFreq}
+    key = _cacheKey(signals, 'psd_'+transformMethod, params)
+    cached = _cacheGet(key)
+    if cached is not None:
+        return cached
+
+    if transformMethod == 'fft':
+        freqs, power = _welchPSD(signals, **params)
+    else:
+        freqs, spec = _morletSpec(signals, **params)
+        power = np.mean(spec, axis=2)
+
+    return _cacheSet(key, (freqs, power))
+
+
+# -------------------------------------------------------------------------------------------------------------------
+## Calculate spectrogram of multiple signals
+# -------------------------------------------------------------------------------------------------------------------
+def calculateSpectrogram(signals, fs, transformMethod='morlet', NFFT=256, noverlap=128, nperseg=256, minFreq=1, maxFreq=100, stepFreq=1):
+    '''
+    Spectrogram of each row of signals
+        - signals (2D array or list of 1D arrays of equal length): Signals to transform, one per row
+        - fs (float): Sampling frequency in Hz
+        - transformMethod ('morlet'|'fft'): Morlet wavelet or short-time FFT method (default: 'morlet')
+        - NFFT, noverlap, nperseg (int): Parameters of the short-time FFT (default: 256, 128, 256)
+        - minFreq, maxFreq, stepFreq (float): Frequencies used for the Morlet transform (default: 1, 100, 1)
+
+        - Returns freqs (1D array), times (1D array in ms) and spectrogram (3D array, signal x freq x time)
+    '''
+    signals = np.atleast_2d(np.asarray(signals, dtype=float))
+    if transformMethod == 'fft':
+        params = {'fs': fs, 'NFFT': int(NFFT), 'noverlap': int(noverlap), 'nperseg': int(nperseg)}
+    else:
+        params = {'fs': fs, 'minFreq': minFreq, 'maxFreq': maxFreq, 'stepFreq': stepFreq}
+    key = _cacheKey(signals, 'spec_'+transformMethod, params)
+    cached = _cacheGet(key)
+    if cached is not None:
+        return cached
+
+    if transformMethod == 'fft':
+        from scipy import signal as spsig
+        freqs, t, spec = spsig.spectrogram(signals, fs=fs, window='hann', detrend=False, nperseg=nperseg,
+            noverlap=noverlap, nfft=NFFT, mode='psd', axis=-1)
+        t = t*1000.0
+    else:
+        freqs, spec = _morletSpec(signals, **params)
+        t = np.linspace(0, 1e3*signals.shape[1]/fs, signals.shape[1])
+
+    return _cacheSet(key, (freqs, t, spec))
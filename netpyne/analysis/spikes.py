@@ -27,13 +27,13 @@ from netpyne import __gui__
 if __gui__:
     import matplotlib.pyplot as plt
     from matplotlib import gridspec
-    from matplotlib import mlab
 import numpy as np
 from numbers import Number
 import pandas as pd
 import scipy
 from ..specs import Dict
 from .utils import colorList, exception, getCellsInclude, getSpktSpkid, _showFigure, _saveFigData, syncMeasure, _smooth1d
+from .spectral import calculatePSD, calculateSpectrogram
 
 
 # -------------------------------------------------------------------------------------------------------------------
@@ -1188,32 +1188,23 @@ def plotRatePSD(include=['allCells', 'eachPop'], timeRange=None, binSize=5, minF
 
         histData.append(histoCount)
 
+    # calculate PSD of all entries at once
+    Fs = 1000.0 / binSize
+    freqs, power = calculatePSD(histData, Fs, transformMethod=transformMethod, NFFT=NFFT, noverlap=noverlap, 
+        minFreq=minFreq, maxFreq=maxFreq, stepFreq=stepFreq)
+
+    for iplot,subset in enumerate(include):
         # Morlet wavelet transform method
         if transformMethod == 'morlet':
-            from ..support.morlet import MorletSpec, index2ms
-
-            Fs = 1000.0 / binSize
-
-            morletSpec = MorletSpec(histoCount, Fs, freqmin=minFreq, freqmax=maxFreq, freqstep=stepFreq)
-            freqs = morletSpec.f
-            spec = morletSpec.TFR
-            signal = np.mean(spec, 1)
+            signal = power[iplot]
             ylabel = 'Power'
 
         # FFT transform method
         elif transformMethod == 'fft':
-
-            Fs = 1000.0/binSize # ACTUALLY DEPENDS ON BIN WINDOW!!! RATE NOT SPIKE!
-            power = mlab.psd(histoCount, Fs=Fs, NFFT=NFFT, detrend=mlab.detrend_none, window=mlab.window_hanning, 
-                noverlap=noverlap, pad_to=None, sides='default', scale_by_freq=None)
-
-            allSignal = poerwe[0]
-            freqs = power[1]
-
             if smooth:
-                signal = _smooth1d(10*np.log10(allSignal), smooth)
+                signal = _smooth1d(10*np.log10(power[iplot]), smooth)
             else:
-                signal = 10*np.log10(allSignal)
+                signal = 10*np.log10(power[iplot])
 
             ylabel = 'Power (dB/Hz)'
 
@@ -1367,18 +1358,14 @@ def plotRateSpectrogram(include=['allCells', 'eachPop'], timeRange=None, binSize
 
         histData.append(histoCount)
 
-        # Morlet wavelet transform method
-        if transformMethod == 'morlet':
-            from ..support.morlet import MorletSpec, index2ms
-
-            Fs = 1000.0 / binSize
-
-            morletSpec = MorletSpec(histoCount, Fs, freqmin=minFreq, freqmax=maxFreq, freqstep=stepFreq)
-            freqs = morletSpec.f
-            spec = morletSpec.TFR
-            ylabel = 'Power'
-            allSignal.append(spec)
-            allFreqs.append(freqs)
+    # calculate spectrogram of all entries at once
+    if transformMethod == 'morlet':
+        Fs = 1000.0 / binSize
+        freqs, specT, spec = calculateSpectrogram(histData, Fs, transformMethod=transformMethod, 
+            minFreq=minFreq, maxFreq=maxFreq, stepFreq=stepFreq)
+        ylabel = 'Power'
+        allSignal = list(spec)
+        allFreqs = [freqs]*len(include)
 
     # plotting
     T = timeRange
@@ -1425,6 +1412,14 @@ def popAvgRates (trange = None, show = True):
         print('Error: sim.allSimData not available; please call sim.gatherData()')
         return None
 
+    # use rates accumulated online during the run if available (see cfg.recordSpikeStats)
+    if not trange and 'spikeStats' in sim.allSimData:
+        avgRates = Dict(sim.allSimData['spikeStats']['popRates'])
+        if show:
+            for pop in avgRates:
+                print('   %s : %.3f Hz'%(pop, avgRates[pop]))
+        return avgRates
+
     spkts = sim.allSimData['spkt']
     spkids = sim.allSimData['spkid']
 
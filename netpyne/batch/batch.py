@@ -32,6 +32,7 @@ from neuron import h
 from copy import copy
 from netpyne import specs
 from .utils import bashTemplate
+from .pool import WorkerPool
 from random import Random
 from time import sleep, time
 from itertools import product
@@ -110,6 +111,7 @@ class Batch(object):
         self.method = 'grid'
         self.runCfg = {}
         self.evolCfg = {}
+        self.bayesianCfg = {}
         self.params = []
         self.seed = seed
         if params:
@@ -133,6 +135,8 @@ class Batch(object):
         odict = deepcopy(self.__dict__)
         if 'evolCfg' in odict:
             odict['evolCfg']['fitnessFunc'] = 'removed'
+        if 'bayesianCfg' in odict:
+            odict['bayesianCfg']['fitnessFunc'] = 'removed'
         odict['initCfg'] = tupleToStr(odict['initCfg'])
         dataSave = {'batch': tupleToStr(odict)} 
         if ext == 'json':
@@ -211,7 +215,247 @@ class Batch(object):
         return stats, individual
 
 
+    # -------------------------------------------------------------------------------
+    # Run a job for each candidate (used by evol and bayesian methods) and return their fitness
+    # -------------------------------------------------------------------------------
+    def _evaluateCandidates(self, candidates, args):
+        import os
+        import signal
+        global ngen
+        ngen += 1
+        total_jobs = 0
+
+        # options slurm, mpi
+        type = args.get('type', 'mpi_direct')
+
+        # paths to required scripts
+        script = args.get('script', 'init.py')
+        netParamsSavePath =  args.get('netParamsSavePath')
+        genFolderPath = self.saveFolder + '/gen_' + str(ngen)
+
+        # mpi command setup
+        nodes = args.get('nodes', 1)
+        paramLabels = args.get('paramLabels', [])
+        coresPerNode = args.get('coresPerNode', 1)
+        mpiCommand = args.get('mpiCommand', 'ibrun')
+        numproc = nodes*coresPerNode
+
+        # slurm setup
+        custom = args.get('custom', '')
+        folder = args.get('folder', '.')
+        email = args.get('email', 'a@b.c')
+        walltime = args.get('walltime', '00:01:00')
+        reservation = args.get('reservation', None)
+        allocation = args.get('allocation', 'csd403') # NSG account
+
+        # fitness function
+        fitnessFunc = args.get('fitnessFunc')
+        fitnessFuncArgs = args.get('fitnessFuncArgs')
+        defaultFitness = args.get('defaultFitness')
+
+        # read params or set defaults
+        sleepInterval = args.get('sleepInterval', 0.2)
+
+        # create folder if it does not exist
+        createFolder(genFolderPath)
+
+        # remember pids and jobids in a list
+        pids = []
+        jobids = {}
+
+        # create a job for each candidate
+        for candidate_index, candidate in enumerate(candidates):
+            # required for slurm
+            sleep(sleepInterval)
+
+            # name and path
+            jobName = "gen_" + str(ngen) + "_cand_" + str(candidate_index)
+            jobPath = genFolderPath + '/' + jobName
+
+            # set initial cfg initCfg
+            if len(self.initCfg) > 0:
+                for paramLabel, paramVal in self.initCfg.items():
+                    self.setCfgNestedParam(paramLabel, paramVal)
+
+            # modify cfg instance with candidate values
+            for label, value in zip(paramLabels, candidate):
+                print('set %s=%s' % (label, value))
+                self.setCfgNestedParam(label, value)
+
+            #self.setCfgNestedParam("filename", jobPath)
+            self.cfg.simLabel = jobName
+            self.cfg.saveFolder = genFolderPath
+
+            # save cfg instance to file
+            cfgSavePath = jobPath + '_cfg.json' 
+            self.cfg.save(cfgSavePath)
+
+
+            if type=='mpi_bulletin':
+                # ----------------------------------------------------------------------
+                # MPI master-slaves
+                # ----------------------------------------------------------------------
+                pc.submit(runEvolJob, script, cfgSavePath, netParamsSavePath, jobPath)
+                print('-'*80)
+
+            elif type=='pool':
+                # ----------------------------------------------------------------------
+                # Pool of persistent workers
+                # ----------------------------------------------------------------------
+                args['pool'].submit(script, cfgSavePath, netParamsSavePath, jobPath)
+
+            else:
+                # ----------------------------------------------------------------------
+                # MPI job commnand
+                # ----------------------------------------------------------------------
+                command = '%s -np %d nrniv -python -mpi %s simConfig=%s netParams=%s ' % (mpiCommand, numproc, script, cfgSavePath, netParamsSavePath)
+
+                # ----------------------------------------------------------------------
+                # run on local machine with <nodes*coresPerNode> cores
+                # ----------------------------------------------------------------------
+                if type=='mpi_direct':
+                    executer = '/bin/bash'
+                    jobString = bashTemplate('mpi_direct') %(custom, folder, command)
+
+                # ----------------------------------------------------------------------
+                # run on HPC through slurm
+                # ----------------------------------------------------------------------
+                elif type=='hpc_slurm':
+                    executer = 'sbatch'
+                    res = '#SBATCH --res=%s' % (reservation) if reservation else ''
+                    jobString = bashTemplate('hpc_slurm') % (jobName, allocation, walltime, nodes, coresPerNode, jobPath, jobPath, email, res, custom, folder, command)
+
+                # ----------------------------------------------------------------------
+                # run on HPC through PBS
+                # ----------------------------------------------------------------------
+                elif type=='hpc_torque':
+                    executer = 'qsub'
+                    queueName = args.get('queueName', 'default')
+                    nodesppn = 'nodes=%d:ppn=%d' % (nodes, coresPerNode)
+                    jobString = bashTemplate('hpc_torque') % (jobName, walltime, queueName, nodesppn, jobPath, jobPath, custom, command)
+
+                # ----------------------------------------------------------------------
+                # save job and run
+                # ----------------------------------------------------------------------
+                print('Submitting job ', jobName)
+                print(jobString)
+                print('-'*80)
+                # save file 
+                batchfile = '%s.sbatch' % (jobPath)
+                with open(batchfile, 'w') as text_file:
+                    text_file.write("%s" % jobString)
+
+                #with open(jobPath+'.run', 'a+') as outf, open(jobPath+'.err', 'w') as errf:
+                with open(jobPath+'.jobid', 'w') as outf, open(jobPath+'.err', 'w') as errf:
+                    pids.append(Popen([executer, batchfile], stdout=outf,  stderr=errf, preexec_fn=os.setsid).pid)
+                #proc = Popen(command.split([executer, batchfile]), stdout=PIPE, stderr=PIPE)
+                sleep(0.1)
+                #read = proc.stdout.read()                            
+                with open(jobPath+'.jobid', 'r') as outf:
+                    read=outf.readline()
+                print(read)
+                if len(read) > 0:
+                    jobid = int(read.split()[-1])
+                    jobids[candidate_index] = jobid
+                print('jobids', jobids)
+            total_jobs += 1
+            sleep(0.1)
+
+
+        # ----------------------------------------------------------------------
+        # gather data and compute fitness
+        # ----------------------------------------------------------------------
+        if type == 'mpi_bulletin':
+            # wait for pc bulletin board jobs to finish
+            try:
+                while pc.working():
+                    sleep(1)
+                #pc.done()
+            except:
+                pass
+        elif type == 'pool':
+            poolResults = args['pool'].wait()  # all jobs finished
+
+        num_iters = 0
+        jobs_completed = 0
+        fitness = [None for cand in candidates]
+        if type == 'pool':  # failed jobs will not write output, so set default fitness without waiting
+            for candidate_index in range(len(candidates)):
+                jobNamePath = genFolderPath + "/gen_" + str(ngen) + "_cand_" + str(candidate_index)
+                if not poolResults.get(jobNamePath) or not os.path.isfile(jobNamePath+'.json'):
+                    fitness[candidate_index] = defaultFitness
+                    jobs_completed += 1
+                    print('  Candidate %d failed; fitness set to default (see %s.err)' % (candidate_index, jobNamePath))
+        # print outfilestem
+        print("Waiting for jobs from generation %d/%d ..." %(ngen, args.get('max_generations')))
+        # print "PID's: %r" %(pids)
+        # start fitness calculation
+        while jobs_completed < total_jobs:
+            unfinished = [i for i, x in enumerate(fitness) if x is None ]
+            for candidate_index in unfinished:
+                try: # load simData and evaluate fitness
+                    jobNamePath = genFolderPath + "/gen_" + str(ngen) + "_cand_" + str(candidate_index)
+                    if os.path.isfile(jobNamePath+'.json'):
+                        with open('%s.json'% (jobNamePath)) as file:
+                            simData = json.load(file)['simData']
+                        fitness[candidate_index] = fitnessFunc(simData, **fitnessFuncArgs)
+                        jobs_completed += 1
+                        print('  Candidate %d fitness = %.1f' % (candidate_index, fitness[candidate_index]))
+                except Exception as e:
+                    # print 
+                    err = "There was an exception evaluating candidate %d:"%(candidate_index)
+                    print(("%s \n %s"%(err,e)))
+                    if type == 'pool':  # output of finished job will not change
+                        fitness[candidate_index] = defaultFitness
+                        jobs_completed += 1
+                    #pass
+                    #print 'Error evaluating fitness of candidate %d'%(candidate_index)
+            num_iters += 1
+            print('completed: %d' %(jobs_completed))
+            if num_iters >= args.get('maxiter_wait', 5000): 
+                print("Max iterations reached, the %d unfinished jobs will be canceled and set to default fitness" % (len(unfinished)))
+                for candidate_index in unfinished:
+                    fitness[candidate_index] = defaultFitness
+                    jobs_completed += 1      
+                    if type != 'hpc_slurm':  # only slurm jobs can be canceled
+                        continue
+                    if 'scancelUser' in args:
+                        os.system('scancel -u %s'%(args['scancelUser']))
+                    elif candidate_index in jobids:
+                        os.system('scancel %d'%(jobids[candidate_index]))  # terminate unfinished job (resubmitted jobs not terminated!)
+            sleep(args.get('time_sleep', 1))
+
+        # kill all processes
+        if type=='mpi_bulletin':
+            try:
+                with open("./pids.pid", 'r') as file: # read pids for mpi_bulletin
+                    pids = [int(i) for i in file.read().split(' ')[:-1]]
+
+                with open("./pids.pid", 'w') as file: # delete content
+                    pass
+                for pid in pids:
+                    try:
+                        os.killpg(os.getpgid(pid), signal.SIGTERM)
+                    except:
+                        pass
+            except:
+                pass
+        # don't want to to this for hpcs since jobs are running on compute nodes not master 
+        # else: 
+        #     try: 
+        #         for pid in pids: os.killpg(os.getpgid(pid), signal.SIGTERM)
+        #     except:
+        #         pass
+        # return
+        print("-"*80)
+        print("  Completed a generation  ")
+        print("-"*80)
+        return fitness
+
+
     def run(self):
+        global ngen  # generation (batch of candidates) number, updated by _evaluateCandidates
+
         # -------------------------------------------------------------------------------
         # Grid Search optimization
         # -------------------------------------------------------------------------------
@@ -289,6 +533,9 @@ class Batch(object):
                 for iworker in range(int(pc.nhost())):
                     pc.runworker()
 
+            # if using pool of persistent workers, start workers
+            pool = WorkerPool(self.runCfg) if self.runCfg.get('type', None) == 'pool' else None
+
             for iCombG, pCombG in zip(indexCombGroups, valueCombGroups):
                 for iCombNG, pCombNG in zip(indexCombinations, valueCombinations):
                     if groupedParams and ungroupedParams: # temporary hack - improve
@@ -454,17 +701,26 @@ wait
                             print('Submitting job ',jobName)
                             # master/slave bulletin board schedulling of jobs
                             pc.submit(runJob, self.runCfg.get('script', 'init.py'), cfgSavePath, netParamsSavePath)
+
+                        # pool of persistent workers (each job run in a worker process that has already imported netpyne and mechanisms)
+                        # eg. usage: python batch.py
+                        elif self.runCfg.get('type',None) == 'pool':
+                            jobName = self.saveFolder+'/'+simLabel     
+                            pool.submit(self.runCfg.get('script', 'init.py'), cfgSavePath, netParamsSavePath, jobName)
                             
                         else:
                             print(self.runCfg)
-                            print("Error: invalid runCfg 'type' selected; valid types are 'mpi_bulletin', 'mpi_direct', 'hpc_slurm', 'hpc_torque'")
+                            print("Error: invalid runCfg 'type' selected; valid types are 'mpi_bulletin', 'mpi_direct', 'pool', 'hpc_slurm', 'hpc_torque'")
                             import sys
                             sys.exit(0)
                 
-                    sleep(sleepInterval) # avoid saturating scheduler
+                    if not pool:
+                        sleep(sleepInterval) # avoid saturating scheduler
             print("-"*80)
             print("   Finished submitting jobs for grid parameter exploration   ")
             print("-" * 80)
+            if pool:
+                pool.close()
             while pc.working():
                 sleep(sleepInterval)
 
@@ -477,224 +733,6 @@ wait
             import sys
             import inspyred.ec as EC
 
-            # -------------------------------------------------------------------------------
-            # Evolutionary optimization: Parallel evaluation
-            # -------------------------------------------------------------------------------
-            def evaluator(candidates, args):
-                import os
-                import signal
-                global ngen
-                ngen += 1
-                total_jobs = 0
-
-                # options slurm, mpi
-                type = args.get('type', 'mpi_direct')
-                
-                # paths to required scripts
-                script = args.get('script', 'init.py')
-                netParamsSavePath =  args.get('netParamsSavePath')
-                genFolderPath = self.saveFolder + '/gen_' + str(ngen)
-                
-                # mpi command setup
-                nodes = args.get('nodes', 1)
-                paramLabels = args.get('paramLabels', [])
-                coresPerNode = args.get('coresPerNode', 1)
-                mpiCommand = args.get('mpiCommand', 'ibrun')
-                numproc = nodes*coresPerNode
-                
-                # slurm setup
-                custom = args.get('custom', '')
-                folder = args.get('folder', '.')
-                email = args.get('email', 'a@b.c')
-                walltime = args.get('walltime', '00:01:00')
-                reservation = args.get('reservation', None)
-                allocation = args.get('allocation', 'csd403') # NSG account
-
-                # fitness function
-                fitnessFunc = args.get('fitnessFunc')
-                fitnessFuncArgs = args.get('fitnessFuncArgs')
-                defaultFitness = args.get('defaultFitness')
-                
-                # read params or set defaults
-                sleepInterval = args.get('sleepInterval', 0.2)
-                
-                # create folder if it does not exist
-                createFolder(genFolderPath)
-                
-                # remember pids and jobids in a list
-                pids = []
-                jobids = {}
-                
-                # create a job for each candidate
-                for candidate_index, candidate in enumerate(candidates):
-                    # required for slurm
-                    sleep(sleepInterval)
-                    
-                    # name and path
-                    jobName = "gen_" + str(ngen) + "_cand_" + str(candidate_index)
-                    jobPath = genFolderPath + '/' + jobName
-
-                    # set initial cfg initCfg
-                    if len(self.initCfg) > 0:
-                        for paramLabel, paramVal in self.initCfg.items():
-                            self.setCfgNestedParam(paramLabel, paramVal)
-                    
-                    # modify cfg instance with candidate values
-                    for label, value in zip(paramLabels, candidate):
-                        print('set %s=%s' % (label, value))
-                        self.setCfgNestedParam(label, value)
-                    
-                    #self.setCfgNestedParam("filename", jobPath)
-                    self.cfg.simLabel = jobName
-                    self.cfg.saveFolder = genFolderPath
-
-                    # save cfg instance to file
-                    cfgSavePath = jobPath + '_cfg.json' 
-                    self.cfg.save(cfgSavePath)
-                    
-                    
-                    if type=='mpi_bulletin':
-                        # ----------------------------------------------------------------------
-                        # MPI master-slaves
-                        # ----------------------------------------------------------------------
-                        pc.submit(runEvolJob, script, cfgSavePath, netParamsSavePath, jobPath)
-                        print('-'*80)
-
-                    else:
-                        # ----------------------------------------------------------------------
-                        # MPI job commnand
-                        # ----------------------------------------------------------------------
-                        command = '%s -np %d nrniv -python -mpi %s simConfig=%s netParams=%s ' % (mpiCommand, numproc, script, cfgSavePath, netParamsSavePath)
-                        
-                        # ----------------------------------------------------------------------
-                        # run on local machine with <nodes*coresPerNode> cores
-                        # ----------------------------------------------------------------------
-                        if type=='mpi_direct':
-                            executer = '/bin/bash'
-                            jobString = bashTemplate('mpi_direct') %(custom, folder, command)
-                        
-                        # ----------------------------------------------------------------------
-                        # run on HPC through slurm
-                        # ----------------------------------------------------------------------
-                        elif type=='hpc_slurm':
-                            executer = 'sbatch'
-                            res = '#SBATCH --res=%s' % (reservation) if reservation else ''
-                            jobString = bashTemplate('hpc_slurm') % (jobName, allocation, walltime, nodes, coresPerNode, jobPath, jobPath, email, res, custom, folder, command)
-                        
-                        # ----------------------------------------------------------------------
-                        # run on HPC through PBS
-                        # ----------------------------------------------------------------------
-                        elif type=='hpc_torque':
-                            executer = 'qsub'
-                            queueName = args.get('queueName', 'default')
-                            nodesppn = 'nodes=%d:ppn=%d' % (nodes, coresPerNode)
-                            jobString = bashTemplate('hpc_torque') % (jobName, walltime, queueName, nodesppn, jobPath, jobPath, custom, command)
-                        
-                        # ----------------------------------------------------------------------
-                        # save job and run
-                        # ----------------------------------------------------------------------
-                        print('Submitting job ', jobName)
-                        print(jobString)
-                        print('-'*80)
-                        # save file 
-                        batchfile = '%s.sbatch' % (jobPath)
-                        with open(batchfile, 'w') as text_file:
-                            text_file.write("%s" % jobString)
-                        
-                        #with open(jobPath+'.run', 'a+') as outf, open(jobPath+'.err', 'w') as errf:
-                        with open(jobPath+'.jobid', 'w') as outf, open(jobPath+'.err', 'w') as errf:
-                            pids.append(Popen([executer, batchfile], stdout=outf,  stderr=errf, preexec_fn=os.setsid).pid)
-                        #proc = Popen(command.split([executer, batchfile]), stdout=PIPE, stderr=PIPE)
-                        sleep(0.1)
-                        #read = proc.stdout.read()                            
-                        with open(jobPath+'.jobid', 'r') as outf:
-                            read=outf.readline()
-                        print(read)
-                        if len(read) > 0:
-                            jobid = int(read.split()[-1])
-                            jobids[candidate_index] = jobid
-                        print('jobids', jobids)
-                    total_jobs += 1
-                    sleep(0.1)
-
-
-                # ----------------------------------------------------------------------
-                # gather data and compute fitness
-                # ----------------------------------------------------------------------
-                if type == 'mpi_bulletin':
-                    # wait for pc bulletin board jobs to finish
-                    try:
-                        while pc.working():
-                            sleep(1)
-                        #pc.done()
-                    except:
-                        pass
-                        
-                num_iters = 0
-                jobs_completed = 0
-                fitness = [None for cand in candidates]
-                # print outfilestem
-                print("Waiting for jobs from generation %d/%d ..." %(ngen, args.get('max_generations')))
-                # print "PID's: %r" %(pids)
-                # start fitness calculation
-                while jobs_completed < total_jobs:
-                    unfinished = [i for i, x in enumerate(fitness) if x is None ]
-                    for candidate_index in unfinished:
-                        try: # load simData and evaluate fitness
-                            jobNamePath = genFolderPath + "/gen_" + str(ngen) + "_cand_" + str(candidate_index)
-                            if os.path.isfile(jobNamePath+'.json'):
-                                with open('%s.json'% (jobNamePath)) as file:
-                                    simData = json.load(file)['simData']
-                                fitness[candidate_index] = fitnessFunc(simData, **fitnessFuncArgs)
-                                jobs_completed += 1
-                                print('  Candidate %d fitness = %.1f' % (candidate_index, fitness[candidate_index]))
-                        except Exception as e:
-                            # print 
-                            err = "There was an exception evaluating candidate %d:"%(candidate_index)
-                            print(("%s \n %s"%(err,e)))
-                            #pass
-                            #print 'Error evaluating fitness of candidate %d'%(candidate_index)
-                    num_iters += 1
-                    print('completed: %d' %(jobs_completed))
-                    if num_iters >= args.get('maxiter_wait', 5000): 
-                        print("Max iterations reached, the %d unfinished jobs will be canceled and set to default fitness" % (len(unfinished)))
-                        for canditade_index in unfinished:
-                            fitness[canditade_index] = defaultFitness
-                            jobs_completed += 1      
-                            if 'scancelUser' in kwargs:
-                                os.system('scancel -u %s'%(kwargs['scancelUser']))
-                            else:              
-                                os.system('scancel %d'%(jobids[candidate_index]))  # terminate unfinished job (resubmitted jobs not terminated!)
-                    sleep(args.get('time_sleep', 1))
-                
-                # kill all processes
-                if type=='mpi_bulletin':
-                    try:
-                        with open("./pids.pid", 'r') as file: # read pids for mpi_bulletin
-                            pids = [int(i) for i in file.read().split(' ')[:-1]]
-                        
-                        with open("./pids.pid", 'w') as file: # delete content
-                            pass
-                        for pid in pids:
-                            try:
-                                os.killpg(os.getpgid(pid), signal.SIGTERM)
-                            except:
-                                pass
-                    except:
-                        pass
-                # don't want to to this for hpcs since jobs are running on compute nodes not master 
-                # else: 
-                #     try: 
-                #         for pid in pids: os.killpg(os.getpgid(pid), signal.SIGTERM)
-                #     except:
-                #         pass
-                # return
-                print("-"*80)
-                print("  Completed a generation  ")
-                print("-"*80)
-                return fitness
-                
-
             # -------------------------------------------------------------------------------
             # Evolutionary optimization: Generation of first population candidates
             # -------------------------------------------------------------------------------
@@ -737,7 +775,6 @@ wait
             # create main sim directory and save scripts
             self.saveScripts()
 
-            global ngen
             ngen = -1
             
             # log for simulation      
@@ -778,6 +815,9 @@ wait
                 for iworker in range(int(pc.nhost())):
                     pc.runworker()
 
+            # if using pool of persistent workers, start workers
+            pool = kwargs['pool'] = WorkerPool(self.runCfg) if self.runCfg.get('type', None) == 'pool' else None
+
             #------------------------------------------------------------------
             # Evolutionary algorithm method
             #-------------------------------------------------------------------
@@ -834,7 +874,7 @@ wait
             # Run algorithm
             # ------------------------------------------------------------------------------- 
             final_pop = ea.evolve(generator=generator, 
-                                evaluator=evaluator,
+                                evaluator=self._evaluateCandidates,
                                 bounder=EC.Bounder(kwargs['lower_bound'],kwargs['upper_bound']),
                                 logger=logger,
                                 **kwargs)
@@ -842,6 +882,8 @@ wait
             # close file
             stats_file.close()
             ind_stats_file.close()
+            if pool:
+                pool.close()
             
             # print best and finish
             print(('Best Solution: \n{0}'.format(str(max(final_pop)))))
@@ -849,3 +891,87 @@ wait
             print("   Completed evolutionary algorithm parameter optimization   ")
             print("-"*80)
             sys.exit()
+
+
+        # -------------------------------------------------------------------------------
+        # Bayesian optimization (gaussian process surrogate of fitness + expected improvement)
+        # -------------------------------------------------------------------------------
+        elif self.method == 'bayesian':
+            import sys
+            import numpy as np
+            from .surrogate import latinHypercube, proposePoints
+
+            # create main sim directory and save scripts
+            self.saveScripts()
+
+            ngen = -1
+
+            # gather **kwargs (jobs are run and evaluated as in evol method)
+            kwargs = {'cfg': self.cfg}
+            kwargs['paramLabels'] = [x['label'] for x in self.params]
+            kwargs['netParamsSavePath'] = self.saveFolder+'/'+self.batchLabel+'_netParams.py'
+            for key, value in self.bayesianCfg.items(): 
+                kwargs[key] = value
+            for key, value in self.runCfg.items(): 
+                kwargs[key] = value
+
+            lowerBound = np.array([x['values'][0] for x in self.params], dtype=float)
+            upperBound = np.array([x['values'][1] for x in self.params], dtype=float)
+            maximize = kwargs.get('maximize', False)
+            maxEvals = kwargs.get('maxEvals', 50)  # total num of simulations
+            batchSize = kwargs.get('batchSize', 1)  # num of simulations run in parallel after initial points
+            numInitPoints = min(kwargs.get('numInitPoints', 2*len(self.params)+2), maxEvals)  # num of random initial simulations
+            if batchSize < 1 or (maxEvals > 0 and numInitPoints < 1):
+                print("Error: bayesianCfg 'batchSize' and 'numInitPoints' must be at least 1")
+                sys.exit(0)
+            kwargs['max_generations'] = int(np.ceil(float(maxEvals - numInitPoints) / batchSize))
+
+            # if using pc bulletin board, initialize all workers
+            if self.runCfg.get('type', None) == 'mpi_bulletin':
+                for iworker in range(int(pc.nhost())):
+                    pc.runworker()
+
+            # if using pool of persistent workers, start workers
+            pool = kwargs['pool'] = WorkerPool(self.runCfg) if self.runCfg.get('type', None) == 'pool' else None
+
+            # file to record all evaluations
+            evalFile = open('%s/%s_evaluations.csv' % (self.saveFolder, self.batchLabel), 'w')
+            evalFile.write('#gen  #cand  fitness  [candidate]\n')
+
+            # each batch is proposed once all simulations of the previous batch have finished (workers are not refilled
+            # as single jobs finish, so a slow simulation delays the batch)
+            rand = np.random.RandomState(self.seed)
+            points, fitnessValues = [], []  # normalized param values and fitness (to minimize) of all evaluations
+            while len(points) < maxEvals:
+                valid = [i for i, fitness in enumerate(fitnessValues) if np.isfinite(fitness)]
+                num = min(numInitPoints if not points else batchSize, maxEvals - len(points))
+                if len(valid) < 2:  # initial points (or not enough successful simulations to fit model)
+                    newPoints = latinHypercube(num, len(self.params), rand)
+                else:
+                    newPoints = proposePoints([points[i] for i in valid], [fitnessValues[i] for i in valid], num, rand, 
+                        xi=kwargs.get('xi', 0.01), noise=kwargs.get('noise', 1e-6))
+
+                candidates = [[float(value) for value in lowerBound + point * (upperBound - lowerBound)] for point in newPoints]
+                fitness = self._evaluateCandidates(candidates, kwargs)
+
+                for icand, (point, candidate, candFitness) in enumerate(zip(newPoints, candidates, fitness)):
+                    evalFile.write('%d  %d  %s  %s\n' % (ngen, icand, candFitness, candidate))
+                    candFitness = float(candFitness) if candFitness is not None else np.nan
+                    points.append(point)
+                    fitnessValues.append(-candFitness if maximize else candFitness)
+                evalFile.flush()
+
+            evalFile.close()
+            if pool:
+                pool.close()
+
+            # print best and finish
+            if any(np.isfinite(fitnessValues)):
+                ibest = int(np.nanargmin(fitnessValues))
+                bestCandidate = lowerBound + points[ibest] * (upperBound - lowerBound)
+                print(('Best Solution (fitness = %s): \n%s' % (-fitnessValues[ibest] if maximize else fitnessValues[ibest], 
+                    dict(zip(kwargs['paramLabels'], bestCandidate.tolist())))))
+            print("-"*80)
+            print("   Completed bayesian parameter optimization   ")
+            print("-"*80)
+            sys.exit()
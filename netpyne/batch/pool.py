@@ -0,0 +1,200 @@
+"""
+batch/pool.py
+
+Pool of persistent worker processes to run batch simulations (runCfg type 'pool')
+
+Each worker imports NetPyNE and loads the compiled mechanisms once, and then runs jobs (the simulation script
+with simConfig and netParams arguments) in the same process, calling sim.clearAll() after each job. Workers are
+recycled after a number of jobs or when their memory exceeds a limit, to avoid accumulating leaks.
+
+Contributors: salvadordura@gmail.com
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+
+from builtins import range
+from future import standard_library
+standard_library.install_aliases()
+
+import os
+import sys
+import json
+import threading
+from queue import Queue
+from subprocess import Popen, PIPE
+
+_statusPrefix = '__netpyne_pool_status__ '  # marks status lines sent from worker to master
+
+
+# -------------------------------------------------------------------------------
+# Pool of persistent workers (used from the batch master process)
+# -------------------------------------------------------------------------------
+class WorkerPool(object):
+    ''' Run batch jobs in persistent worker processes
+        runCfg options: workers (num of worker processes), maxJobsPerWorker (jobs run by a worker before it is
+        replaced), maxWorkerMemory (MB; worker replaced after a job if its peak memory is higher), mechanisms
+        (folder with compiled mod files, if not in the current folder), python (python executable)'''
+
+    def __init__(self, runCfg):
+        self.numWorkers = int(runCfg.get('workers', runCfg.get('cores', 1)))
+        self.maxJobsPerWorker = runCfg.get('maxJobsPerWorker', 10)
+        self.maxWorkerMemory = runCfg.get('maxWorkerMemory', None)
+        # started with -c (not -m) since netpyne.batch already imports this module
+        self.command = [runCfg.get('python', sys.executable), '-c', 'import sys; from netpyne.batch.pool import runWorker; runWorker(*sys.argv[1:])']
+        if runCfg.get('mechanisms'):
+            self.command.append(runCfg['mechanisms'])
+        self.jobs = Queue()
+        self.results = {}
+        self.threads = []
+        for iworker in range(self.numWorkers):
+            thread = threading.Thread(target=self._manageWorker, args=(iworker,))
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+
+    def submit(self, script, cfgSavePath, netParamsSavePath, jobName):
+        ''' Queue job; stdout and stderr of the job are saved to jobName.run and jobName.err'''
+        self.results[jobName] = None
+        self.jobs.put({'script': script, 'cfg': cfgSavePath, 'netParams': netParamsSavePath, 'jobName': jobName})
+
+
+    def wait(self):
+        ''' Wait for all submitted jobs to finish; returns dict with success of each job'''
+        self.jobs.join()
+        return dict(self.results)
+
+
+    def close(self):
+        ''' Wait for all jobs and stop workers'''
+        self.wait()
+        for thread in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+
+
+    def _startWorker(self):
+        return Popen(self.command, stdin=PIPE, stdout=PIPE, universal_newlines=True)
+
+
+    def _stopWorker(self, worker):
+        try:
+            worker.stdin.write('null\n')
+            worker.stdin.flush()
+            worker.wait()
+        except (IOError, OSError):  # worker died
+            try:
+                worker.kill()
+            except OSError:
+                pass
+        for pipe in [worker.stdin, worker.stdout]:
+            try:
+                pipe.close()
+            except (IOError, OSError):
+                pass
+
+
+    def _manageWorker(self, iworker):
+        ''' Send jobs to a worker process, replacing it after maxJobsPerWorker jobs, if memory is too high or if it died'''
+        worker, numJobs = None, 0
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                if worker: self._stopWorker(worker)
+                self.jobs.task_done()
+                return
+
+            if worker is None:
+                worker, numJobs = self._startWorker(), 0
+            print('Running job %s (worker %d)' % (job['jobName'], iworker))
+            try:
+                worker.stdin.write(json.dumps(job) + '\n')
+                worker.stdin.flush()
+                line = worker.stdout.readline()
+                while line and not line.startswith(_statusPrefix):  # skip any other output
+                    line = worker.stdout.readline()
+                status = json.loads(line[len(_statusPrefix):])
+            except (IOError, OSError, ValueError):  # worker died
+                status = {'success': False, 'recycle': True}
+            self.results[job['jobName']] = status['success']
+            if not status['success']:
+                print('  Error in job %s (see %s.err)' % (job['jobName'], job['jobName']))
+            numJobs += 1
+
+            if status.get('recycle') or (self.maxJobsPerWorker and numJobs >= self.maxJobsPerWorker) \
+                    or (self.maxWorkerMemory and status.get('memory', 0) > self.maxWorkerMemory):
+                self._stopWorker(worker)
+                worker = None
+            self.jobs.task_done()
+
+
+# -------------------------------------------------------------------------------
+# Worker process: run jobs received through stdin until 'null'
+# -------------------------------------------------------------------------------
+def runWorker(mechanisms=None):
+    sys.stdout.flush()
+    channel = os.fdopen(os.dup(1), 'w')  # status to master
+    os.dup2(2, 1)  # any other output of the worker to stderr (output of jobs is redirected to files)
+
+    import neuron
+    if mechanisms:
+        neuron.load_mechanisms(mechanisms)
+    from netpyne import sim  # imported once for all jobs
+
+    for line in iter(sys.stdin.readline, ''):
+        job = json.loads(line)
+        if job is None:
+            break
+        status = _runWorkerJob(job)
+        channel.write(_statusPrefix + json.dumps(status) + '\n')
+        channel.flush()
+
+
+def _runWorkerJob(job):
+    ''' Run simulation script as __main__ with job simConfig and netParams arguments, and clear the simulation'''
+    import runpy
+    import traceback
+    from netpyne import sim
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    origFds = os.dup(1), os.dup(2)
+    with open(job['jobName']+'.run', 'w') as outf, open(job['jobName']+'.err', 'w') as errf:
+        os.dup2(outf.fileno(), 1)  # also redirects NEURON output
+        os.dup2(errf.fileno(), 2)
+        status = {'success': True, 'recycle': False}
+        origArgv = sys.argv
+        sys.argv = [job['script'], 'simConfig=' + job['cfg'], 'netParams=' + job['netParams']]
+        try:
+            runpy.run_path(job['script'], run_name='__main__')
+        except SystemExit as e:
+            status['success'] = e.code in [None, 0]
+        except Exception:
+            traceback.print_exc()
+            status['success'] = False
+        sys.argv = origArgv
+
+        try:
+            if hasattr(sim, 'net'):
+                sim.clearAll()
+        except Exception:
+            traceback.print_exc()
+            status['recycle'] = True  # state of this worker may affect next jobs
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(origFds[0], 1)
+        os.dup2(origFds[1], 2)
+    for fd in origFds:
+        os.close(fd)
+
+    try:
+        import resource
+        status['memory'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # MB (peak)
+    except ImportError:
+        pass
+    return status
+
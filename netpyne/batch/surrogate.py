@@ -0,0 +1,109 @@
+"""
+batch/surrogate.py
+
+Gaussian process surrogate model and expected improvement acquisition used by the bayesian batch method
+
+Contributors: salvadordura@gmail.com
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+from builtins import range
+from future import standard_library
+standard_library.install_aliases()
+import numpy as np
+from scipy.linalg import cho_solve, solve_triangular
+from scipy.stats import norm
+
+
+# -------------------------------------------------------------------------------
+# Matern 5/2 kernel between sets of points (rows) in the normalized parameter space
+# -------------------------------------------------------------------------------
+def _maternKernel(X1, X2, lengthScale):
+    dist = np.sqrt(np.maximum(((X1[:, None, :] - X2[None, :, :])**2).sum(-1), 0)) / lengthScale
+    return (1.0 + np.sqrt(5.0)*dist + 5.0/3.0*dist**2) * np.exp(-np.sqrt(5.0)*dist)
+
+
+# -------------------------------------------------------------------------------
+# Fit gaussian process to fitness values y of points X (normalized to [0, 1]);
+# length scale chosen to maximize the log marginal likelihood
+# -------------------------------------------------------------------------------
+def fitGP(X, y, noise=1e-6, lengthScales=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0)):
+    X, y = np.asarray(X, dtype=float), np.asarray(y, dtype=float)
+    yMean = y.mean()
+    yStd = y.std() if y.std() > 0 else 1.0
+    yNorm = (y - yMean) / yStd
+
+    best = None
+    for lengthScale in lengthScales:
+        K = _maternKernel(X, X, lengthScale) + (noise + 1e-8) * np.eye(len(X))
+        try:
+            L = np.linalg.cholesky(K)
+        except np.linalg.LinAlgError:
+            continue
+        alpha = cho_solve((L, True), yNorm)
+        logLikelihood = -0.5 * yNorm.dot(alpha) - np.log(np.diag(L)).sum()
+        if best is None or logLikelihood > best[0]:
+            best = (logLikelihood, lengthScale, L, alpha)
+
+    if best is None:
+        raise ValueError('Could not fit gaussian process (singular kernel matrix); try increasing noise')
+    _, lengthScale, L, alpha = best
+    return {'X': X, 'L': L, 'alpha': alpha, 'lengthScale': lengthScale, 'yMean': yMean, 'yStd': yStd}
+
+
+# -------------------------------------------------------------------------------
+# Predicted mean and standard deviation of fitness at points X
+# -------------------------------------------------------------------------------
+def predictGP(model, X):
+    Ks = _maternKernel(np.asarray(X, dtype=float), model['X'], model['lengthScale'])
+    mean = Ks.dot(model['alpha'])
+    v = solve_triangular(model['L'], Ks.T, lower=True)
+    var = np.maximum(1.0 - (v**2).sum(0), 1e-12)
+    return mean * model['yStd'] + model['yMean'], np.sqrt(var) * model['yStd']
+
+
+# -------------------------------------------------------------------------------
+# Expected improvement over best (lowest) fitness; xi > 0 favours exploration
+# -------------------------------------------------------------------------------
+def expectedImprovement(mean, std, best, xi=0.01):
+    improvement = best - mean - xi
+    z = improvement / std
+    return improvement * norm.cdf(z) + std * norm.pdf(z)
+
+
+# -------------------------------------------------------------------------------
+# Latin hypercube sample of num points in [0, 1]^dims
+# -------------------------------------------------------------------------------
+def latinHypercube(num, dims, rand):
+    points = (np.arange(num)[:, None] + rand.uniform(size=(num, dims))) / num
+    for dim in range(dims):
+        points[:, dim] = points[rand.permutation(num), dim]
+    return points
+
+
+# -------------------------------------------------------------------------------
+# Propose batch of num points (normalized to [0, 1]) to evaluate next, maximizing expected improvement;
+# points in the same batch are chosen assuming previous ones have their predicted fitness (kriging believer)
+# -------------------------------------------------------------------------------
+def proposePoints(X, y, num, rand, xi=0.01, noise=1e-6, numSamples=2000):
+    X, y = np.array(X, dtype=float), np.array(y, dtype=float)
+    dims = X.shape[1]
+    proposed = []
+    for i in range(num):
+        model = fitGP(X, y, noise=noise)
+
+        # random samples + perturbations of the best points found so far
+        best = X[np.argsort(y)[:5]]
+        local = best[rand.randint(len(best), size=numSamples//2)] + rand.normal(0, 0.05, size=(numSamples//2, dims))
+        samples = np.clip(np.vstack((rand.uniform(size=(numSamples - numSamples//2, dims)), local)), 0, 1)
+
+        mean, std = predictGP(model, samples)
+        point = samples[np.argmax(expectedImprovement(mean, std, y.min(), xi))]
+        proposed.append(point)
+        X = np.vstack((X, point))
+        y = np.append(y, predictGP(model, point[None, :])[0])
+
+    return np.array(proposed)
@@ -51,9 +51,10 @@ class Cell (object):
     def recordStimSpikes (self):
         from .. import sim
 
-        sim.simData['stims'].update({'cell_'+str(self.gid): Dict()})
+        if 'cell_'+str(self.gid) not in sim.simData['stims']:  # pieces of split cells add to the same dict
+            sim.simData['stims'].update({'cell_'+str(self.gid): Dict()})
         for conn in self.conns:
-            if conn['preGid'] == 'NetStim':
+            if conn['preGid'] == 'NetStim' and conn.get('hObj') is not None:  # NetCon may be in the node of a split piece
                 stimSpikeVecs = h.Vector() # initialize vector to store 
                 conn['hObj'].record(stimSpikeVecs)
                 sim.simData['stims']['cell_'+str(self.gid)].update({conn['preLabel']: stimSpikeVecs})
@@ -137,6 +138,13 @@ class Cell (object):
             if sim.cfg.verbose: print(('  Created %s NetStim for cell gid=%d'% (params['source'], self.gid)))
         
         if sim.cfg.createNEURONObj:
+            # no NetStim; spike train played (from a gid not assigned to any cell) by the PatternStim of this node
+            if sim.cfg.netStimEvents and not isinstance(params['rate'], basestring):
+                sourceStims = [stim for stim in self.stims if stim.get('source') == params['source']]
+                index = next((i for i, stim in enumerate(sourceStims) if stim is stimContainer), len(sourceStims) - 1)  # index of this stim within this source
+                stimContainer['eventGid'] = sim.net._addNetStimEvents(params, self.gid, index)
+                return stimContainer['eventGid']
+
             rand = h.Random()
             stimContainer['hRandom'] = rand  # add netcon object to dict in conns list
 
@@ -162,6 +170,15 @@ class Cell (object):
             return stimContainer['hObj']
 
 
+    def _netStimNetCon (self, netstim, postTarget):
+        ''' NetCon from NetStim, or from the gid of its spike train (if cfg.netStimEvents) '''
+        from .. import sim
+
+        if isinstance(netstim, Number):
+            return sim.pc.gid_connect(netstim, postTarget)
+        return h.NetCon(netstim, postTarget)
+
+
     def recordTraces (self):
         from .. import sim
 
@@ -255,6 +272,9 @@ class Cell (object):
                                         sim.cvode.record(ptrItem, sim.simData[key]['cell_'+str(self.gid)][secLoc],
                                                          sim.simData['t'], 1)
                                     h.pop_section()
+                                elif sim.cfg.recordTracesBuffer:  # recorded into vectors flushed to file (see sim.setupRecordTracesBuffer)
+                                    sim.traceRecorders[key]['cellKeys'].append(('cell_'+str(self.gid), secLoc))
+                                    sim.traceRecorders[key]['ptrs'].append(ptrItem)
                                 else:
                                     
                                     sim.simData[key]['cell_'+str(self.gid)][secLoc] = h.Vector(sim.cfg.duration/recordStep+1).resize(0)
@@ -271,6 +291,9 @@ class Cell (object):
                                     sim.cvode.record(ptr, sim.simData[key]['cell_'+str(self.gid)],
                                                      sim.simData['t'], 1)                            
                                 h.pop_section()
+                            elif sim.cfg.recordTracesBuffer:  # recorded into vectors flushed to file (see sim.setupRecordTracesBuffer)
+                                sim.traceRecorders[key]['cellKeys'].append(('cell_'+str(self.gid), None))
+                                sim.traceRecorders[key]['ptrs'].append(ptr)
                             else:
                                 sim.simData[key]['cell_'+str(self.gid)] = h.Vector(sim.cfg.duration/sim.cfg.recordStep+1).resize(0)
                                 sim.simData[key]['cell_'+str(self.gid)].record(ptr, sim.cfg.recordStep)
@@ -290,9 +313,19 @@ class Cell (object):
         ''' Removes non-picklable h objects so can be pickled and sent via py_alltoall'''
         from .. import sim
 
-        odict = self.__dict__.copy() # copy the dict since we change it
-        odict = sim.copyRemoveItemObj(odict, keystart='h', exclude_list=['hebbwt']) #, newval=None)  # replace h objects with None so can be pickled
-        odict = sim.copyReplaceItemObj(odict, keystart='NeuroML', newval='---Removed_NeuroML_obj---')  # replace NeuroML objects with str so can be pickled
+        # single pass over cell attributes; conns and stims (most of the items) are copied with a comprehension
+        odict = Dict()
+        for key,val in self.__dict__.items():
+            if key in ['conns', 'stims'] and isinstance(val, list):
+                odict[key] = sim._copyStateList(val)
+            elif isinstance(val, (dict, list)):
+                odict[key] = sim._copyStateObj(val)
+            elif key[:1] == 'h' and key != 'hebbwt':  # remove h objects so can be pickled
+                continue
+            elif key[:7] == 'NeuroML':  # replace NeuroML objects with str so can be pickled
+                odict[key] = '---Removed_NeuroML_obj---'
+            else:
+                odict[key] = val
         return odict
 
 
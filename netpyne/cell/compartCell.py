@@ -79,31 +79,16 @@ class CompartCell (Cell):
             self.randRotationAngle = rand.uniform(0, 6.2832)  # 0 to 2pi
 
         
-        for propLabel, prop in sim.net.params.cellParams.items():  # for each set of cell properties
-            conditionsMet = 1
-            for (condKey,condVal) in prop['conds'].items():  # check if all conditions are met
-                if isinstance(condVal, list): 
-                    if isinstance(condVal[0], Number):
-                        if self.tags.get(condKey) < condVal[0] or self.tags.get(condKey) > condVal[1]:
-                            conditionsMet = 0
-                            break
-                    elif isinstance(condVal[0], basestring):
-                        if self.tags.get(condKey) not in condVal:
-                            conditionsMet = 0
-                            break 
-                elif self.tags.get(condKey) != condVal: 
-                    conditionsMet = 0
-                    break
-            if conditionsMet:  # if all conditions are met, set values for this cell
-                if sim.cfg.includeParamsLabel:
-                    if 'label' not in self.tags:
-                        self.tags['label'] = [propLabel] # create list of property sets
-                    else:
-                        self.tags['label'].append(propLabel)  # add label of cell property set to list of property sets for this cell
-                if sim.cfg.createPyStruct:
-                    self.createPyStruct(prop)
-                if sim.cfg.createNEURONObj:
-                    self.createNEURONObj(prop)  # add sections, mechanisms, synaptic mechanisms, geometry and topolgy specified by this property set
+        for propLabel, prop in sim.net._matchCellParamsRules(self.tags):  # for each set of cell properties whose conditions are met
+            if sim.cfg.includeParamsLabel:
+                if 'label' not in self.tags:
+                    self.tags['label'] = [propLabel] # create list of property sets
+                else:
+                    self.tags['label'].append(propLabel)  # add label of cell property set to list of property sets for this cell
+            if sim.cfg.createPyStruct:
+                self.createPyStruct(prop, propLabel)
+            if sim.cfg.createNEURONObj:
+                self.createNEURONObj(prop)  # add sections, mechanisms, synaptic mechanisms, geometry and topolgy specified by this property set
 
 
     def modify (self, prop):
@@ -135,36 +120,41 @@ class CompartCell (Cell):
                 self.createNEURONObj(prop)  # add sections, mechanisms, synaptic mechanisms, geometry and topolgy specified by this property set
 
 
-    def createPyStruct (self, prop):
+    def createPyStruct (self, prop, propLabel=None):
         from .. import sim
 
+        # prototype secs of this cellParams rule (not used when pt3d is rotated for each cell)
+        protoSecs = None
+        if propLabel is not None and sim.net.params.rotateCellsRandomly != True:
+            protoSecs = sim.net._cellRulePrototype(propLabel)
+
         # set params for all sections
         for sectName,sectParams in prop['secs'].items(): 
-            # create section
-            if sectName not in self.secs:
-                self.secs[sectName] = Dict()  # create section dict
-            sec = self.secs[sectName]  # pointer to section
-            
-            # add distributed mechanisms 
-            if 'mechs' in sectParams:
-                for mechName,mechParams in sectParams['mechs'].items(): 
-                    if 'mechs' not in sec:
-                        sec['mechs'] = Dict()
-                    if mechName not in sec['mechs']: 
-                        sec['mechs'][mechName] = Dict()  
-                    for mechParamName,mechParamValue in mechParams.items():  # add params of the mechanism
-                        sec['mechs'][mechName][mechParamName] = mechParamValue
-            
-            # add ion info 
-            if 'ions' in sectParams:
-                for ionName,ionParams in sectParams['ions'].items(): 
-                    if 'ions' not in sec:
-                        sec['ions'] = Dict()
-                    if ionName not in sec['ions']: 
-                        sec['ions'][ionName] = Dict()  
-                    for ionParamName,ionParamValue in ionParams.items():  # add params of the ion
-                        sec['ions'][ionName][ionParamName] = ionParamValue
+            if protoSecs is not None and sectName not in self.secs:
+                self.secs[sectName] = Dict(protoSecs[sectName])  # copy prototype section
+                sec = self.secs[sectName]  # pointer to section
+                for pointpName,pointpParams in sectParams.get('pointps', {}).items():
+                    for pointpParamName,pointpParamValue in pointpParams.items():
+                        if pointpParamValue == 'gid': 
+                            sec['pointps'][pointpName][pointpParamName] = self.gid
+            else:
+                # create section
+                if sectName not in self.secs:
+                    self.secs[sectName] = Dict()  # create section dict
+                sec = self.secs[sectName]  # pointer to section
 
+                # rotate 3d geometry 
+                if 'geom' in sectParams and 'pt3d' in sectParams['geom'] and sim.net.params.rotateCellsRandomly == True:
+                    for ipt, pt3d in enumerate(sectParams['geom']['pt3d']):
+                        """Rotate the cell about the Z axis."""
+                        x = pt3d[0]
+                        z = pt3d[2]
+                        c = cos(self.randRotationAngle)
+                        s = sin(self.randRotationAngle)
+                        pt3d = (x * c - z * s, pt3d[1], x * s + z * c, pt3d[3])
+                        sectParams['geom']['pt3d'][ipt] = pt3d
+
+                self._setSecPyStruct(sec, sectParams, self.gid)
 
             # add synMechs
             if 'synMechs' in sectParams:
@@ -172,72 +162,85 @@ class CompartCell (Cell):
                     if 'label' in synMech and 'loc' in synMech:
                         self.addSynMech(synLabel=synMech['label'], secLabel=sectName, loc=synMech['loc'])
 
-            # add point processes
-            if 'pointps' in sectParams:
-                for pointpName,pointpParams in sectParams['pointps'].items(): 
-                    #if self.tags['cellModel'] == pointpName: # only required if want to allow setting various cell models in same rule
-                    if 'pointps' not in sec:
-                        sec['pointps'] = Dict()
-                    if pointpName not in sec['pointps']: 
-                        sec['pointps'][pointpName] = Dict()  
-                    for pointpParamName,pointpParamValue in pointpParams.items():  # add params of the mechanism
-                        if pointpParamValue == 'gid': 
-                            pointpParamValue = self.gid
-                        sec['pointps'][pointpName][pointpParamName] = pointpParamValue
-
-
-            # add geometry params 
-            if 'geom' in sectParams:
-                for geomParamName,geomParamValue in sectParams['geom'].items():  
-                    if 'geom' not in sec:
-                        sec['geom'] = Dict()
-                    if not type(geomParamValue) in [list, dict]:  # skip any list or dic params
-                        sec['geom'][geomParamName] = geomParamValue
-
-                # add 3d geometry
-                if 'pt3d' in sectParams['geom']:
-                    if 'pt3d' not in sec['geom']:  
-                        sec['geom']['pt3d'] = []
-                    for ipt, pt3d in enumerate(sectParams['geom']['pt3d']):
-                        if sim.net.params.rotateCellsRandomly == True:
-                            """Rotate the cell about the Z axis."""
-                            x = pt3d[0]
-                            z = pt3d[2]
-                            c = cos(self.randRotationAngle)
-                            s = sin(self.randRotationAngle)
-                            pt3d = (x * c - z * s, pt3d[1], x * s + z * c, pt3d[3])
-                            sectParams['geom']['pt3d'][ipt] = pt3d
-
-                        sec['geom']['pt3d'].append(pt3d)
-
-            # add topolopgy params
-            if 'topol' in sectParams:
-                if 'topol' not in sec:
-                    sec['topol'] = Dict()
-                for topolParamName,topolParamValue in sectParams['topol'].items(): 
-                    sec['topol'][topolParamName] = topolParamValue
-
-            # add other params
-            if 'spikeGenLoc' in sectParams:
-                sec['spikeGenLoc'] = sectParams['spikeGenLoc']
-
-            if 'vinit' in sectParams:
-                sec['vinit'] = sectParams['vinit']
-
-            if 'weightNorm' in sectParams:
-                sec['weightNorm'] = sectParams['weightNorm']
-
-            if 'threshold' in sectParams:
-                sec['threshold'] = sectParams['threshold']
-
         # add sectionLists
         if 'secLists' in prop:
             self.secLists.update(prop['secLists'])  # diction of section lists
 
 
+    @staticmethod
+    def _setSecPyStruct (sec, sectParams, gid=None):
+        # add distributed mechanisms 
+        if 'mechs' in sectParams:
+            for mechName,mechParams in sectParams['mechs'].items(): 
+                if 'mechs' not in sec:
+                    sec['mechs'] = Dict()
+                if mechName not in sec['mechs']: 
+                    sec['mechs'][mechName] = Dict()  
+                for mechParamName,mechParamValue in mechParams.items():  # add params of the mechanism
+                    sec['mechs'][mechName][mechParamName] = mechParamValue
+        
+        # add ion info 
+        if 'ions' in sectParams:
+            for ionName,ionParams in sectParams['ions'].items(): 
+                if 'ions' not in sec:
+                    sec['ions'] = Dict()
+                if ionName not in sec['ions']: 
+                    sec['ions'][ionName] = Dict()  
+                for ionParamName,ionParamValue in ionParams.items():  # add params of the ion
+                    sec['ions'][ionName][ionParamName] = ionParamValue
+
+        # add point processes
+        if 'pointps' in sectParams:
+            for pointpName,pointpParams in sectParams['pointps'].items(): 
+                #if self.tags['cellModel'] == pointpName: # only required if want to allow setting various cell models in same rule
+                if 'pointps' not in sec:
+                    sec['pointps'] = Dict()
+                if pointpName not in sec['pointps']: 
+                    sec['pointps'][pointpName] = Dict()  
+                for pointpParamName,pointpParamValue in pointpParams.items():  # add params of the mechanism
+                    if pointpParamValue == 'gid' and gid is not None: 
+                        pointpParamValue = gid
+                    sec['pointps'][pointpName][pointpParamName] = pointpParamValue
+
+        # add geometry params 
+        if 'geom' in sectParams:
+            for geomParamName,geomParamValue in sectParams['geom'].items():  
+                if 'geom' not in sec:
+                    sec['geom'] = Dict()
+                if not type(geomParamValue) in [list, dict]:  # skip any list or dic params
+                    sec['geom'][geomParamName] = geomParamValue
+
+            # add 3d geometry
+            if 'pt3d' in sectParams['geom']:
+                if 'pt3d' not in sec['geom']:  
+                    sec['geom']['pt3d'] = []
+                for pt3d in sectParams['geom']['pt3d']:
+                    sec['geom']['pt3d'].append(pt3d)
+
+        # add topolopgy params
+        if 'topol' in sectParams:
+            if 'topol' not in sec:
+                sec['topol'] = Dict()
+            for topolParamName,topolParamValue in sectParams['topol'].items(): 
+                sec['topol'][topolParamName] = topolParamValue
+
+        # add other params
+        if 'spikeGenLoc' in sectParams:
+            sec['spikeGenLoc'] = sectParams['spikeGenLoc']
+
+        if 'vinit' in sectParams:
+            sec['vinit'] = sectParams['vinit']
+
+        if 'weightNorm' in sectParams:
+            sec['weightNorm'] = sectParams['weightNorm']
+
+        if 'threshold' in sectParams:
+            sec['threshold'] = sectParams['threshold']
+
+
     def initV (self): 
         for sec in list(self.secs.values()):
-            if 'vinit' in sec:
+            if 'vinit' in sec and sec.get('hObj'):  # skip sections moved to other nodes (multisplit)
                 sec['hObj'].v = sec['vinit']
 
 
@@ -361,6 +364,17 @@ class CompartCell (Cell):
                             print('# Error inserting %s mechanims in %s section! (check mod files are compiled)'%(mechName, sectName)) 
                         continue
                     for mechParamName,mechParamValue in mechParams.items():  # add params of the mechanism
+                        if type(mechParamValue) in [list] and len(mechParamValue) == 1: 
+                            mechParamValue = mechParamValue[0]
+                        if type(mechParamValue) not in [list]:  # scalar value: set for the whole section at once
+                            if mechParamValue is not None:  # avoid setting None values
+                                try:
+                                    setattr(sec['hObj'], mechParamName+'_'+mechName, mechParamValue)
+                                    continue
+                                except:
+                                    pass  # eg. not a range variable; set in each segment below
+                            else:
+                                continue
                         mechParamValueFinal = mechParamValue
                         for iseg,seg in enumerate(sec['hObj']):  # set mech params for each segment
                             if type(mechParamValue) in [list]: 
@@ -385,7 +399,9 @@ class CompartCell (Cell):
                         continue
                     for ionParamName,ionParamValue in ionParams.items():  # add params of the mechanism
                         ionParamValueFinal = ionParamValue
-                        for iseg,seg in enumerate(sec['hObj']):  # set ion params for each segment
+                        # scalar values are set for the whole section at once
+                        segs = [sec['hObj']] if type(ionParamValue) not in [list] else list(sec['hObj'])
+                        for iseg,seg in enumerate(segs):  # set ion params for each segment
                             if type(ionParamValue) in [list]: 
                                 ionParamValueFinal = ionParamValue[iseg]
                             if ionParamName == 'e':
@@ -476,6 +492,17 @@ class CompartCell (Cell):
                 stimParams['hObj'] = stim  # add stim object to dict in stims list
            
 
+    def _addGapJunctionVars(self, synMech, secLabel, loc, weight, gapId, sourceGapId):
+        ''' Set gap junction weight and queue its source (local v) and target (vpeer) vars to be registered by sim.net'''
+        from .. import sim
+
+        synMech['hObj'].weight = weight
+        hSec = self.secs[secLabel]['hObj']
+        sourceVar = hSec(loc)._ref_v
+        targetVar = synMech['hObj']._ref_vpeer  # assumes variable is vpeer -- make a parameter
+        sim.net._gapJunctionVars.append((targetVar, gapId, sourceVar, sourceGapId, hSec))
+
+
     # Create NEURON objs for conns and syns if included in prop (used when loading)
     def addConnsNEURONObj(self):
         # Note: loading connections to point process (eg. Izhi2007a) not yet supported
@@ -484,12 +511,13 @@ class CompartCell (Cell):
         from .. import sim
 
         # assumes python structure exists
+        netStimsUsed = {}  # number of NetStims of each source already connected
         for conn in self.conns:
             # set postsyn target
             if sim.cfg.oneSynPerNetcon:
                 synMech = None
             else: 
-                synMech = next((synMech for synMech in self.secs[conn['sec']]['synMechs'] if synMech['label'] == conn['synMech'] and synMech['loc'] == conn['loc']), None)
+                synMech = next((synMech for synMech in self.secs[conn['sec']].get('synMechs', []) if synMech['label'] == conn['synMech'] and synMech['loc'] == conn['loc']), None)
             
             if not synMech:
                 synMech = self.addSynMech(conn['synMech'], conn['sec'], conn['loc'])
@@ -504,11 +532,20 @@ class CompartCell (Cell):
                 import sys
                 sys.exit()
 
+            # gap junctions (no NetCon)
+            if conn.get('gapJunction') in ['pre', 'post']:
+                self._addGapJunctionVars(synMech, conn['sec'], conn['loc'], conn['weight'], conn['gapId'], conn['preGapId'])
+                continue
+
             # create NetCon
             if conn['preGid'] == 'NetStim':
-                netstim = next((stim['hObj'] for stim in self.stims if stim['source']==conn['preLabel']), None)
+                # each NetStim conn was created with its own NetStim (in the same order)
+                sourceStims = [stim.get('eventGid', stim.get('hObj')) for stim in self.stims if stim['source']==conn['preLabel'] and (stim.get('hObj') or 'eventGid' in stim)]
+                index = netStimsUsed.get(conn['preLabel'], 0)
+                netStimsUsed[conn['preLabel']] = index + 1
+                netstim = sourceStims[index] if index < len(sourceStims) else (sourceStims[0] if sourceStims else None)
                 if netstim:
-                    netcon = h.NetCon(netstim, postTarget)
+                    netcon = self._netStimNetCon(netstim, postTarget)
                 else: continue
             else:
                 #cell = next((c for c in sim.net.cells if c.gid == conn['preGid']), None)
@@ -752,14 +789,11 @@ class CompartCell (Cell):
             if sim.cfg.createNEURONObj:
                 # gap junctions
                 if params.get('gapJunction', 'False') in [True, 'pre', 'post']:  # create NEURON obj for pre and post
-                    synMechs[i]['hObj'].weight = weights[i]
-                    sourceVar = self.secs[synMechSecs[i]]['hObj'](synMechLocs[i])._ref_v
-                    targetVar = synMechs[i]['hObj']._ref_vpeer  # assumes variable is vpeer -- make a parameter
-                    sec = self.secs[synMechSecs[i]]
-                    sim.pc.target_var(targetVar, connParams['gapId'])
-                    self.secs[synMechSecs[i]]['hObj'].push()
-                    sim.pc.source_var(sourceVar, connParams['preGapId'])
-                    h.pop_section()
+                    if params.get('gapJunction') == True:
+                        gapId, sourceGapId = postGapId, preGapId
+                    else:
+                        gapId, sourceGapId = params['gapId'], params['preGapId']
+                    self._addGapJunctionVars(synMechs[i], synMechSecs[i], synMechLocs[i], weights[i], gapId, sourceGapId)
                     netcon = None
 
                 # connections using NetCons
@@ -772,7 +806,7 @@ class CompartCell (Cell):
                         postTarget = synMechs[i]['hObj'] # local synaptic mechanism
 
                     if netStimParams:
-                        netcon = h.NetCon(netstim, postTarget) # create Netcon between netstim and target
+                        netcon = self._netStimNetCon(netstim, postTarget) # create Netcon between netstim and target
                     else:
                         netcon = sim.pc.gid_connect(params['preGid'], postTarget) # create Netcon between global gid and target
                     
@@ -1202,7 +1236,6 @@ class CompartCell (Cell):
     def _distributeSynsUniformly (self, secList, numSyns):
         from .. import sim
 
-        from numpy import cumsum
         try:
             if 'L' in self.secs[secList[0]]['geom']:
                 secLengths = [self.secs[s]['geom']['L'] for s in secList]
@@ -1213,13 +1246,14 @@ class CompartCell (Cell):
                 if sim.cfg.verbose: 
                     print(('  Section lengths not available to distribute synapses in cell %d'%self.gid))
 
-            secLengths = [x for x in secLengths if isinstance(x, Number)]
-            totLength = sum(secLengths)
-            cumLengths = list(cumsum(secLengths))
-            absLocs = [i*(totLength/numSyns)+totLength/numSyns/2 for i in range(numSyns)]
-            inds = [cumLengths.index(next(x for x in cumLengths if x >= absLoc)) for absLoc in absLocs] 
+            secLengths = np.array([x for x in secLengths if isinstance(x, Number)], dtype=float)
+            totLength = secLengths.sum()
+            cumLengths = np.cumsum(secLengths)
+            absLocs = np.arange(numSyns)*(totLength/numSyns)+totLength/numSyns/2 if numSyns else np.zeros(0)
+            inds = np.searchsorted(cumLengths, absLocs, side='left')  # first section whose cumulative length is >= absLoc
+            if numSyns and inds.max() >= len(cumLengths): raise IndexError  # rounding errors at the end of the last section
             secs = [secList[ind] for ind in inds]
-            locs = [(cumLengths[ind] - absLoc) / secLengths[ind] for absLoc,ind in zip(absLocs,inds)]
+            locs = ((cumLengths[inds] - absLocs) / secLengths[inds]).tolist()
         except:
             secs, locs = [],[]
         return secs, locs
@@ -1275,6 +1309,8 @@ class CompartCell (Cell):
         ''' Calculate absolute seg coords by translating the relative seg coords -- used for LFP calc'''
         from .. import sim
 
+        if getattr(self, '_splitPiece', False): return  # seg coords of pieces of split cells are set by their home node
+
         p3dsoma = self.getSomaPos()
         pop = self.tags['pop']
         morphSegCoords = sim.net.pops[pop]._morphSegCoords
@@ -1285,11 +1321,16 @@ class CompartCell (Cell):
         self._segCoords['p0'] = p3dsoma + morphSegCoords['p0']
         self._segCoords['p1'] = p3dsoma + morphSegCoords['p1']
 
+        # only segments of sections in this node (multisplit)
+        if getattr(self, '_segMask', None) is not None and len(self._segMask) == self._segCoords['p0'].shape[1]:
+            self._segCoords = {k: v[:, self._segMask] for k, v in self._segCoords.items()}
+
     def setImembPtr(self): 
         """Set PtrVector to point to the i_membrane_"""
         jseg = 0
         for sec in list(self.secs.values()):
             hSec = sec['hObj']
+            if hSec is None: continue  # moved to another node (multisplit)
             for iseg, seg in enumerate(hSec):
                 self.imembPtr.pset(jseg, seg._ref_i_membrane_)  # notice the underscore at the end (in nA)
                 jseg += 1
@@ -1308,7 +1349,7 @@ class CompartCell (Cell):
         z = self.tags['z']
                 
         for sec in list(self.secs.values()):
-            if 'geom' in sec and 'pt3d' not in sec['geom']:  # only cells that didn't have pt3d before
+            if 'geom' in sec and 'pt3d' not in sec['geom'] and sec.get('hObj'):  # only cells that didn't have pt3d before
                 sec['geom']['pt3d'] = []
                 sec['hObj'].push()
                 n3d = int(h.n3d())  # get number of n3d points in each section
@@ -22,6 +22,64 @@ except NameError:
 from neuron import h
 import numpy as np
 
+def drawRandomStream(rand, num, blockSize=100000):
+    ''' draws the next num values of a Random123 generator using its current distribution
+    input params:
+    - rand: h.Random() initialized with Random123 and with the distribution already set (eg. rand.negexp(mean))
+    - num: number of values to draw
+    - blockSize: max number of values drawn in each call to hoc
+    Each block is positioned using the Random123 counter (rand.seq), so the values don't depend on blockSize
+    and are the same as if drawn one at a time
+    '''
+    pos = int(rand.seq())
+    vals = np.zeros(num)
+    vec = h.Vector()
+    for i in range(0, num, blockSize):
+        n = min(blockSize, num-i)
+        rand.seq(pos+i)
+        vec.resize(n)
+        vec.setrand(rand)
+        vals[i:i+n] = vec.as_numpy()
+    return vals
+
+
+def createNegexpStream(rand, mean, num, blockSize=100000):
+    ''' draws num values from the negexp distribution of a Random123 generator (after the one returned when setting it)
+    input params:
+    - rand: h.Random() initialized with Random123
+    - mean: mean of the negexp distribution
+    - num: number of values to draw
+    - blockSize: max number of values drawn in each call to hoc
+    '''
+    rand.negexp(mean)
+    return drawRandomStream(rand, num, blockSize)
+
+
+def createNoisyIntervalTrains(rands, interval, start, noise, duration):
+    ''' creates spike trains with fixed interval plus noise (same as NetStim)
+    input params:
+    - rands: list of h.Random() initialized with Random123, one per spike train
+    - interval: mean interval between spikes (ms)
+    - start: most likely start time of first spike (ms)
+    - noise: fractional randomness (0 deterministic, 1 negexp interval distrib)
+    - duration: duration over which to generate spikes (ms)
+    returns 2D array (trains x spikes) of spike times
+    '''
+    # fixed interval of duration (1 - noise)*interval 
+    numSpks = int((1+1.5*noise)*duration/interval)  # generate 1+1.5*noise spikes to account for noise
+    intervals = np.full((len(rands), numSpks), (1.0-noise)*interval)
+
+    # randomize the first spike so on average it occurs at start + noise*interval
+    # invl = (1. - noise)*mean + noise*mean*erand() - interval*(1. - noise)
+    if noise == 0.0:
+        return np.cumsum(intervals, axis=1) + (start - interval)
+
+    # plus negexp interval of mean duration noise*interval. Note that the most likely negexp interval has duration 0.
+    for itrain, rand in enumerate(rands):
+        intervals[itrain] += createNegexpStream(rand, noise*interval, numSpks)
+    return np.cumsum(intervals, axis=1) + (start - interval*(1-noise))
+
+
 def createRhythmicPattern(params, rand):
     ''' creates the ongoing external inputs (rhythmic)
     input params:
@@ -149,13 +207,19 @@ def createPoissonPattern(params, rand):
     # start the initial value
     val_pois = np.array([])
     if lamtha > 0.:
-        t_gen = t0 + (-1000. * np.log(1. - rand.uniform(0,1)) / lamtha)
-        if t_gen < T: np.append(val_pois, t_gen)
-        # vals are guaranteed to be monotonically increasing, no need to sort
+        t_gen = t0 + (-1000. * np.log(1. - rand.uniform(0,1)) / lamtha)  # note: first value is not included in the output
+        # draw intervals in blocks (of ~expected num of spikes) until reaching T
+        blockSize = int(1.2 * lamtha * max(T - t0, 0) / 1000.) + 10
+        t_blocks = []
         while t_gen < T:
-            # so as to not clobber confusingly base off of t_gen ...
-            t_gen += (-1000. * np.log(1. - rand.uniform(0,1)) / lamtha)
-            if t_gen < T: val_pois = np.append(val_pois, t_gen)
+            isis = -1000. * np.log(1. - drawRandomStream(rand, blockSize)) / lamtha
+            t_block = np.cumsum(np.append(t_gen, isis))[1:]  # sequential sum, same as adding one at a time
+            t_blocks.append(t_block)
+            t_gen = t_block[-1]
+        if t_blocks:
+            val_pois = np.concatenate(t_blocks)
+            # vals are guaranteed to be monotonically increasing, no need to sort
+            val_pois = val_pois[val_pois < T]
        
     return val_pois
 
@@ -120,51 +120,11 @@ class PointCell (Cell):
                 start = self.params['start'] if 'start' in self.params else 0.0
                 noise = self.params['noise'] if 'noise' in self.params else 0.0
 
-                maxReproducibleSpks = 1e4  # num of rand spikes generated; only a subset is used; ensures reproducibility 
-
-                # fixed interval of duration (1 - noise)*interval 
-                fixedInterval = np.full(int(((1+1.5*noise)*sim.cfg.duration/interval)), [(1.0-noise)*interval])  # generate 1+1.5*noise spikes to account for noise
-                numSpks = len(fixedInterval)
-
-                # randomize the first spike so on average it occurs at start + noise*interval
-                # invl = (1. - noise)*mean + noise*mean*erand() - interval*(1. - noise)    
-                if noise == 0.0:
-                    vec = h.Vector(len(fixedInterval))
-                    spkTimes =  np.cumsum(fixedInterval) + (start - interval) 
-                else:
-                    # plus negexp interval of mean duration noise*interval. Note that the most likely negexp interval has duration 0.
-                    rand = h.Random()
-                    rand.Random123(sim.hashStr('vecstim_spkt'), self.gid, self.params['seed'])
-
-                    # Method 1: vec length depends on duration -- not reproducible
-                    # vec = h.Vector(numSpks)
-                    # rand.negexp(noise*interval)
-                    # vec.setrand(rand)
-                    # negexpInterval= np.array(vec)                     
-                    # #print negexpInterval
-                    # spkTimes = np.cumsum(fixedInterval + negexpInterval) + (start - interval*(1-noise))
-
-                    if numSpks < 100:
-                        # Method 2: vec length=1, slower but reproducible
-                        vec = h.Vector(1) 
-                        rand.negexp(noise*interval)
-                        negexpInterval = []
-                        for i in range(numSpks):
-                            vec.setrand(rand)
-                            negexpInterval.append(vec.x[0])  # = np.array(vec)[0:len(fixedInterval)]                     
-                        spkTimes = np.cumsum(fixedInterval + np.array(negexpInterval)) + (start - interval*(1-noise))
-
-                    elif numSpks < maxReproducibleSpks:
-                        # Method 3: vec length=maxReproducibleSpks, then select subset; slower but reproducible
-                        vec = h.Vector(maxReproducibleSpks)
-                        rand.negexp(noise*interval)
-                        vec.setrand(rand)
-                        negexpInterval = np.array(vec.c(0,len(fixedInterval)-1))                  
-                        spkTimes = np.cumsum(fixedInterval + negexpInterval) + (start - interval*(1-noise))
-
-                    else:
-                        print('\nError: exceeded the maximum number of VecStim spikes per cell (%d > %d)' % (numSpks, maxReproducibleSpks))
-                        return
+                from .inputs import createNoisyIntervalTrains
+                rand = h.Random()
+                rand.Random123(sim.hashStr('vecstim_spkt'), self.gid, self.params['seed'])
+                spkTimes = createNoisyIntervalTrains([rand], interval, start, noise, sim.cfg.duration)[0]
+                vec = h.Vector(len(spkTimes))
 
             # spikePattern
             elif 'spikePattern' in self.params:
@@ -240,40 +200,12 @@ class PointCell (Cell):
                         start = pulse['start']
                         end = pulse['end']
 
-                        # fixed interval of duration (1 - noise)*interval 
-                        fixedInterval = np.full(int(((1+1.5*noise)*(end-start)/interval)), [(1.0-noise)*interval])  # generate 1+0.5*noise spikes to account for noise
-                        numSpks = len(fixedInterval)
-
-                        # randomize the first spike so on average it occurs at start + noise*interval
-                        # invl = (1. - noise)*mean + noise*mean*erand() - interval*(1. - noise)
-                        if noise == 0.0:
-                            vec = h.Vector(len(fixedInterval))
-                            pulseSpikes = np.cumsum(fixedInterval) + (start - interval)
-                            pulseSpikes[pulseSpikes < start] = start
-                            spkTimes = np.append(spkTimes, pulseSpikes[pulseSpikes <= end])
-                        else:
-                            # plus negexp interval of mean duration noise*interval. Note that the most likely negexp interval has duration 0.
-                            rand = h.Random()
-                            rand.Random123(ipulse, self.gid, self.params['seed'])
-                            
-                            # Method 1: vec length depends on duration -- not reproducible
-                            # vec = h.Vector(len(fixedInterval))
-                            # rand.negexp(noise*interval)
-                            # vec.setrand(rand)
-                            # negexpInterval = np.array(vec) 
-                            # pulseSpikes = np.cumsum(fixedInterval + negexpInterval) + (start - interval*(1-noise))
-
-                            # Method 2: vec length=1, slower but reproducible
-                            vec = h.Vector(1) 
-                            rand.negexp(noise*interval)
-                            negexpInterval = []
-                            for i in range(numSpks):
-                                vec.setrand(rand)
-                                negexpInterval.append(vec.x[0])  # = np.array(vec)[0:len(fixedInterval)]                    
-                            pulseSpikes = np.cumsum(fixedInterval + np.array(negexpInterval)) + (start - interval*(1-noise))
-     
-                            pulseSpikes[pulseSpikes < start] = start
-                            spkTimes = np.append(spkTimes, pulseSpikes[pulseSpikes <= end])
+                        from .inputs import createNoisyIntervalTrains
+                        rand = h.Random()
+                        rand.Random123(ipulse, self.gid, self.params['seed'])
+                        pulseSpikes = createNoisyIntervalTrains([rand], interval, start, noise, end-start)[0]
+                        pulseSpikes[pulseSpikes < start] = start
+                        spkTimes = np.append(spkTimes, pulseSpikes[pulseSpikes <= end])
 
             spkTimes[spkTimes < 0] = 0
             spkTimes = np.sort(spkTimes)
@@ -365,7 +297,7 @@ class PointCell (Cell):
                     postTarget = self.hPointp
 
                 if netStimParams:
-                    netcon = h.NetCon(netstim, postTarget) # create Netcon between netstim and target
+                    netcon = self._netStimNetCon(netstim, postTarget) # create Netcon between netstim and target
                 else:
                     netcon = sim.pc.gid_connect(params['preGid'], postTarget) # create Netcon between global gid and target
                 
@@ -418,6 +350,33 @@ class PointCell (Cell):
                     print(('  Created connection preGid=%s' % (preGid)))
 
 
+    # Create NEURON objs for stims and conns in python structure (used when restoring network from cache)
+    def addStimsNEURONObj (self):
+        for stimParams in self.stims:
+            if stimParams.get('type') == 'NetStim':
+                self.addNetStim(stimParams, stimContainer=stimParams)
+
+
+    def addConnsNEURONObj (self):
+        from .. import sim
+
+        netStimsUsed = {}  # number of NetStims of each source already connected
+        for conn in self.conns:
+            postTarget = getattr(self.hPointp, '_ref_'+self.tags['vref']) if 'vref' in self.tags else self.hPointp
+            if conn['preGid'] == 'NetStim':
+                # each NetStim conn was created with its own NetStim (in the same order)
+                sourceStims = [stim.get('eventGid', stim.get('hObj')) for stim in self.stims if stim.get('source') == conn['preLabel'] and (stim.get('hObj') or 'eventGid' in stim)]
+                index = netStimsUsed.get(conn['preLabel'], 0)
+                netStimsUsed[conn['preLabel']] = index + 1
+                if not sourceStims: continue
+                netcon = self._netStimNetCon(sourceStims[min(index, len(sourceStims)-1)], postTarget)
+            else:
+                netcon = sim.pc.gid_connect(conn['preGid'], postTarget)
+            netcon.weight[0] = conn['weight']
+            netcon.delay = conn['delay']
+            conn['hObj'] = netcon
+
+
     def initV (self):
         pass
 
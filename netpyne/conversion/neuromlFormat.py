@@ -1435,10 +1435,7 @@ if neuromlExists:
                     
         
         # add gap junctions of presynaptic cells (need to do separately because could be in different ranks)
-        for preGapParams in getattr(sim.net, 'preGapJunctions', []):
-            if preGapParams['gid'] in sim.net.gid2lid:  # only cells in this rank
-                cell = sim.net.cells[sim.net.gid2lid[preGapParams['gid']]] 
-                cell.addConn(preGapParams)
+        sim.net._addPreGapJunctions()
                 
         print('  Number of connections on node %i: %i ' % (sim.rank, sum([len(cell.conns) for cell in sim.net.cells])))
 
@@ -38,7 +38,7 @@ metadata = {
                     "density": {
                         "label": "Cell density (neurons/mm^3)",
                         "suggestions": "",
-                        "help": "The cell density in neurons/mm3. The volume occupied by each population can be customized (see xRange, yRange and zRange); otherwise the full network volume will be used (defined in netParams: sizeX, sizeY, sizeZ). density can be expressed as a function of normalized location (xnorm, ynorm or znorm), by providing a string with the variable and any common Python mathematical operators/functions. e.g. '1e5 * exp(-ynorm/2)'. ",
+                        "help": "The cell density in neurons/mm3. The volume occupied by each population can be customized (see xRange, yRange and zRange); otherwise the full network volume will be used (defined in netParams: sizeX, sizeY, sizeZ). density can be expressed as a function of normalized location (xnorm, ynorm or znorm), by providing a string with the variables and any common Python mathematical operators/functions (evaluated using numpy). e.g. '1e5 * exp(-ynorm/2)' or '1e5 * xnorm * (1-ynorm)'. ",
                         "hintText": "density in neurons/mm3",
                         "type": "str"
                     },
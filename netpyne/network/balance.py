@@ -0,0 +1,179 @@
+"""
+balance.py
+
+Methods to distribute cells across nodes based on their estimated computational cost
+
+Contributors: salvadordura@gmail.com
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+
+from future import standard_library
+standard_library.install_aliases()
+from numbers import Number
+import heapq
+
+# default relative cost of each cell component
+_defaultCostWeights = {'segment': 1.0, 'mechanism': 1.0, 'synapse': 0.5, 'artificial': 0.1}
+
+
+# -----------------------------------------------------------------------------
+# Assign cells of all pops with known number of cells to nodes (greedy LPT)
+# -----------------------------------------------------------------------------
+def _balanceCells (self):
+    from .. import sim
+
+    balanceParams = sim.cfg.loadBalanceCells if isinstance(sim.cfg.loadBalanceCells, dict) else {}
+    self._hostLoads = [(0.0, host) for host in range(sim.nhosts)]  # heap of (estimated load, node)
+    self._popHostCells = {}
+
+    # measured costs per cell of each pop from a previous run (see sim.loadBalance)
+    self._measuredCellCosts, self._measuredCostScale = {}, 1.0
+    if balanceParams.get('costsFile'):
+        import json
+        with open(balanceParams['costsFile'], 'r') as fileObj:
+            measuredCosts = json.load(fileObj)['costs']
+        # scale estimated costs of pops not in file (eg. new pops) to the units of the measured costs
+        ratios = sorted(cost / self._popCellCost(self.pops[label]) for label, cost in measuredCosts.items() if label in self.pops)
+        if ratios:
+            self._measuredCostScale = ratios[len(ratios)//2]
+        self._measuredCellCosts = measuredCosts
+
+    # longest processing time first: most expensive cells are assigned first, each to the least loaded node
+    pops = [(self._popCellCost(pop), label, self._popNumCells(pop)) for label, pop in self.pops.items()]
+    for cellCost, label, numCells in sorted(pops, key=lambda x: -x[0]):
+        if numCells is not None:
+            self._popHostCells[label] = (numCells, self._balancedHostCells(self.pops[label], numCells, cellCost))
+
+    if sim.rank == 0 and sim.cfg.verbose:
+        print('  Estimated load per node: %s' % ({host: round(load, 2) for load, host in sorted(self._hostLoads, key=lambda x: x[1])}))
+
+
+# -----------------------------------------------------------------------------
+# Indices of cells of a pop assigned to each node
+# -----------------------------------------------------------------------------
+def _balancedHostCells (self, pop, numCellsPop, cellCost=None):
+    from .. import sim
+
+    # pops created with the number of cells that was expected are already assigned
+    if cellCost is None and pop.tags['pop'] in getattr(self, '_popHostCells', {}):
+        numCells, hostCells = self._popHostCells[pop.tags['pop']]
+        if numCells == numCellsPop:
+            return hostCells
+
+    # otherwise (eg. density-based pops) add cells to the current least loaded nodes
+    if getattr(self, '_hostLoads', None) is None:
+        self._hostLoads = [(0.0, host) for host in range(sim.nhosts)]
+    if cellCost is None:
+        cellCost = self._popCellCost(pop)
+
+    hostCells = {host: [] for host in range(sim.nhosts)}
+    for i in range(numCellsPop):  # all cells of a pop have the same estimated cost
+        load, host = heapq.heappop(self._hostLoads)
+        hostCells[host].append(i)
+        heapq.heappush(self._hostLoads, (load + cellCost, host))
+    return hostCells
+
+
+# -----------------------------------------------------------------------------
+# Number of cells of a pop, if known before creating it
+# -----------------------------------------------------------------------------
+def _popNumCells (self, pop):
+    if 'cellsList' in pop.tags:
+        return len(pop.tags['cellsList'])
+    elif 'numCells' in pop.tags and 'density' not in pop.tags:
+        return int(self.params.scale * pop.tags['numCells'])
+    return None
+
+
+# -----------------------------------------------------------------------------
+# Estimated cost of each cell of a pop
+# -----------------------------------------------------------------------------
+def _popCellCost (self, pop):
+    from .. import sim
+
+    balanceParams = sim.cfg.loadBalanceCells if isinstance(sim.cfg.loadBalanceCells, dict) else {}
+    if pop.tags['pop'] in getattr(self, '_measuredCellCosts', {}):
+        return self._measuredCellCosts[pop.tags['pop']]
+    scale = getattr(self, '_measuredCostScale', 1.0)
+
+    weights = dict(_defaultCostWeights)
+    weights.update(balanceParams.get('weights', {}))
+
+    if pop.cellModelClass == sim.PointCell:
+        if pop.tags.get('cellModel') in ['NetStim', 'VecStim'] or 'spkTimes' in pop.tags:
+            return scale * weights['artificial']  # only generate events
+        cellCost = weights['segment'] + weights['mechanism']  # point neuron
+    else:
+        ruleCosts = [self._cellRuleCost(prop, weights) for _, prop, discreteConds, _ in self._cellParamsRules
+            if self._popMatchesConds(pop.tags, {condKey: condVal for condKey, _, condVal in discreteConds})]
+        cellCost = sum(ruleCosts) / len(ruleCosts) if ruleCosts else weights['segment']
+
+    return scale * (cellCost + weights['synapse'] * self._expectedSynsPerCell(pop))
+
+
+# -----------------------------------------------------------------------------
+# Estimated cost of a cell created from a cellParams rule
+# -----------------------------------------------------------------------------
+def _cellRuleCost (self, prop, weights):
+    cost = 0.0
+    for sec in prop.get('secs', {}).values():
+        nseg = sec.get('geom', {}).get('nseg', 1)
+        nseg = nseg if isinstance(nseg, Number) else 1
+        cost += nseg * (weights['segment'] + weights['mechanism'] * len(sec.get('mechs', {})))
+        cost += weights['mechanism'] * len(sec.get('pointps', {}))
+    return cost or weights['segment']
+
+
+# -----------------------------------------------------------------------------
+# Expected number of synapses per cell of a pop based on connParams
+# -----------------------------------------------------------------------------
+def _expectedSynsPerCell (self, pop):
+    numCells = {label: self._popNumCells(p) or p.tags.get('numCells', 0) for label, p in self.pops.items()}
+    syns = 0.0
+    for connParam in self.params.connParams.values():
+        if not self._popMatchesConds(pop.tags, connParam.get('postConds', {})):
+            continue
+        numPre = sum(n for label, n in numCells.items() if self._popMatchesConds(self.pops[label].tags, connParam.get('preConds', {})))
+        numPost = sum(n for label, n in numCells.items() if self._popMatchesConds(self.pops[label].tags, connParam.get('postConds', {})))
+        if not numPre or not numPost:
+            continue
+
+        # string-based params can't be evaluated here, so fall back to one conn per post cell
+        if 'probability' in connParam:
+            conns = connParam['probability'] * numPre if isinstance(connParam['probability'], Number) else 1
+        elif 'convergence' in connParam:
+            conns = connParam['convergence'] if isinstance(connParam['convergence'], Number) else 1
+        elif 'divergence' in connParam:
+            conns = connParam['divergence'] * numPre / numPost if isinstance(connParam['divergence'], Number) else 1
+        elif 'connList' in connParam:
+            conns = len(connParam['connList']) / numPost
+        else:
+            conns = numPre  # fullConn
+
+        synsPerConn = connParam.get('synsPerConn', 1)
+        synsPerConn = synsPerConn if isinstance(synsPerConn, Number) else 1
+        synMechs = connParam.get('synMech', None)
+        numSynMechs = len(synMechs) if isinstance(synMechs, list) else 1
+        syns += conns * synsPerConn * numSynMechs
+
+    return syns
+
+
+# -----------------------------------------------------------------------------
+# Check if pop tags match the conditions of a rule (only tags known before creating cells)
+# -----------------------------------------------------------------------------
+def _popMatchesConds (self, tags, conds):
+    for condKey, condVal in conds.items():
+        if condKey not in tags:
+            continue  # cell-specific tags (eg. ynorm) or tags not set until cells are created
+        if isinstance(condVal, list):
+            if condVal and isinstance(condVal[0], Number):
+                continue  # range conds depend on each cell
+            if tags[condKey] not in condVal:
+                return False
+        elif tags[condKey] != condVal:
+            return False
+    return True
@@ -53,6 +53,7 @@ def connectCells (self):
     gapJunctions = False  # assume no gap junctions by default
 
     for connParamLabel,connParamTemp in self.params.connParams.items():  # for each conn rule or parameter set
+        sim.instrument('start', 'conn_'+connParamLabel)
         connParam = connParamTemp.copy()
         connParam['label'] = connParamLabel
 
@@ -84,24 +85,12 @@ def connectCells (self):
             nodeSynapses = sum([len(cell.conns) for cell in sim.net.cells])
             print(('  Number of synaptic contacts on node %i after conn rule %s: %i ' % (sim.rank, connParamLabel, nodeSynapses)))
 
+        sim.instrument('stop', 'conn_'+connParamLabel)
+
 
     # add presynaptoc gap junctions
     if gapJunctions:
-        # distribute info on presyn gap junctions across nodes
-        if not getattr(sim.net, 'preGapJunctions', False): 
-            sim.net.preGapJunctions = []  # if doesn't exist, create list to store presynaptic cell gap junctions
-        data = [sim.net.preGapJunctions]*sim.nhosts  # send cells data to other nodes
-        data[sim.rank] = None
-        gather = sim.pc.py_alltoall(data)  # collect cells data from other nodes (required to generate connections)
-        sim.pc.barrier()
-        for dataNode in gather:
-            if dataNode: sim.net.preGapJunctions.extend(dataNode)
-
-        # add gap junctions of presynaptic cells (need to do separately because could be in different ranks)
-        for preGapParams in getattr(sim.net, 'preGapJunctions', []):
-            if preGapParams['gid'] in self.gid2lid:  # only cells in this rank
-                cell = self.cells[self.gid2lid[preGapParams['gid']]] 
-                cell.addConn(preGapParams)
+        self._addPreGapJunctions()
 
     # apply subcellular connectivity params (distribution of synaspes)
     if self.params.subConnParams:
@@ -133,6 +122,42 @@ def connectCells (self):
 
 
 
+# -----------------------------------------------------------------------------
+# Add presynaptic side of gap junctions (each record is sent only to the node of its pre cell)
+# -----------------------------------------------------------------------------
+def _addPreGapJunctions (self):
+    from .. import sim
+
+    preGapJunctions = getattr(sim.net, 'preGapJunctions', None) or []
+    if sim.nhosts > 1:
+        gidRanks = self._getGidRanks()
+        data = [[] for i in range(sim.nhosts)]
+        for preGapParams in preGapJunctions:
+            data[gidRanks[preGapParams['gid']]].append(preGapParams)
+        gather = sim.pc.py_alltoall(data)  # collect pre gap junctions of cells in this node
+        preGapJunctions = [preGapParams for dataNode in gather for preGapParams in dataNode]
+    sim.net.preGapJunctions = preGapJunctions
+
+    for preGapParams in preGapJunctions:
+        if preGapParams['gid'] in self.gid2lid:
+            cell = self.cells[self.gid2lid[preGapParams['gid']]] 
+            cell.addConn(preGapParams)
+
+    self._registerGapJunctionVars()
+
+
+# -----------------------------------------------------------------------------
+# Register source and target vars of gap junctions added to cells (batched, to setup transfer before run)
+# -----------------------------------------------------------------------------
+def _registerGapJunctionVars (self):
+    from .. import sim
+
+    for targetVar, gapId, sourceVar, sourceGapId, hSec in getattr(self, '_gapJunctionVars', []):
+        sim.pc.target_var(targetVar, gapId)
+        sim.pc.source_var(sourceVar, sourceGapId, sec=hSec)
+    self._gapJunctionVars = []
+
+
 # -----------------------------------------------------------------------------
 # Find pre and post cells matching conditions
 # -----------------------------------------------------------------------------
@@ -11,9 +11,16 @@ from __future__ import unicode_literals
 from __future__ import division
 from __future__ import absolute_import
 
+try:
+    basestring
+except NameError:
+    basestring = str
+
 from future import standard_library
 standard_library.install_aliases()
-from ..specs import ODict
+from numbers import Number
+import numpy as np
+from ..specs import ODict, Dict
 from neuron import h  # import NEURON
 
 class Network (object):
@@ -43,6 +50,8 @@ class Network (object):
         self.gid2lid = {} # Empty dict for storing GID -> local index (key = gid; value = local id) -- ~x6 faster than .index() 
         self.lastGid = 0  # keep track of last cell gid 
         self.lastGapId = 0  # keep track of last gap junction gid 
+        self._gidRanks = np.zeros(0, dtype=np.int32)  # rank of each gid (-1 if not created)
+        self._gapJunctionVars = []  # gap junction source/target vars pending to be registered in ParallelContext
 
 
     # -----------------------------------------------------------------------------
@@ -70,11 +79,17 @@ class Network (object):
 
         sim.pc.barrier()
         sim.timing('start', 'createTime')
-        if sim.rank==0: 
-            print(("\nCreating network of %i cell populations on %i hosts..." % (len(self.pops), sim.nhosts))) 
-        
+        if sim.rank==0:
+            print(("\nCreating network of %i cell populations on %i hosts..." % (len(self.pops), sim.nhosts)))
+
+        self._compileCellParamsRules()  # compile rule conditions once for all cells
+        if sim.cfg.loadBalanceCells and sim.nhosts > 1:
+            self._balanceCells()  # assign cells to nodes based on estimated costs
+
         for ipop in list(self.pops.values()): # For each pop instantiate the network cells (objects of class 'Cell')
+            sim.instrument('start', 'createCells_'+ipop.tags['pop'])
             newCells = ipop.createCells() # create cells for this pop using Pop method
+            sim.instrument('stop', 'createCells_'+ipop.tags['pop'], numCells=len(newCells))
             self.cells.extend(newCells)  # add to list of cells
             sim.pc.barrier()
             if sim.rank==0 and sim.cfg.verbose: print(('Instantiated %d cells of population %s'%(len(newCells), ipop.tags['pop'])))  
@@ -88,22 +103,132 @@ class Network (object):
 
         return self.cells
 
+    # -----------------------------------------------------------------------------
+    # Record rank of the gids of a population distributed across nodes (hostCells: cell indices of each rank)
+    # -----------------------------------------------------------------------------
+    def _setGidRanks (self, hostCells):
+        from .. import sim
+
+        inds = [np.asarray(hostCells[rank], dtype=int) for rank in range(sim.nhosts)]
+        size = self.lastGid + max([int(rankInds.max())+1 for rankInds in inds if len(rankInds)] + [0])
+        if len(self._gidRanks) < size:
+            self._gidRanks = np.concatenate((self._gidRanks, np.full(size - len(self._gidRanks), -1, dtype=np.int32)))
+        for rank, rankInds in enumerate(inds):
+            self._gidRanks[self.lastGid + rankInds] = rank
+
+
+    # -----------------------------------------------------------------------------
+    # Rank of each gid (array indexed by gid); needs to be called from all nodes
+    # -----------------------------------------------------------------------------
+    def _getGidRanks (self):
+        from .. import sim
+
+        # recorded ranks are valid if they match the cells of every node (eg. not if cells were loaded from file)
+        gids = np.fromiter(self.gid2lid, dtype=int, count=len(self.gid2lid))
+        gidRanks = self._gidRanks
+        valid = bool(np.all(gids < len(gidRanks)) and np.all(gidRanks[gids[gids < len(gidRanks)]] == sim.rank))
+        if sim.nhosts > 1:
+            valid = sim.pc.allreduce(float(valid), 3) > 0  # flag 3 returns minimum value
+            valid = valid and sim.pc.allreduce(len(gids), 1) == np.count_nonzero(gidRanks >= 0)
+        if not valid:
+            gather = sim.pc.py_allgather(gids) if sim.nhosts > 1 else [gids]  # gids of each node
+            gidRanks = np.full(max([int(nodeGids.max())+1 for nodeGids in gather if len(nodeGids)] + [0]), -1, dtype=np.int32)
+            for rank, nodeGids in enumerate(gather):
+                gidRanks[nodeGids] = rank
+            self._gidRanks = gidRanks
+        return gidRanks
+
+
+    # -----------------------------------------------------------------------------
+    # Compile cellParams rule conditions
+    # -----------------------------------------------------------------------------
+    def _compileCellParamsRules (self):
+        rules = []
+        for propLabel, prop in self.params.cellParams.items():
+            discreteConds, rangeConds = [], []
+            for (condKey,condVal) in prop['conds'].items():
+                if isinstance(condVal, list):
+                    if isinstance(condVal[0], Number):
+                        rangeConds.append((condKey, condVal[0], condVal[1]))
+                    elif isinstance(condVal[0], basestring):
+                        discreteConds.append((condKey, True, condVal))
+                else:
+                    discreteConds.append((condKey, False, condVal))
+            rules.append((propLabel, prop, discreteConds, rangeConds))
+
+        self._cellParamsRules = rules
+        self._cellParamsRulesLabels = list(self.params.cellParams.keys())
+        self._cellParamsRulesKeys = sorted(set(cond[0] for rule in rules for cond in rule[2]))  # tags used in discrete conds
+        self._cellParamsRulesCache = {}  # discrete tag values -> rules whose discrete conds are met
+        self._cellRulePrototypes = {}  # rule label -> prototype secs
+
+
+    # -----------------------------------------------------------------------------
+    # Find cellParams rules whose conditions are met by a set of cell tags
+    # -----------------------------------------------------------------------------
+    def _matchCellParamsRules (self, tags):
+        if getattr(self, '_cellParamsRules', None) is None or self._cellParamsRulesLabels != list(self.params.cellParams.keys()):
+            self._compileCellParamsRules()
+
+        # discrete conds (eg. pop, cellType) are shared by cells of a pop, so only evaluated once per combination of tag values
+        try:
+            key = tuple(tags.get(condKey) for condKey in self._cellParamsRulesKeys)
+            candidates = self._cellParamsRulesCache.get(key)
+        except TypeError:  # unhashable tag values
+            key, candidates = None, None
+        if candidates is None:
+            candidates = [rule for rule in self._cellParamsRules
+                if all((tags.get(condKey) in condVal) if isList else (tags.get(condKey) == condVal) for condKey, isList, condVal in rule[2])]
+            if key is not None:
+                self._cellParamsRulesCache[key] = candidates
+
+        # range conds (eg. ynorm) are evaluated for each cell
+        return [(propLabel, prop) for propLabel, prop, _, rangeConds in candidates
+            if not any(tags.get(condKey) < condMin or tags.get(condKey) > condMax for condKey, condMin, condMax in rangeConds)]
+
+
+    # -----------------------------------------------------------------------------
+    # Prototype section structure of a cellParams rule (copied by each cell that matches it)
+    # -----------------------------------------------------------------------------
+    def _cellRulePrototype (self, propLabel):
+        from .. import sim
+
+        if propLabel not in self._cellRulePrototypes:
+            protoSecs = Dict()
+            for sectName, sectParams in self.params.cellParams[propLabel]['secs'].items():
+                protoSecs[sectName] = Dict()
+                sim.CompartCell._setSecPyStruct(protoSecs[sectName], sectParams)
+            self._cellRulePrototypes[propLabel] = protoSecs
+        return self._cellRulePrototypes[propLabel]
+
+    # -----------------------------------------------------------------------------
+    # Import load balancing methods
+    # -----------------------------------------------------------------------------
+    from .balance import _balanceCells, _balancedHostCells, _popCellCost, _cellRuleCost, _expectedSynsPerCell, \
+        _popMatchesConds, _popNumCells
+
+    # -----------------------------------------------------------------------------
+    # Import multisplit methods
+    # -----------------------------------------------------------------------------
+    from .split import splitCells, _cellSplitPieces, _moveSplitPiece, _createSplitPiece
+
     # -----------------------------------------------------------------------------
     # Import stim methods
     # -----------------------------------------------------------------------------
-    from .stim import addStims, _addCellStim, _stimStrToFunc
+    from .stim import addStims, _addCellStim, _stimStrToFunc, _addNetStimEvents, _createNetStimPattern
 
     # -----------------------------------------------------------------------------
     # Import conn methods
     # -----------------------------------------------------------------------------
     from .conn import connectCells, _findPrePostCellsCondition, _connStrToFunc, \
         fullConn, generateRandsPrePost, probConn, randUniqueInt, convConn, divConn, fromListConn, \
-        _addCellConn, _disynapticBiasProb, _disynapticBiasProb2
+        _addCellConn, _disynapticBiasProb, _disynapticBiasProb2, _addPreGapJunctions, _registerGapJunctionVars
 
     # -----------------------------------------------------------------------------
     # Import subconn methods
     # -----------------------------------------------------------------------------
-    from .subconn import fromtodistance, _posFromLoc, _interpolateSegmentSigma, subcellularConn
+    from .subconn import fromtodistance, _posFromLoc, _segmentPositions, _nearestGridPoints, _interpolateGrid, _interpolateSegmentSigma, \
+        _subConnDensityKey, _segmentDistances, subcellularConn
 
     # -----------------------------------------------------------------------------
     # Import rxd methods
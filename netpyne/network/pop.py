@@ -11,8 +11,8 @@ from __future__ import division
 from __future__ import unicode_literals
 from __future__ import absolute_import
 
-from builtins import map
 from builtins import range
+import builtins
 try:
     basestring
 except NameError:
@@ -42,9 +42,15 @@ class Pop (object):
 
 
     def _distributeCells(self, numCellsPop):
-        ''' distribute cells across compute nodes using round-robin'''
+        ''' distribute cells across compute nodes using round-robin, or based on estimated cell costs (see cfg.loadBalanceCells)'''
         from .. import sim
             
+        if sim.cfg.loadBalanceCells and sim.nhosts > 1:
+            hostCells = sim.net._balancedHostCells(self, numCellsPop)
+            self._localGids = [sim.net.lastGid+i for i in hostCells[sim.rank]]  # gids of cells on this node
+            sim.net._setGidRanks(hostCells)
+            return hostCells
+
         hostCells = {}
         for i in range(sim.nhosts):
             hostCells[i] = []
@@ -58,6 +64,8 @@ class Pop (object):
         
         if sim.cfg.verbose: 
             print(("Distributed population of %i cells on %s hosts: %s, next: %s"%(numCellsPop,sim.nhosts,hostCells,sim.nextHost)))
+        self._localGids = [sim.net.lastGid+i for i in hostCells[sim.rank]]  # gids of cells on this node
+        sim.net._setGidRanks(hostCells)
         return hostCells
 
 
@@ -99,36 +107,10 @@ class Pop (object):
         vec.setrand(self.rand)
         randLocs = np.array(vec).reshape(self.tags['numCells'], 3)  # create random x,y,z locations
 
-        if sim.net.params.shape == 'cylinder':
-            # Use the x,z random vales 
-            rho = randLocs[:,0] # use x rand value as the radius rho in the interval [0, 1)
-            phi = 2 * pi * randLocs[:,2] # use z rand value as the angle phi in the interval [0, 2*pi) 
-            x = (1 + sqrt(rho) * cos(phi))/2.0
-            z = (1 + sqrt(rho) * sin(phi))/2.0
-            randLocs[:,0] = x
-            randLocs[:,2] = z
-    
-        elif sim.net.params.shape == 'ellipsoid':
-            # Use the x,y,z random vales 
-            rho = np.power(randLocs[:,0], 1.0/3.0) # use x rand value as the radius rho in the interval [0, 1); cuberoot
-            phi = 2 * pi * randLocs[:,1] # use y rand value as the angle phi in the interval [0, 2*pi) 
-            costheta = (2 * randLocs[:,2]) - 1 # use z rand value as cos(theta) in the interval [-1, 1); ensures uniform dist 
-            theta = arccos(costheta)  # obtain theta from cos(theta)
-            x = (1 + rho * cos(phi) * sin(theta))/2.0
-            y = (1 + rho * sin(phi) * sin(theta))/2.0
-            z = (1 + rho * cos(theta))/2.0 
-            randLocs[:,0] = x
-            randLocs[:,1] = y
-            randLocs[:,2] = z
-        
-        for icoord, coord in enumerate(['x', 'y', 'z']):
+        for coord in ['x', 'y', 'z']:
             if coord+'Range' in self.tags:  # if user provided absolute range, convert to normalized
                 self.tags[coord+'normRange'] = [float(point) / getattr(sim.net.params, 'size'+coord.upper()) for point in self.tags[coord+'Range']]
-            # constrain to range set by user
-            if coord+'normRange' in self.tags:  # if normalized range, rescale random locations
-                minv = self.tags[coord+'normRange'][0] 
-                maxv = self.tags[coord+'normRange'][1] 
-                randLocs[:,icoord] = randLocs[:,icoord] * (maxv-minv) + minv
+        randLocs = self._shapeLocs(randLocs)  # constrain to shape and range set by user
 
         for i in self._distributeCells(int(sim.net.params.scale * self.tags['numCells']))[sim.rank]:
             gid = sim.net.lastGid+i
@@ -166,6 +148,60 @@ class Pop (object):
         return cells
 
                 
+    def _shapeLocs(self, randLocs):
+        ''' Map uniform random x,y,z values in [0, 1) to normalized locations uniformly distributed within the network shape and pop ranges'''
+        from .. import sim
+
+        if sim.net.params.shape == 'cylinder':
+            # Use the x,z random vales 
+            rho = randLocs[:,0] # use x rand value as the radius rho in the interval [0, 1)
+            phi = 2 * pi * randLocs[:,2] # use z rand value as the angle phi in the interval [0, 2*pi) 
+            x = (1 + sqrt(rho) * cos(phi))/2.0
+            z = (1 + sqrt(rho) * sin(phi))/2.0
+            randLocs[:,0] = x
+            randLocs[:,2] = z
+    
+        elif sim.net.params.shape == 'ellipsoid':
+            # Use the x,y,z random vales 
+            rho = np.power(randLocs[:,0], 1.0/3.0) # use x rand value as the radius rho in the interval [0, 1); cuberoot
+            phi = 2 * pi * randLocs[:,1] # use y rand value as the angle phi in the interval [0, 2*pi) 
+            costheta = (2 * randLocs[:,2]) - 1 # use z rand value as cos(theta) in the interval [-1, 1); ensures uniform dist 
+            theta = arccos(costheta)  # obtain theta from cos(theta)
+            x = (1 + rho * cos(phi) * sin(theta))/2.0
+            y = (1 + rho * sin(phi) * sin(theta))/2.0
+            z = (1 + rho * cos(theta))/2.0 
+            randLocs[:,0] = x
+            randLocs[:,1] = y
+            randLocs[:,2] = z
+
+        for icoord, coord in enumerate(['x', 'y', 'z']):
+            if coord+'normRange' in self.tags:  # if normalized range, rescale random locations
+                minv = self.tags[coord+'normRange'][0] 
+                maxv = self.tags[coord+'normRange'][1] 
+                randLocs[:,icoord] = randLocs[:,icoord] * (maxv-minv) + minv
+        return randLocs
+
+
+    def _randUniform(self, num):
+        ''' Draw num uniform random values in [0, 1) at once (same sequence as num calls to self.rand.uniform(0, 1))'''
+        if num < 1:
+            return np.zeros(0)
+        first = self.rand.uniform(0, 1)
+        vec = h.Vector(num-1)
+        if num > 1:
+            vec.setrand(self.rand)
+        return np.concatenate(([first], np.array(vec)))
+
+
+    def _evalDensityFunc(self, densityFunc, xnorm, ynorm, znorm):
+        ''' Evaluate density function on arrays of normalized locations'''
+        try:
+            density = densityFunc(xnorm, ynorm, znorm)
+        except (TypeError, ValueError):  # function not vectorizable (eg. conditional expressions or math module functions)
+            density = np.vectorize(densityFunc, otypes=[float])(xnorm, ynorm, znorm)
+        return np.broadcast_to(np.asarray(density, dtype=float), np.broadcast(xnorm, ynorm, znorm).shape)
+
+
     def createCellsDensity (self):
         ''' Create population cells based on density'''
         from .. import sim
@@ -194,34 +230,42 @@ class Pop (object):
 
         funcLocs = None  # start with no locations as a function of density function
         if isinstance(self.tags['density'], basestring): # check if density is given as a function 
-            if shape == 'cuboid':  # only available for cuboids
-                strFunc = self.tags['density']  # string containing function
-                strVars = [var for var in ['xnorm', 'ynorm', 'znorm'] if var in strFunc]  # get list of variables used 
-                if not len(strVars) == 1:
-                    print('Error: density function (%s) for population %s does not include "xnorm", "ynorm" or "znorm"'%(strFunc,self.tags['pop']))
-                    return
-                coordFunc = strVars[0] 
-                lambdaStr = 'lambda ' + coordFunc +': ' + strFunc # convert to lambda function 
-                densityFunc = eval(lambdaStr)
-                minRange = self.tags[coordFunc+'Range'][0]
-                maxRange = self.tags[coordFunc+'Range'][1]
-
-                interval = 0.001  # interval of location values to evaluate func in order to find the max cell density
-                maxDensity = max(list(map(densityFunc, (np.arange(minRange, maxRange, interval)))))  # max cell density 
-                maxCells = volume * maxDensity  # max number of cells based on max value of density func 
-                
-                self.rand.Random123(int(maxDensity), sim.net.lastGid, sim.cfg.seeds['loc'])
-                locsAll = minRange + ((maxRange-minRange)) * np.array([self.rand.uniform(0, 1) for i in range(int(maxCells))])  # random location values 
-                locsProb = np.array(list(map(densityFunc, locsAll))) / maxDensity  # calculate normalized density for each location value (used to prune)
-                allrands = np.array([self.rand.uniform(0, 1) for i in range(len(locsProb))])  # create an array of random numbers for checking each location pos 
-                
-                makethiscell = locsProb>allrands  # perform test to see whether or not this cell should be included (pruning based on density func)
-                funcLocs = [locsAll[i] for i in range(len(locsAll)) if i in np.array(makethiscell.nonzero()[0],dtype='int')] # keep only subset of yfuncLocs based on density func
-                self.tags['numCells'] = len(funcLocs)  # final number of cells after pruning of location values based on density func
-                if sim.cfg.verbose: print('Volume=%.2f, maxDensity=%.2f, maxCells=%.0f, numCells=%.0f'%(volume, maxDensity, maxCells, self.tags['numCells']))
-            else:
-                print('Error: Density functions are only implemented for cuboid shaped networks')
-                exit(0)
+            strFunc = self.tags['density']  # string containing function
+            strVars = [var for var in ['xnorm', 'ynorm', 'znorm'] if var in strFunc]  # get list of variables used 
+            if not strVars:
+                print('Error: density function (%s) for population %s does not include "xnorm", "ynorm" or "znorm"'%(strFunc,self.tags['pop']))
+                return
+            funcCoords = [['xnorm', 'ynorm', 'znorm'].index(var) for var in strVars]
+            lambdaStr = 'lambda xnorm, ynorm, znorm: ' + strFunc # convert to lambda function 
+            funcVars = dict(vars(np))  # numpy functions so density func can be evaluated on arrays of locations
+            funcVars.update({name: getattr(builtins, name) for name in dir(builtins) if name in funcVars})  # keep builtins (eg. max, min, round)
+            funcVars['np'] = np
+            densityFunc = eval(lambdaStr, funcVars)
+            normRanges = [self.tags.get(coord+'normRange', [0, 1]) for coord in ['x', 'y', 'z']]
+
+            # find the max cell density evaluating func on a grid of location values of the coords used
+            interval = {1: 0.001, 2: 0.002, 3: 0.01}[len(funcCoords)]
+            gridLocs = [0.0, 0.0, 0.0]
+            gridValues = np.meshgrid(*[np.arange(normRanges[i][0], normRanges[i][1], interval) for i in funcCoords], indexing='ij')
+            for icoord, values in zip(funcCoords, gridValues):
+                gridLocs[icoord] = values
+            maxDensity = float(np.max(self._evalDensityFunc(densityFunc, *gridLocs)))  # max cell density 
+            maxCells = volume * maxDensity  # max number of cells based on max value of density func 
+
+            # random candidate locations (coords of non-cuboid shapes are not independent so all are needed) + values for pruning
+            candCoords = funcCoords if shape == 'cuboid' else [0, 1, 2]
+            numCand = max(int(maxCells), 0)
+            self.rand.Random123(int(maxDensity), sim.net.lastGid, sim.cfg.seeds['loc'])
+            rands = self._randUniform(numCand * (len(candCoords)+1)).reshape(len(candCoords)+1, numCand)
+            candLocs = np.zeros((numCand, 3))
+            candLocs[:, candCoords] = rands[:-1].T
+            candLocs = self._shapeLocs(candLocs)
+            locsProb = self._evalDensityFunc(densityFunc, candLocs[:,0], candLocs[:,1], candLocs[:,2]) / maxDensity if numCand else np.zeros(0)
+
+            makethiscell = locsProb > rands[-1]  # perform test to see whether or not this cell should be included (pruning based on density func)
+            funcLocs = candLocs[makethiscell]  # keep only subset of locations based on density func
+            self.tags['numCells'] = len(funcLocs)  # final number of cells after pruning of location values based on density func
+            if sim.cfg.verbose: print('Volume=%.2f, maxDensity=%.2f, maxCells=%.0f, numCells=%.0f'%(volume, maxDensity, maxCells, self.tags['numCells']))
         else:  # NO ynorm-dep
             self.tags['numCells'] = int(self.tags['density'] * volume)  # = density (cells/mm^3) * volume (mm^3)
 
@@ -231,38 +275,11 @@ class Pop (object):
         vec = h.Vector(self.tags['numCells']*3)
         vec.setrand(self.rand)
         randLocs = np.array(vec).reshape(self.tags['numCells'], 3)  # create random x,y,z locations
+        randLocs = self._shapeLocs(randLocs)
+        if funcLocs is not None:  # locations calculated using density function
+            randLocs[:, candCoords] = funcLocs[:, candCoords]
 
-        if sim.net.params.shape == 'cylinder':
-            # Use the x,z random vales 
-            rho = randLocs[:,0] # use x rand value as the radius rho in the interval [0, 1)
-            phi = 2 * pi * randLocs[:,2] # use z rand value as the angle phi in the interval [0, 2*pi) 
-            x = (1 + sqrt(rho) * cos(phi))/2.0
-            z = (1 + sqrt(rho) * sin(phi))/2.0
-            randLocs[:,0] = x
-            randLocs[:,2] = z
-    
-        elif sim.net.params.shape == 'ellipsoid':
-            # Use the x,y,z random vales 
-            rho = np.power(randLocs[:,0], 1.0/3.0) # use x rand value as the radius rho in the interval [0, 1); cuberoot
-            phi = 2 * pi * randLocs[:,1] # use y rand value as the angle phi in the interval [0, 2*pi) 
-            costheta = (2 * randLocs[:,2]) - 1 # use z rand value as cos(theta) in the interval [-1, 1); ensures uniform dist 
-            theta = arccos(costheta)  # obtain theta from cos(theta)
-            x = (1 + rho * cos(phi) * sin(theta))/2.0
-            y = (1 + rho * sin(phi) * sin(theta))/2.0
-            z = (1 + rho * cos(theta))/2.0 
-            randLocs[:,0] = x
-            randLocs[:,1] = y
-            randLocs[:,2] = z
-
-        for icoord, coord in enumerate(['x', 'y', 'z']):
-            if coord+'normRange' in self.tags:  # if normalized range, rescale random locations
-                minv = self.tags[coord+'normRange'][0] 
-                maxv = self.tags[coord+'normRange'][1] 
-                randLocs[:,icoord] = randLocs[:,icoord] * (maxv-minv) + minv
-            if funcLocs and coordFunc == coord+'norm':  # if locations for this coordinate calculated using density function
-                randLocs[:,icoord] = funcLocs
-
-        if sim.cfg.verbose and not funcLocs: print('Volume=%.4f, density=%.2f, numCells=%.0f'%(volume, self.tags['density'], self.tags['numCells']))
+        if sim.cfg.verbose and funcLocs is None: print('Volume=%.4f, density=%.2f, numCells=%.0f'%(volume, self.tags['density'], self.tags['numCells']))
 
         for i in self._distributeCells(self.tags['numCells'])[sim.rank]:
             gid = sim.net.lastGid+i
@@ -394,6 +411,7 @@ class Pop (object):
         from .. import sim
 
         localPopGids = list(set(sim.net.gid2lid.keys()).intersection(set(self.cellGids)))
+        localPopGids = [gid for gid in localPopGids if not getattr(sim.net.cells[sim.net.gid2lid[gid]], '_splitSecs', None)]  # full morphology
         if localPopGids: 
             cell = sim.net.cells[sim.net.gid2lid[localPopGids[0]]]
         else:
@@ -466,5 +484,6 @@ class Pop (object):
         #odict['cellModelClass'] = str(odict['cellModelClass'])
         del odict['cellModelClass']
         del odict['rand']
+        odict.pop('_localGids', None)
         return odict
 
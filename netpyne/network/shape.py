@@ -40,3 +40,4 @@ def defineCellShapes(self):
         h.define_shape()
         for cell in sim.net.compartCells:
             cell.updateShape()
+        sim.net.compartCells.extend(getattr(sim.net, 'splitPieces', []))  # pieces of cells split from other nodes (multisplit)
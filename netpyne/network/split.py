@@ -0,0 +1,244 @@
+"""
+split.py
+
+Methods to split large multicompartment cells across nodes using ParallelContext.multisplit
+
+Contributors: salvadordura@gmail.com
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+
+from future import standard_library
+standard_library.install_aliases()
+from numbers import Number
+import numpy as np
+from neuron import h
+from ..specs import Dict
+from .balance import _defaultCostWeights
+
+
+# -----------------------------------------------------------------------------
+# Split cells across nodes (called once all conns and stims have been added)
+# -----------------------------------------------------------------------------
+def splitCells (self):
+    from .. import sim
+
+    self.splitPieces = []  # pieces of cells of other nodes instantiated in this node
+    if not sim.cfg.multisplit or sim.nhosts < 2 or not sim.cfg.createNEURONObj:
+        return self.splitPieces
+    if sim.cfg.cvode_active:
+        print('  Error: multisplit requires fixed time step (cfg.cvode_active = False); cells will not be split')
+        return self.splitPieces
+
+    sim.timing('start', 'splitTime')
+    splitParams = sim.cfg.multisplit if isinstance(sim.cfg.multisplit, dict) else {}
+    numPieces = min(int(splitParams.get('pieces', 2)), sim.nhosts)
+    pops = splitParams.get('pops', None)
+    minCost = splitParams.get('minCost', 0)
+
+    candidates = [cell for cell in self.cells if type(cell) is sim.CompartCell and cell.secs
+        and (pops is None or cell.tags['pop'] in pops)]
+
+    # relative segment coords of the full morphology are required to split the LFP contributions
+    if sim.cfg.recordLFP and candidates:
+        if not self.params.defineCellShapes: self.defineCellShapes()
+        for popLabel in set(cell.tags['pop'] for cell in candidates):
+            self.pops[popLabel].calcRelativeSegCoords()
+
+    data = [[] for i in range(sim.nhosts)]
+    numSplit = 0
+    for cell in candidates:
+        splitNode, pieces = self._cellSplitPieces(cell, numPieces, minCost)
+        if not pieces:
+            continue
+        for ipiece, secNames in enumerate(pieces):
+            data[(sim.rank + ipiece + 1) % sim.nhosts].append(self._moveSplitPiece(cell, secNames, splitNode))
+        sim.pc.multisplit(cell.secs[splitNode[0]]['hObj'](splitNode[1]), cell.gid)  # home piece keeps the root section
+        numSplit += 1
+
+    # create pieces of cells from other nodes
+    gather = sim.pc.py_alltoall(data)
+    for nodePieces in gather:
+        for pieceData in nodePieces:
+            self.splitPieces.append(self._createSplitPiece(pieceData))
+
+    sim.pc.multisplit()  # all split points defined
+    sim.cfg.cache_efficient = True  # required by multisplit (set in preRun)
+
+    print(('  Number of cells split on node %i: %i (pieces from other nodes: %i)' % (sim.rank, numSplit, len(self.splitPieces))))
+    sim.pc.barrier()
+    sim.timing('stop', 'splitTime')
+    if sim.rank == 0 and sim.cfg.timing: print(('  Done; cell splitting time = %0.2f s.' % sim.timingData['splitTime']))
+
+    return self.splitPieces
+
+
+# -----------------------------------------------------------------------------
+# Choose subtrees of a cell to move to other nodes based on their estimated cost
+# -----------------------------------------------------------------------------
+def _cellSplitPieces (self, cell, numPieces, minCost=0):
+    from .. import sim
+
+    balanceParams = sim.cfg.loadBalanceCells if isinstance(sim.cfg.loadBalanceCells, dict) else {}
+    weights = dict(_defaultCostWeights)
+    weights.update(balanceParams.get('weights', {}))
+
+    # estimated cost of each section, including synapses
+    synsPerSec = {}
+    for conn in cell.conns:
+        synsPerSec[conn.get('sec')] = synsPerSec.get(conn.get('sec'), 0) + 1
+    secCosts = {}
+    for secName, sec in cell.secs.items():
+        nseg = sec['hObj'].nseg if sec.get('hObj') else sec.get('geom', {}).get('nseg', 1)
+        secCosts[secName] = nseg * (weights['segment'] + weights['mechanism'] * len(sec.get('mechs', {}))) \
+            + weights['mechanism'] * len(sec.get('pointps', {})) + weights['synapse'] * synsPerSec.get(secName, 0)
+
+    # subtree of each section
+    children = {secName: [] for secName in cell.secs}
+    rootSec = None
+    for secName, sec in cell.secs.items():
+        topol = sec.get('topol', {})
+        if topol and topol.get('parentSec') in children:
+            children[topol['parentSec']].append(secName)
+        elif rootSec is None:
+            rootSec = secName
+
+    def subtree(secName):
+        secNames = [secName]
+        for child in children[secName]:
+            secNames.extend(subtree(child))
+        return secNames
+
+    totalCost = sum(secCosts.values())
+    if rootSec is None or totalCost < minCost:
+        return None, []
+
+    # subtrees attached to the root (through their 0 end) at the same split point can be moved
+    groups = {}
+    for child in children[rootSec]:
+        topol = cell.secs[child]['topol']
+        if topol.get('childX', 0) == 0 and isinstance(topol.get('parentX', 1), Number):
+            secNames = subtree(child)
+            groups.setdefault(float(topol.get('parentX', 1)), []).append((sum(secCosts[s] for s in secNames), secNames))
+    if not groups:
+        return None, []
+    parentX = max(groups, key=lambda x: sum(cost for cost, _ in groups[x]))
+
+    # longest processing time first: assign subtrees to pieces (piece 0 stays in this node with root and remaining subtrees)
+    movable = sorted(groups[parentX], key=lambda x: -x[0])
+    loads = [totalCost - sum(cost for cost, _ in movable)] + [0.0] * (numPieces - 1)
+    pieces = [[] for i in range(numPieces)]
+    for cost, secNames in movable:
+        ipiece = int(np.argmin(loads))
+        loads[ipiece] += cost
+        pieces[ipiece].extend(secNames)
+
+    return (rootSec, parentX), [secNames for secNames in pieces[1:] if secNames]
+
+
+# -----------------------------------------------------------------------------
+# Remove NEURON objects of the sections moved to another node and pack their data
+# -----------------------------------------------------------------------------
+def _moveSplitPiece (self, cell, secNames, splitNode):
+    from .. import sim
+
+    secNames = set(secNames)
+    rootSecs = [secName for secName in secNames if cell.secs[secName]['topol'].get('parentSec') not in secNames]
+    conns = [conn for conn in cell.conns if conn.get('sec') in secNames]
+    stims = [stim for stim in cell.stims if stim.get('sec') in secNames and stim.get('type') != 'NetStim']
+
+    # NetStims of the moved conns (NetStim conns of each source use the NetStims of that source in the same order)
+    sourceStims, netStimsUsed = {}, {}
+    for stim in cell.stims:
+        if stim.get('type') == 'NetStim':
+            sourceStims.setdefault(stim.get('source'), []).append(stim)
+    for conn in cell.conns:
+        if conn.get('preGid') == 'NetStim':
+            index = netStimsUsed.get(conn['preLabel'], 0)
+            netStimsUsed[conn['preLabel']] = index + 1
+            if conn.get('sec') in secNames and index < len(sourceStims.get(conn['preLabel'], [])):
+                stims.append(sourceStims[conn['preLabel']][index])
+
+    pieceData = {'gid': cell.gid, 'tags': dict(cell.tags), 'sid': cell.gid, 'rootSecs': rootSecs,
+        'secs': Dict(), 'conns': [sim.copyRemoveItemObj(conn, keystart='h', exclude_list=['hebbwt']) for conn in conns],
+        'stims': [sim.copyRemoveItemObj(stim, keystart='h', exclude_list=['hebbwt']) for stim in stims]}
+    for secName, sec in cell.secs.items():  # keep order of sections (used for segment coords)
+        if secName in secNames:
+            pieceData['secs'][secName] = sim.copyRemoveItemObj(sec, keystart='h', exclude_list=['hebbwt'])
+
+    # split LFP segment coords of full cell between this node and the piece
+    if getattr(cell, '_segMask', None) is None and sim.cfg.recordLFP:
+        cell.calcAbsSegCoords()
+        cell._segMask = np.ones(cell._segCoords['p0'].shape[1], dtype=bool)
+    if getattr(cell, '_segMask', None) is not None:
+        pieceMask = np.concatenate([np.full(sec['hObj'].nseg, secName in secNames) for secName, sec in cell.secs.items() if sec.get('hObj')])
+        fullMask = np.zeros(len(cell._segMask), dtype=bool)
+        fullMask[np.where(cell._segMask)[0]] = pieceMask
+        pieceData['segCoords'] = {k: v[:, fullMask] for k, v in cell._segCoords.items()}
+        cell._segMask = cell._segMask & ~fullMask
+
+    # remove NEURON objects in this node (python structure kept so gather is not affected)
+    for conn in conns:
+        conn.pop('hObj', None)
+    eventGids = set()
+    for stim in stims:
+        stim.pop('hObj', None)
+        stim.pop('hRandom', None)
+        if 'eventGid' in stim:  # spike train of NetStim (cfg.netStimEvents) now played in the node of the piece
+            eventGids.add(stim.pop('eventGid'))
+    if eventGids:
+        sim.net._netStimEvents = [event for event in sim.net._netStimEvents if event[0] not in eventGids]
+
+    # gap junctions of the moved sections are registered by the node of the piece
+    hSecNames = set(cell.secs[secName]['hObj'].name() for secName in secNames)
+    sim.net._gapJunctionVars = [gapVars for gapVars in sim.net._gapJunctionVars if gapVars[4].name() not in hSecNames]
+
+    for secName in secNames:
+        sec = cell.secs[secName]
+        for synMech in sec.get('synMechs', []):
+            synMech.pop('hObj', None)
+        for pointp in sec.get('pointps', {}).values():
+            pointp.pop('hObj', None)
+    for secName in secNames:
+        h.delete_section(sec=cell.secs[secName]['hObj'])
+        cell.secs[secName]['hObj'] = None
+    cell._splitSecs = getattr(cell, '_splitSecs', set()) | secNames
+
+    return pieceData
+
+
+# -----------------------------------------------------------------------------
+# Instantiate piece of a cell from another node
+# -----------------------------------------------------------------------------
+def _createSplitPiece (self, pieceData):
+    from .. import sim
+
+    piece = sim.CompartCell(gid=pieceData['gid'], tags=pieceData['tags'], create=False, associateGid=False)
+    piece._splitPiece = True
+    piece.secs = Dict(pieceData['secs'])
+    for secName in pieceData['rootSecs']:
+        piece.secs[secName]['topol'] = Dict()  # connected to the rest of the cell through the split point
+    piece.conns = [Dict(conn) for conn in pieceData['conns']]
+    piece.stims = [Dict(stim) for stim in pieceData['stims']]
+
+    # synMechs are created again from a separate list (addSynMech appends to piece.secs), or by each conn if one per NetCon
+    secs = Dict()
+    for secName, sec in piece.secs.items():
+        synMechs = [] if sim.cfg.oneSynPerNetcon else [{'label': synMech.get('label'), 'loc': synMech.get('loc')} for synMech in sec.get('synMechs', [])]
+        sec['synMechs'] = []
+        secs[secName] = Dict({k: v for k, v in sec.items() if k != 'synMechs'})
+        secs[secName]['synMechs'] = synMechs
+    piece.createNEURONObj({'secs': secs})
+    rootSecs = [piece.secs[secName]['hObj'] for secName in pieceData['rootSecs']]
+    for hSec in rootSecs[1:]:
+        hSec.connect(rootSecs[0](0), 0)  # join subtrees at the split point
+    piece.addStimsNEURONObj()
+    piece.addConnsNEURONObj()
+    sim.pc.multisplit(rootSecs[0](0), pieceData['sid'])
+
+    if 'segCoords' in pieceData:
+        piece._segCoords = pieceData['segCoords']
+
+    return piece
@@ -146,6 +146,47 @@ def _addCellStim (self, stimParam, postCell):
 
 
 
+# -----------------------------------------------------------------------------
+# Register spike train of a NetStim stim; returns the gid its events are sent from
+# (used instead of one NetStim per synapse if cfg.netStimEvents)
+# -----------------------------------------------------------------------------
+_netStimEventGid0 = 2**30  # first gid of NetStim event trains (above any cell gid; never assigned to a node)
+
+def _addNetStimEvents (self, params, gid, index):
+    if not hasattr(self, '_netStimEvents'):
+        self._netStimEvents = []
+    eventGid = _netStimEventGid0 + len(self._netStimEvents)
+    self._netStimEvents.append((eventGid, gid, index, {k: params[k] for k in ['source', 'rate', 'noise', 'start', 'number', 'seed']}))
+    return eventGid
+
+
+# -----------------------------------------------------------------------------
+# Create spike trains of NetStim stims and play them with a single PatternStim in this node
+# -----------------------------------------------------------------------------
+def _createNetStimPattern (self):
+    from .. import sim
+    from neuron import h
+    import numpy as np
+    from ..cell.inputs import createNoisyIntervalTrains
+
+    # each target synapse has its own Random123 stream (source, index of stim within source, gid, seed), 
+    # so trains are independent and don't depend on the num of hosts
+    times, gids = [np.array([])], [np.array([])]
+    rand = h.Random()
+    for eventGid, gid, index, params in self._netStimEvents:
+        rand.Random123(sim.hashStr('NetStimEvents_%s_%d' % (params['source'], index)), gid, params['seed'])
+        train = createNoisyIntervalTrains([rand], params['rate']**-1*1e3, params['start'], params['noise'], sim.cfg.duration)[0]
+        train = train[(train >= 0) & (train <= sim.cfg.duration)][:int(min(params['number'], len(train)))]
+        times.append(train)
+        gids.append(np.full(len(train), eventGid, dtype=float))
+    times, gids = np.concatenate(times), np.concatenate(gids)
+    order = np.argsort(times, kind='mergesort')  # PatternStim requires events sorted by time
+
+    self._netStimPattern = {'tvec': h.Vector(times[order]), 'gidvec': h.Vector(gids[order])}
+    self._netStimPattern['hObj'] = h.PatternStim()
+    self._netStimPattern['hObj'].play(self._netStimPattern['tvec'], self._netStimPattern['gidvec'])
+
+
 # -----------------------------------------------------------------------------
 # Convert stim param string to function
 # -----------------------------------------------------------------------------
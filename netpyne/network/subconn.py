@@ -57,56 +57,153 @@ def _posFromLoc(self, sec, x):
     return x, y, z
 
 
+# -----------------------------------------------------------------------------
+# Calculate x and 3d position of all segments of a list of sections; positions are cached per morphology (cellParams
+# rules) and section, so for other cells with the same morphology only the first 3d point is read to translate them
+# -----------------------------------------------------------------------------
+def _segmentPositions(self, cell, secList):
+    cache = getattr(self, '_segmentPositionsCache', None)
+    cellRules = None
+    if cache is not None and not self.params.rotateCellsRandomly:
+        cellRules = tuple(propLabel for propLabel, _ in self._matchCellParamsRules(cell.tags))
+
+    segSecs, segXs, segPos, segLengths = [], [], [], []
+    for secName in secList:
+        hSec = cell.secs[secName]['hObj']
+        nseg = hSec.nseg
+        segX = (np.arange(nseg) + 0.5) / nseg
+        n3d = int(h.n3d(sec=hSec))
+        if n3d == 0:
+            print("an error occurred in _segmentPositions: section %s of cell %d has no 3d points" % (secName, cell.gid))
+            pos = np.zeros((nseg, 3))
+        else:
+            first = np.array([h.x3d(0, sec=hSec), h.y3d(0, sec=hSec), h.z3d(0, sec=hSec)])
+            key = (cellRules, secName) if cellRules is not None else None
+            cached = cache.get(key) if key is not None else None
+            if cached is not None and cached[0] == (n3d, nseg, hSec.L):
+                pos = cached[1] + (first - cached[2])  # same morphology translated to this cell
+            else:
+                arc3d = np.array([h.arc3d(i, sec=hSec) for i in range(n3d)])
+                pt3d = np.array([[h.x3d(i, sec=hSec), h.y3d(i, sec=hSec), h.z3d(i, sec=hSec)] for i in range(n3d)])
+                pos = np.array([np.interp(segX * hSec.L, arc3d, pt3d[:, k]) for k in range(3)]).T  # same as _posFromLoc for each seg
+                if key is not None:
+                    cache[key] = ((n3d, nseg, hSec.L), pos, first)
+        segSecs.extend([secName] * nseg)
+        segXs.append(segX)
+        segPos.append(pos)
+        segLengths.append(np.full(nseg, hSec.L / nseg))
+
+    if not segSecs:
+        return [], np.zeros(0), np.zeros((0, 3)), np.zeros(0)
+    return segSecs, np.concatenate(segXs), np.concatenate(segPos), np.concatenate(segLengths)
+
+
+# -----------------------------------------------------------------------------
+# Interpolate 1D or 2D grid of values at a set of points, using the 2 nearest grid points in each dimension 
+# (so points outside the grid are extrapolated from the 2 nearest border points)
+# -----------------------------------------------------------------------------
+def _nearestGridPoints(self, grid, v):
+    grid = np.asarray(grid, dtype=float)
+    nearest = np.argsort(np.abs(grid[None, :] - v[:, None]), axis=1, kind='stable')[:, :2]
+    i1, i2 = nearest.min(axis=1), nearest.max(axis=1)
+    return i1, i2, grid[i1], grid[i2]
+
+
+def _interpolateGrid(self, gridX, gridY, gridValues, x, y):
+    gridValues = np.asarray(gridValues, dtype=float)
+    j1, j2, y1, y2 = self._nearestGridPoints(gridY, y)
+
+    if gridX is None:  # 1D
+        # linear interpolation, see http://en.wikipedia.org/wiki/Bilinear_interpolation
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sigma = (gridValues[j1]*np.abs(y2-y) + gridValues[j2]*np.abs(y-y1)) / np.abs(y2-y1)
+        invalid = y1 == y2
+    else:  # 2D
+        i1, i2, x1, x2 = self._nearestGridPoints(gridX, x)
+        # bilinear interpolation, see http://en.wikipedia.org/wiki/Bilinear_interpolation
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sigma = ((gridValues[i1, j1]*np.abs(x2-x)*np.abs(y2-y) + gridValues[i2, j1]*np.abs(x-x1)*np.abs(y2-y) + 
+                gridValues[i1, j2]*np.abs(x2-x)*np.abs(y-y1) + gridValues[i2, j2]*np.abs(x-x1)*np.abs(y-y1)) / (np.abs(x2-x1)*np.abs(y2-y1)))
+        invalid = (x1 == x2) | (y1 == y2)
+
+    if invalid.any():
+        print("ERROR in closest grid points: repeated grid values")
+        sigma[invalid] = 0.0
+    return sigma
+
+
 # -----------------------------------------------------------------------------
 # Calculate syn density for each segment from grid
 # -----------------------------------------------------------------------------
 def _interpolateSegmentSigma(self, cell, secList, gridX, gridY, gridSigma):
-    segNumSyn = {}  #
+    segSecs, segXs, segPos, segLengths = self._segmentPositions(cell, secList)
+
+    if (gridX and len(gridX) < 2) or len(gridY) < 2:
+        print("ERROR in closest grid points: at least 2 grid points required in each dimension")
+        sigma = np.zeros(len(segSecs))
+    else:
+        sigma = self._interpolateGrid(gridX if gridX else None, gridY, gridSigma, segPos[:, 0], segPos[:, 1])
+
+    numSyn = sigma * segLengths  # num syns of each segment
+    segNumSyn = {}
     for secName in secList:
-        sec = cell.secs[secName]
         segNumSyn[secName] = []
-        for seg in sec['hObj']:
-            x, y, z = self._posFromLoc(sec['hObj'], seg.x)
-            if gridX and gridY: # 2D
-                distX = [abs(gx-x) for gx in gridX]
-                distY = [abs(gy-y) for gy in gridY]
-                ixs = np.array(distX).argsort()[:2]
-                jys = np.array(distY).argsort()[:2]
-                i1,i2,j1,j2 = min(ixs), max(ixs), min(jys), max(jys) 
-                x1,x2,y1,y2 = gridX[i1], gridX[i2], gridY[j1], gridY[j2]
-                sigma_x1_y1 = gridSigma[i1][j1]
-                sigma_x1_y2 = gridSigma[i1][j2]
-                sigma_x2_y1 = gridSigma[i2][j1]
-                sigma_x2_y2 = gridSigma[i2][j2]
-
-                if x1 == x2 or y1 == y2: 
-                    print("ERROR in closest grid points: ", secName, x1, x2, y1, y2)
-                else:
-                   # bilinear interpolation, see http://en.wikipedia.org/wiki/Bilinear_interpolation (fixed bug from Ben Suter's code)
-                   sigma = ((sigma_x1_y1*abs(x2-x)*abs(y2-y) + sigma_x2_y1*abs(x-x1)*abs(y2-y) + sigma_x1_y2*abs(x2-x)*abs(y-y1) + sigma_x2_y2*abs(x-x1)*abs(y-y1))/(abs(x2-x1)*abs(y2-y1)))
-                   #sigma = ((sigma_x1_y1*abs(x2-x)*abs(y2-y) + sigma_x2_y1*abs(x-x1)*abs(y2-y) + sigma_x1_y2*abs(x2-x)*abs(y-y1) + sigma_x2_y2*abs(x-x1)*abs(y-y1))/((x2-x1)*(y2-y1)))
-
-            elif gridY:  # 1d = radial
-                distY = [abs(gy-y) for gy in gridY]
-                jys = np.array(distY).argsort()[:2]
-                sigma = np.zeros((1,2))
-                j1,j2 = min(jys), max(jys)
-                y1, y2 = gridY[j1], gridY[j2]
-                sigma_y1 = gridSigma[j1]
-                sigma_y2 = gridSigma[j2]
-
-                if y1 == y2: 
-                    print("ERROR in closest grid points: ", secName, y1, y2)
-                else:
-                   # linear interpolation, see http://en.wikipedia.org/wiki/Bilinear_interpolation
-                   sigma = ((sigma_y1*abs(y2-y) + sigma_y2*abs(y-y1)) / abs(y2-y1))
-
-            numSyn = sigma * sec['hObj'].L / sec['hObj'].nseg  # return num syns 
-            segNumSyn[secName].append(numSyn)
+    for secName, n in zip(segSecs, numSyn):
+        segNumSyn[secName].append(n)
 
     return segNumSyn
 
 
+# -----------------------------------------------------------------------------
+# Key of cached syn density of each segment: depends on morphology (cellParams rules) and subConn rule, and on the 
+# soma position relative to the grid only where it matters (x for 2Dmap; y unless fixedSomaY). Soma positions are
+# grouped in buckets of 'somaOffsetBucket' um (default: 1% of the smallest grid spacing; 0 to use exact positions)
+# -----------------------------------------------------------------------------
+def _subConnDensityKey(self, cell, subConnLabel, secList, somaX, somaY):
+    if self.params.rotateCellsRandomly:
+        return None  # each cell has a different morphology
+
+    density = self.params.subConnParams[subConnLabel]['density']
+    bucket = density.get('somaOffsetBucket', None)
+    if bucket is None:
+        grids = [density['gridY']] + ([density['gridX']] if density['type'] == '2Dmap' else [])
+        spacings = [np.min(np.abs(np.diff(grid))) for grid in grids if len(grid) > 1]
+        bucket = 0.01 * min(spacings) if spacings else 0
+    offset = lambda v: int(round(v / bucket)) if bucket else v
+    cellRules = tuple(propLabel for propLabel, _ in self._matchCellParamsRules(cell.tags))
+    offsetX = offset(somaX) if density['type'] == '2Dmap' else None
+    offsetY = offset(somaY) if 'fixedSomaY' not in density else None
+
+    return (cellRules, subConnLabel, tuple(secList), offsetX, offsetY)
+
+
+# -----------------------------------------------------------------------------
+# Calculate distance (path or cartesian) from a reference segment to all segments of a list of sections
+# -----------------------------------------------------------------------------
+def _segmentDistances(self, cell, secList, refSec, refX, coord='path'):
+    segSecs, segXs, segPos, segLengths = self._segmentPositions(cell, secList)
+
+    if coord == 'cartesian':
+        refPos = np.array(self._posFromLoc(cell.secs[refSec]['hObj'], refX))
+        return segSecs, segXs, np.sqrt(((segPos - refPos)**2).sum(axis=1))
+
+    # path distance is linear along each section, so only calculated at both ends of each section
+    h.distance(0, refX, sec=cell.secs[refSec]['hObj'])
+    dists = np.zeros(len(segSecs))
+    iseg = 0
+    for secName in secList:
+        hSec = cell.secs[secName]['hObj']
+        segX = segXs[iseg:iseg+hSec.nseg]
+        if secName == refSec:
+            dists[iseg:iseg+hSec.nseg] = np.abs(segX - refX) * hSec.L
+        else:
+            d0, d1 = h.distance(0, sec=hSec), h.distance(1, sec=hSec)
+            dists[iseg:iseg+hSec.nseg] = d0 + (d1 - d0) * segX
+        iseg += hSec.nseg
+
+    return segSecs, segXs, dists
+
+
 # -----------------------------------------------------------------------------
 # Subcellular connectivity (distribution of synapses)
 # -----------------------------------------------------------------------------
@@ -116,7 +213,10 @@ def subcellularConn(self, allCellTags, allPopTags):
     sim.timing('start', 'subConnectTime')
     print('  Distributing synapses based on subcellular connectivity rules...')
 
-    for subConnParamTemp in list(self.params.subConnParams.values()):  # for each conn rule or parameter set
+    self._subConnDensityCache = {}  # syn density of each segment for each morphology and subConn rule
+    self._segmentPositionsCache = {}  # segment positions of each morphology and section
+
+    for subConnLabel, subConnParamTemp in list(self.params.subConnParams.items()):  # for each conn rule or parameter set
         subConnParam = subConnParamTemp.copy()
 
         # find list of pre and post cell
@@ -158,14 +258,15 @@ def subcellularConn(self, allCellTags, allPopTags):
 
                     # set sections to be used
                     secList = postCell._setConnSections(subConnParam)
+                    density = subConnParam.get('density', None)
                     
                     # Uniform distribution
-                    if subConnParam.get('density', None) == 'uniform':
+                    if density == 'uniform':
                         # calculate new syn positions
                         newSecs, newLocs = postCell._distributeSynsUniformly(secList=secList, numSyns=len(conns))
                         
                     # 2D map and 1D map (radial)
-                    elif isinstance(subConnParam.get('density', None), dict) and subConnParam['density']['type'] in ['2Dmap', '1Dmap']:
+                    elif isinstance(density, dict) and density['type'] in ['2Dmap', '1Dmap']:
 
                         gridY = subConnParam['density']['gridY']
                         gridSigma = subConnParam['density']['gridValues']
@@ -174,65 +275,65 @@ def subcellularConn(self, allCellTags, allPopTags):
                             fixedSomaY = subConnParam['density'].get('fixedSomaY')
                             gridY = [y+(somaY-fixedSomaY) for y in gridY] # adjust grid so cell soma is at fixedSomaY
                             
-                        if subConnParam['density']['type'] == '2Dmap': # 2D    
-                            gridX = [x - somaX for x in subConnParam['density']['gridX']] # center x at cell soma
-                            segNumSyn = self._interpolateSegmentSigma(postCell, secList, gridX, gridY, gridSigma) # move method to Cell!
-                        elif subConnParam['density']['type'] == '1Dmap': # 1D
-                            segNumSyn = self._interpolateSegmentSigma(postCell, secList, None, gridY, gridSigma) # move method to Cell!
-
-                        totSyn = sum([sum(nsyn) for nsyn in list(segNumSyn.values())])  # summed density
+                        # expected num of syns of each segment (shared by cells with same morphology and soma offset)
+                        cacheKey = self._subConnDensityKey(postCell, subConnLabel, secList, somaX, somaY)
+                        if cacheKey is not None and cacheKey in self._subConnDensityCache:
+                            segSecs, segXs, expected = self._subConnDensityCache[cacheKey]
+                        else:
+                            if subConnParam['density']['type'] == '2Dmap': # 2D    
+                                gridX = [x - somaX for x in subConnParam['density']['gridX']] # center x at cell soma
+                                segNumSyn = self._interpolateSegmentSigma(postCell, secList, gridX, gridY, gridSigma) # move method to Cell!
+                            elif subConnParam['density']['type'] == '1Dmap': # 1D
+                                segNumSyn = self._interpolateSegmentSigma(postCell, secList, None, gridY, gridSigma) # move method to Cell!
+
+                            segSecs = [sec for sec in segNumSyn for seg in segNumSyn[sec]]
+                            segXs = np.concatenate([(np.arange(len(segNumSyn[sec])) + 0.5) / len(segNumSyn[sec]) for sec in segNumSyn]) if segSecs else np.zeros(0)
+                            expected = np.concatenate([segNumSyn[sec] for sec in segNumSyn]) if segSecs else np.zeros(0)
+                            if cacheKey is not None:
+                                self._subConnDensityCache[cacheKey] = (segSecs, segXs, expected)
+
+                        # scale expected num of syns of each segment to total num of conns (reproducible sampling for each cell)
+                        totSyn = expected.sum()  # summed density
                         scaleNumSyn = float(len(conns))/float(totSyn) if totSyn>0 else 0.0  
-                        diffList = []
-                        for sec in segNumSyn: 
-                            for seg,x in enumerate(segNumSyn[sec]):
-                                orig = float(x*scaleNumSyn)
-                                scaled = int(round(x * scaleNumSyn))
-                                segNumSyn[sec][seg] = scaled
-                                diff = orig - scaled
-                                if diff > 0:
-                                    diffList.append([diff,sec,seg])
-
-                        totSynRescale = sum([sum(nsyn) for nsyn in list(segNumSyn.values())])
+                        orig = expected * scaleNumSyn
+                        scaled = np.round(orig).astype(int)
 
                         # if missing syns due to rescaling to 0, find top values which were rounded to 0 and make 1
-                        if totSynRescale < len(conns):  
-                            extraSyns = len(conns)-totSynRescale
-                            diffList = sorted(diffList, key=lambda l:l[0], reverse=True)
-                            for i in range(min(extraSyns, len(diffList))):
-                                sec = diffList[i][1]
-                                seg = diffList[i][2]
-                                segNumSyn[sec][seg] += 1
+                        if scaled.sum() < len(conns):  
+                            diff = orig - scaled
+                            diffInds = np.where(diff > 0)[0]
+                            diffInds = diffInds[np.argsort(-diff[diffInds], kind='mergesort')]  # stable, so ties keep segment order
+                            scaled[diffInds[:len(conns) - scaled.sum()]] += 1
 
                         # convert to list so can serialize and save
                         subConnParam['density']['gridY'] = list(subConnParam['density']['gridY'])
                         subConnParam['density']['gridValues'] = list(subConnParam['density']['gridValues']) 
 
-                        newSecs, newLocs = [], []
-                        for sec, nsyns in segNumSyn.items():
-                            for i, seg in enumerate(postCell.secs[sec]['hObj']):
-                                for isyn in range(nsyns[i]):
-                                    newSecs.append(sec)
-                                    newLocs.append(seg.x)
+                        newSecs = [segSecs[i] for i in np.repeat(np.arange(len(segSecs)), scaled)]
+                        newLocs = np.repeat(segXs, scaled).tolist()
+
 
+                    # Distance-based: all synapses placed in the segment closest to the target distance from a reference segment
+                    elif density == 'distance' or (isinstance(density, dict) and density.get('type') == 'distance'):
+                        densityParams = density if isinstance(density, dict) else {}
 
-                    # Distance-based
-                    elif subConnParam.get('density', None) == 'distance':
                         # find origin section 
-                        if 'soma' in postCell.secs: 
+                        if densityParams.get('ref_sec') in postCell.secs:
+                            secOrig = densityParams['ref_sec']
+                        elif 'soma' in postCell.secs: 
                             secOrig = 'soma' 
                         elif any([secName.startswith('som') for secName in list(postCell.secs.keys())]):
-                            secOrig = next(secName for secName in list(postCell.secs.keys()) if secName.startswith('soma'))
+                            secOrig = next(secName for secName in list(postCell.secs.keys()) if secName.startswith('som'))
                         else: 
                             secOrig = list(postCell.secs.keys())[0]
 
-                        #print self.fromtodistance(postCell.secs[secOrig](0.5), postCell.secs['secs'][conn['sec']](conn['loc']))
-
-                        # different case if has vs doesn't have 3d points
-                        #  h.distance(sec=h.soma[0], seg=0)
-                        # for sec in apical:
-                        #    print h.secname()
-                        #    for seg in sec:
-                        #      print seg.x, h.distance(seg.x)
+                        segSecs, segXs, dists = self._segmentDistances(postCell, secList, secOrig, densityParams.get('ref_seg', 0.5),
+                            densityParams.get('coord', 'path'))
+                        if len(segSecs):
+                            iseg = int(np.argmin(np.abs(dists - densityParams.get('target_distance', 0))))
+                            newSecs, newLocs = [segSecs[iseg]] * len(conns), [float(segXs[iseg])] * len(conns)
+                        else:
+                            newSecs, newLocs = [], []
 
                     for i,(conn, newSec, newLoc) in enumerate(zip(conns, newSecs, newLocs)):
 
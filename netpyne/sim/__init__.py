@@ -29,26 +29,27 @@ from neuron import h
 
 # import setup functions
 from .setup import initialize, setNet, setNetParams, setSimCfg, createParallelContext, \
-	readCmdLineArgs, setupRecording, setupRecordLFP, setGlobals
+	readCmdLineArgs, setupRecording, setupRecordLFP, setupRecordSpikeStats, setupRecordTracesBuffer, setGlobals
 
 # import run functions
-from .run import preRun, runSim, runSimWithIntervalFunc, loadBalance, calculateLFP
+from .run import preRun, runSim, runSimWithIntervalFunc, loadBalance, calculateLFP, recordSpikeStats, _resetSpikeStats, \
+	recordTracesBuffer, _resetTracesBuffer, _flushTracesBuffer
 
 # import gather functions
-from .gather import gatherData, _gatherAllCellTags, _gatherAllCellConnPreGids, _gatherCells, fileGather
+from .gather import gatherData, _gatherAllCellTags, _gatherAllCellConnPreGids, _gatherCells, _gatherSpikeStats, _finalizeTracesBuffer, _gatherInstrumentation, fileGather
 
 # import saving functions
-from .save import saveJSON, saveData, distributedSaveHDF5, compactConnFormat, intervalSave, saveInNode
+from .save import saveJSON, saveData, distributedSaveHDF5, compactConnFormat, intervalSave, intervalStream, finalizeStream, saveInstrumentation, saveNetCache, saveInNode
 
 # import loading functions
-from .load import loadSimCfg, loadNetParams, loadNet, loadSimData, loadAll, loadHDF5, ijsonLoad
+from .load import loadSimCfg, loadNetParams, loadNet, loadSimData, loadStreamData, loadTracesBuffer, loadNetCache, loadAll, loadHDF5, ijsonLoad
 
 # import utils functions (general)
-from .utils import cellByGid, getCellsList, timing, version, gitChangeset, hashStr, hashList,\
+from .utils import cellByGid, getCellsList, timing, instrument, version, gitChangeset, hashStr, hashList,\
 	_init_stim_randomizer, unique, checkMemory 
 
 # import utils functions to manipulate objects
-from .utils import copyReplaceItemObj, copyRemoveItemObj, replaceFuncObj, replaceDictODict, \
+from .utils import copyReplaceItemObj, copyRemoveItemObj, _copyStateObj, _copyStateList, replaceFuncObj, replaceDictODict, \
 	rename, clearObj, clearAll
 
 
@@ -68,14 +69,36 @@ from ..cell import CompartCell, PointCell, NML2Cell, NML2SpikeSource
 # import Network and Pop classes
 from ..network import Network, Pop
 
+# analysis, tests and conversion (and their dependencies eg. matplotlib, pandas, neuroml) are imported on first use
+from .utils import _LazyModule, _lazyFunc
+
 # import analysis-related module
-from .. import analysis
+analysis = _LazyModule('netpyne.analysis', __name__, 'analysis')
 
 # import testing related functions
-from .. import tests
-from ..tests.checks import checkOutput
-from ..tests.tests import SimTestObj
+tests = _LazyModule('netpyne.tests', __name__, 'tests')
+checkOutput = _lazyFunc('netpyne.tests.checks', 'checkOutput', __name__)
+checkImportTime = _lazyFunc('netpyne.tests.checks', 'checkImportTime', __name__)
 
 # import export/import-related functions
-from .. import conversion 
-from ..conversion.neuromlFormat import * 
+conversion = _LazyModule('netpyne.conversion', __name__, 'conversion')
+exportNeuroML2 = _lazyFunc('netpyne.conversion.neuromlFormat', 'exportNeuroML2', __name__)
+importNeuroML2 = _lazyFunc('netpyne.conversion.neuromlFormat', 'importNeuroML2', __name__)
+
+# classes and other names (SimTestObj, names of neuromlFormat) are imported on first access
+_lazyAttrs = {'SimTestObj': 'netpyne.tests.tests'}
+_lazyAttrs.update({name: 'netpyne.conversion.neuromlFormat' for name in ['neuroml', 'pynml', 'pynml_ver', 'StrictVersion', 
+	'min_pynml_ver_required', 'neuromlExists', 'pc', 'pprint', 'pp', 'math', 'OrderedDict', 'specs', 'H', 
+	'DefaultNetworkHandler', 'NetPyNEBuilder']})
+
+if sys.version_info >= (3, 7):
+	def __getattr__(name):
+		if name in _lazyAttrs:
+			import importlib
+			value = getattr(importlib.import_module(_lazyAttrs[name]), name)
+			globals()[name] = value  # next accesses go directly to value
+			return value
+		raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
+else:  # no module __getattr__
+	from ..tests.tests import SimTestObj
+	from ..conversion.neuromlFormat import *
@@ -16,6 +16,8 @@ standard_library.install_aliases()
 import numpy as np
 from ..specs import Dict, ODict
 
+_missingTag = object()  # marks cells without a tag in columnar tables of cell tags
+
 
 #------------------------------------------------------------------------------
 # Gather data from nodes
@@ -28,6 +30,10 @@ def gatherData (gatherLFP = True):
     if sim.rank==0:
         print('\nGathering data...')
 
+    # flush buffered traces and load them into simData
+    if sim.cfg.recordTracesBuffer and getattr(sim, 'traceRecorders', None):
+        _finalizeTracesBuffer()
+
     # flag to avoid saving sections data for each cell (saves gather time and space; cannot inspect cell secs or re-simulate)
     if not sim.cfg.saveCellSecs:
         for cell in sim.net.cells:
@@ -92,7 +98,7 @@ def gatherData (gatherLFP = True):
                             if isinstance(val, dict):
                                 for cell,val2 in val.items():
                                     if isinstance(val2,dict):
-                                        sim.allSimData[key].update(Dict({cell:Dict()}))
+                                        if cell not in sim.allSimData[key]: sim.allSimData[key][cell] = Dict()  # merge if in several nodes (eg. split cells)
                                         for stim,val3 in val2.items():
                                             sim.allSimData[key][cell].update({stim:list(val3)}) # udpate simData dicts which are dicts of dicts of Vectors (eg. ['stim']['cell_1']['backgrounsd']=h.Vector)
                                     else:
@@ -152,7 +158,7 @@ def gatherData (gatherLFP = True):
                             if isinstance(val,dict):
                                 for cell,val2 in val.items():
                                     if isinstance(val2,dict):
-                                        sim.allSimData[key].update(Dict({cell:Dict()}))
+                                        if cell not in sim.allSimData[key]: sim.allSimData[key][cell] = Dict()  # merge if in several nodes (eg. split cells)
                                         for stim,val3 in val2.items():
                                             sim.allSimData[key][cell].update({stim:list(val3)}) # udpate simData dicts which are dicts of dicts of Vectors (eg. ['stim']['cell_1']['backgrounsd']=h.Vector)
                                     else:
@@ -200,7 +206,7 @@ def gatherData (gatherLFP = True):
                     if isinstance(val,dict):
                         for cell,val2 in val.items():
                             if isinstance(val2,dict):
-                                sim.allSimData[key].update(Dict({cell:Dict()}))
+                                if cell not in sim.allSimData[key]: sim.allSimData[key][cell] = Dict()  # merge if in several nodes (eg. split cells)
                                 for stim,val3 in val2.items():
                                     sim.allSimData[key][cell].update({stim:list(val3)}) # udpate simData dicts which are dicts of dicts of Vectors (eg. ['stim']['cell_1']['backgrounsd']=h.Vector)
                             else:
@@ -210,6 +216,15 @@ def gatherData (gatherLFP = True):
                 else:
                     sim.allSimData[key] = val           # update simData dicts which are not Vectors
     
+    # reduce online spike statistics across nodes
+    if sim.cfg.recordSpikeStats and hasattr(sim, 'spikeStats'):
+        spikeStats = _gatherSpikeStats()
+        if sim.rank == 0: sim.allSimData['spikeStats'] = spikeStats
+
+    # collect per-node instrumentation records in master
+    if sim.cfg.instrument:
+        _gatherInstrumentation()
+
     ## Print statistics
     sim.pc.barrier()
     if sim.rank == 0:
@@ -217,7 +232,10 @@ def gatherData (gatherLFP = True):
         if sim.cfg.timing: print(('  Done; gather time = %0.2f s.' % sim.timingData['gatherTime']))
 
         print('\nAnalyzing...')
-        sim.totalSpikes = len(sim.allSimData['spkt'])
+        if 'spikeStats' in sim.allSimData and not sim.spikeStats['keepSpikes']:
+            sim.totalSpikes = int(sum(sim.allSimData['spikeStats']['spkCount']))
+        else:
+            sim.totalSpikes = len(sim.allSimData['spkt'])
         sim.totalSynapses = sum([len(cell['conns']) for cell in sim.net.allCells])
         if sim.cfg.createPyStruct:
             if sim.cfg.compactConnFormat:
@@ -268,7 +286,10 @@ def fileGather (gatherLFP = True):
 
     # iterate through the saved files and concat their data
     fileData = Dict()
-    if sim.rank == 0:
+    if sim.rank == 0 and sim.cfg.intervalStream:
+        fileData = sim.loadStreamData(sim.streamState['prefix'] + '_stream.json')
+        if 't' in sim.simData: fileData['t'] = list(sim.simData['t'])
+    elif sim.rank == 0:
         import re
         if hasattr(sim.cfg, 'intervalFolder'):
             targetFolder = sim.cfg.intervalFolder
@@ -391,6 +412,10 @@ def fileGather (gatherLFP = True):
                 del item
 
     
+    # collect per-node instrumentation records in master
+    if sim.cfg.instrument:
+        _gatherInstrumentation()
+
     ## Print statistics
     sim.pc.barrier()
     if sim.rank == 0:
@@ -438,32 +463,146 @@ def fileGather (gatherLFP = True):
         return sim.allSimData
 
 
+#------------------------------------------------------------------------------
+# Reduce online spike statistics from all nodes (no individual spikes exchanged)
+#------------------------------------------------------------------------------
+def _gatherSpikeStats ():
+    from .. import sim
+    from neuron import h
+
+    sim.recordSpikeStats()  # include spikes recorded after the last event
+    stats = sim.spikeStats
+    maxGid = max(sim.net.gid2lid) if sim.net.gid2lid else -1  # nodes without cells contribute -1
+    numGids = int(sim.pc.allreduce(maxGid, 2)) + 1
+    popHist = stats['popHist']
+
+    # each gid lives on a single node, so summing zero-padded arrays reduces them
+    cellData = np.zeros((5, numGids))
+    cellData[:, stats['gids']] = [stats['popInds']+1, stats['spkCount'], stats['isiCount'], stats['isiMean'], stats['isiM2']]
+    vec = h.Vector(np.concatenate((cellData.ravel(), popHist.ravel())))
+    sim.pc.allreduce(vec, 1)
+    reduced = np.array(vec)
+    popInds, spkCount, isiCount, isiMean, isiM2 = reduced[:5*numGids].reshape(5, numGids)
+    popHist = reduced[5*numGids:].reshape(popHist.shape)
+    popNumCells = np.bincount(popInds.astype(int), minlength=len(stats['popLabels'])+1)[1:]
+
+    tsecs = sim.cfg.duration/1000.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        isiCV = np.where(isiCount > 1, np.sqrt(isiM2/isiCount)/isiMean, np.nan)
+
+    spikeStats = Dict()
+    spikeStats['binSize'] = stats['binSize']
+    spikeStats['spkCount'] = list(spkCount)
+    spikeStats['cellRates'] = list(spkCount/tsecs)
+    spikeStats['isiMean'] = list(isiMean)
+    spikeStats['isiCV'] = list(isiCV)
+    spikeStats['popHist'] = Dict({pop: list(popHist[i]) for i,pop in enumerate(stats['popLabels'])})
+    spikeStats['popRates'] = Dict({pop: popHist[i].sum()/popNumCells[i]/tsecs 
+        for i,pop in enumerate(stats['popLabels']) if popNumCells[i] > 0})
+    return spikeStats
+
+
+#------------------------------------------------------------------------------
+# Flush buffered traces to file and (optionally) load them into simData
+#------------------------------------------------------------------------------
+def _finalizeTracesBuffer ():
+    from .. import sim
+    from .run import _flushTracesBuffer
+
+    bufferParams = sim.cfg.recordTracesBuffer if isinstance(sim.cfg.recordTracesBuffer, dict) else {}
+    for key, recorder in sim.traceRecorders.items():
+        _flushTracesBuffer(recorder)
+        if bufferParams.get('loadAfterRun', True):
+            data = np.fromfile(recorder['filename']).reshape(-1, len(recorder['cellKeys']))
+            for i, (cellKey, secLoc) in enumerate(recorder['cellKeys']):
+                if secLoc is None:
+                    sim.simData[key][cellKey] = np.ascontiguousarray(data[:, i])
+                else:
+                    if cellKey not in sim.simData[key]:
+                        sim.simData[key][cellKey] = {}
+                    sim.simData[key][cellKey][secLoc] = np.ascontiguousarray(data[:, i])
+        elif sim.rank == 0:
+            print('  Traces of %s kept in %s and files of other nodes (%d samples; load with sim.loadTracesBuffer)' % (key, recorder['filename'], recorder['numSamples']))
+
+
 #------------------------------------------------------------------------------
 # Gather tags from cells
 #------------------------------------------------------------------------------
 def _gatherAllCellTags ():
     from .. import sim
 
-    data = [{cell.gid: cell.tags for cell in sim.net.cells}]*sim.nhosts  # send cells data to other nodes
-    gather = sim.pc.py_alltoall(data)  # collect cells data from other nodes (required to generate connections)
-    sim.pc.barrier()
+    # each node sends a compact table of the tags of its cells (instead of a dict of tags for each cell)
+    gather = sim.pc.py_allgather(_cellTagsTable(sim.net.cells))
     allCellTags = {}
-    for dataNode in gather:
-        allCellTags.update(dataNode)
-
-    # clean to avoid mem leaks
-    for node in gather:
-        if node:
-            node.clear()
-            del node
-    for item in data:
-        if item:
-            item.clear()
-            del item
+    for rank, table in enumerate(gather):
+        if rank == sim.rank:
+            allCellTags.update({cell.gid: cell.tags for cell in sim.net.cells})
+        else:
+            allCellTags.update(_cellTagsFromTable(table))
+    del gather
 
     return allCellTags
 
 
+#------------------------------------------------------------------------------
+# Columnar table of cell tags: float tags as arrays, other tags as codes of unique values (-1 if missing)
+#------------------------------------------------------------------------------
+def _cellTagsTable (cells):
+    keys, keysSet = [], set()
+    for cell in cells:
+        for key in cell.tags:
+            if key not in keysSet:
+                keys.append(key)
+                keysSet.add(key)
+
+    columns = {}
+    for key in keys:
+        values = [cell.tags.get(key, _missingTag) for cell in cells]
+        valueTypes = set(type(value) for value in values)
+        if len(valueTypes) == 1 and list(valueTypes)[0] in (float, np.float64):
+            columns[key] = ('float', np.array(values, dtype=np.float64), list(valueTypes)[0] is float)
+        else:
+            uniqueValues, uniqueIndex = [], {}
+            codes = np.empty(len(values), dtype=np.int32)
+            for i, value in enumerate(values):
+                if value is _missingTag:
+                    codes[i] = -1
+                    continue
+                try:
+                    valueKey = (type(value), value)
+                    code = uniqueIndex.get(valueKey)
+                except TypeError:  # unhashable values (eg. params dict) are shared only if same object
+                    valueKey = id(value)
+                    code = uniqueIndex.get(valueKey)
+                if code is None:
+                    code = uniqueIndex[valueKey] = len(uniqueValues)
+                    uniqueValues.append(value)
+                codes[i] = code
+            columns[key] = ('codes', codes, uniqueValues)
+
+    return {'gids': np.array([cell.gid for cell in cells], dtype=np.int64), 'keys': keys, 'columns': columns,
+        'tagsType': type(cells[0].tags) if cells else dict}
+
+
+#------------------------------------------------------------------------------
+# Dict of tags of each cell gid from columnar table of cell tags
+#------------------------------------------------------------------------------
+def _cellTagsFromTable (table):
+    columns = []
+    for key in table['keys']:
+        kind, data, info = table['columns'][key]
+        if kind == 'float':
+            columns.append((key, data.tolist() if info else list(data)))  # python floats or numpy floats as in cells
+        else:
+            columns.append((key, [info[code] if code >= 0 else _missingTag for code in data.tolist()]))
+
+    tagsType = table['tagsType']
+    allCellTags = {}
+    for i, gid in enumerate(table['gids'].tolist()):
+        tags = {key: values[i] for key, values in columns if values[i] is not _missingTag}
+        allCellTags[gid] = tags if tagsType is dict else tagsType(tags)
+    return allCellTags
+
 #------------------------------------------------------------------------------
 # Gather tags from cells
 #------------------------------------------------------------------------------
@@ -530,3 +669,40 @@ def _gatherCells ():
         sim.net.allCells = [c.__getstate__() for c in sim.net.cells]
 
 
+#------------------------------------------------------------------------------
+# Gather instrumentation records from all nodes and save them
+#------------------------------------------------------------------------------
+def _gatherInstrumentation ():
+    from .. import sim
+
+    sim.instrument('stop', 'gatherTime')  # the rest of the gather is only done by master
+    data = [None]*sim.nhosts
+    data[0] = sim.instrumentData['events']
+    gather = sim.pc.py_alltoall(data)
+
+    if sim.rank == 0:
+        events = [event for nodeEvents in gather for event in nodeEvents]
+        if not events: return
+        t0 = min(event['ts'] for event in events)
+        for event in events:
+            event['ts'] -= t0  # times relative to the first recorded phase of any node
+
+        # duration of each phase in each node, and the slowest node; repeated phases (eg. several runs) are 
+        # numbered in order of occurrence in each node ('runTime', 'runTime (2)', ...)
+        summary = ODict()
+        occurrences = {}
+        for event in sorted(events, key=lambda e: e['ts']):
+            occurrence = occurrences[(event['pid'], event['name'])] = occurrences.get((event['pid'], event['name']), 0) + 1
+            phase = event['name'] if occurrence == 1 else '%s (%d)' % (event['name'], occurrence)
+            summary.setdefault(phase, {})[event['pid']] = event['dur']/1e6
+        for phase, durs in summary.items():
+            slowest = max(durs, key=durs.get)
+            summary[phase] = {'min': min(durs.values()), 'max': durs[slowest], 'mean': float(np.mean(list(durs.values()))),
+                'slowestNode': slowest, 'nodes': durs}
+
+        sim.allInstrumentData = {'events': events, 'summary': summary, 'nhosts': sim.nhosts}
+        if sim.cfg.timing and sim.nhosts > 1:
+            print('  Slowest node per phase:')
+            for phase, stats in summary.items():
+                print(('    %s: node %d (%0.2f s; mean %0.2f s)' % (phase, stats['slowestNode'], stats['max'], stats['mean'])))
+        sim.saveInstrumentation()
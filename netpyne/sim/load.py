@@ -268,6 +268,187 @@ def loadSimData (filename, data=None):
     pass
 
 
+#------------------------------------------------------------------------------
+# Load data streamed by each node during the run (see sim.intervalStream)
+#------------------------------------------------------------------------------
+def loadStreamData (filename):
+    import os, json
+    import numpy as np
+
+    # only the rows listed in each node index are read, so data can be loaded while the simulation is still running
+    folder = os.path.dirname(filename)
+    with open(filename, 'r') as fileObj:
+        index = json.load(fileObj)
+
+    simData = Dict({'spkt': [], 'spkid': []})
+    spks, stims, lfps = [], [], []
+    for nodeIndexFile in index['nodes']:
+        try:
+            with open(os.path.join(folder, nodeIndexFile), 'r') as fileObj:
+                nodeIndex = json.load(fileObj)
+        except (IOError, ValueError):  # node has not written any data yet
+            continue
+
+        numSpikes = nodeIndex['spikes']['numSpikes']
+        if numSpikes > 0:
+            spks.append(np.fromfile(os.path.join(folder, nodeIndex['spikes']['file']), dtype=nodeIndex['dtype'], count=2*numSpikes).reshape(numSpikes, 2))
+
+        numStims = nodeIndex['stims']['numSpikes']
+        if numStims > 0:
+            stimLabels = nodeIndex['stims']['stimLabels']
+            rows = np.fromfile(os.path.join(folder, nodeIndex['stims']['file']), dtype=nodeIndex['dtype'], count=3*numStims).reshape(numStims, 3)
+            stims.extend((spkt, int(gid), stimLabels[int(istim)]) for spkt, gid, istim in rows.tolist())
+
+        for key, trace in nodeIndex['traces'].items():
+            if key not in simData: simData[key] = Dict()
+            numCells, numSamples = len(trace['cellKeys']), trace['numSamples']
+            if numCells == 0: continue
+            data = np.fromfile(os.path.join(folder, trace['file']), dtype=nodeIndex['dtype'], count=numSamples*numCells).reshape(numSamples, numCells)
+            for i, cellKey in enumerate(trace['cellKeys']):
+                cellKey, secLoc = (cellKey, None) if isinstance(cellKey, basestring) else cellKey
+                if key == 'dipole':  # total of the cells of each node
+                    values = data[:, i]
+                    if cellKey in simData[key]:
+                        numCommon = min(len(values), len(simData[key][cellKey]))
+                        values = values[:numCommon] + np.array(simData[key][cellKey][:numCommon])
+                    simData[key][cellKey] = values.tolist()
+                elif secLoc is None:
+                    simData[key][cellKey] = data[:, i].tolist()
+                else:
+                    simData[key].setdefault(cellKey, Dict())[secLoc] = data[:, i].tolist()
+
+        for name, array in nodeIndex.get('arrays', {}).items():
+            numCols, numSamples = array['numSites'] * len(array.get('gids', [None])), array['numSamples']
+            data = np.fromfile(os.path.join(folder, array['file']), dtype=nodeIndex['dtype'], count=numSamples*numCols).reshape(numSamples, numCols)
+            if name == 'LFP':  # sum of the cells of each node
+                lfps.append(data)
+            else:
+                if name not in simData: simData[name] = Dict()
+                for i, gid in enumerate(array['gids']):
+                    simData[name][gid] = data[:, i*array['numSites']:(i+1)*array['numSites']]
+
+    if spks:
+        spks = np.concatenate(spks)
+        spks = spks[np.lexsort((spks[:, 1], spks[:, 0]))]  # sort by time (and gid)
+        simData['spkt'], simData['spkid'] = spks[:, 0].tolist(), spks[:, 1].tolist()
+
+    if lfps:
+        numSamples = min(len(lfp) for lfp in lfps)  # nodes may have streamed different num of samples if still running
+        simData['LFP'] = np.sum([lfp[:numSamples] for lfp in lfps], axis=0)
+
+    if stims:
+        simData['stims'] = Dict()
+        for spkt, gid, stimLabel in sorted(stims):
+            simData['stims'].setdefault('cell_%d' % gid, Dict()).setdefault(stimLabel, []).append(spkt)
+
+    return simData
+
+
+#------------------------------------------------------------------------------
+# Load traces recorded with cfg.recordTracesBuffer from the data file of a node (eg. if loadAfterRun is False)
+#------------------------------------------------------------------------------
+def loadTracesBuffer (filename, cellKeys=None):
+    ''' filename: data file of a trace in a node (<filename>_traces_<key>_node_<rank>.dat)
+        cellKeys: cells to load (eg. ['cell_0', 'cell_5']; default: all); the file is memory-mapped, so only 
+        their columns are read
+        returns Dict with the trace of each cell (dict of traces by secLoc if recorded from several sections)'''
+    import os, json
+    import numpy as np
+
+    with open(filename[:-4]+'.json', 'r') as fileObj:
+        index = json.load(fileObj)
+    numCols = len(index['cellKeys'])
+    if numCols == 0 or os.path.getsize(filename) == 0:
+        data = np.zeros((0, numCols))
+    else:
+        data = np.memmap(filename, dtype=index['dtype'], mode='r')
+        data = data[:len(data)//numCols*numCols].reshape(-1, numCols)  # complete samples only (file may still be written)
+
+    traces = Dict()
+    for i, (cellKey, secLoc) in enumerate(index['cellKeys']):
+        if cellKeys is not None and cellKey not in cellKeys: continue
+        if secLoc is None:
+            traces[cellKey] = np.array(data[:, i])
+        else:
+            traces.setdefault(cellKey, Dict())[secLoc] = np.array(data[:, i])
+
+    return traces
+
+
+#------------------------------------------------------------------------------
+# Restore cells, conns and stims of this node from network cache (see sim.saveNetCache)
+#------------------------------------------------------------------------------
+def loadNetCache ():
+    from .. import sim
+    import os, pickle
+
+    # key calculated before creating the network since some params (eg. popParams) are modified while creating it
+    sim.netCacheKey = utils._netCacheKey()
+    cacheParams = sim.cfg.cacheNetwork if isinstance(sim.cfg.cacheNetwork, dict) else {}
+    filename = os.path.join(cacheParams.get('folder', '.netpyne_cache'), 'netcache_%s_node_%d.pkl' % (sim.netCacheKey, sim.rank))
+
+    # gap junctions and shape-based conns create NEURON objects that depend on other nodes, so are always rebuilt
+    if any('gapJunction' in connParam or 'shape' in connParam for connParam in sim.net.params.connParams.values()):
+        if sim.rank == 0: print('  Network cache not used: gap junctions and conn shapes not supported')
+        sim.netCacheKey = None
+        return False
+
+    data = None
+    if os.path.exists(filename):
+        try:
+            with open(filename, 'rb') as fileObj:
+                data = pickle.load(fileObj)
+            if data.get('key') != sim.netCacheKey: data = None
+        except Exception as e:
+            print(('  Unable to read network cache %s: %s' % (filename, e)))
+            data = None
+
+    # all nodes need to restore the network (or all rebuild it if any node has no valid cache)
+    if sim.pc.allreduce(1 if data else 0, 3) < 1:
+        if sim.rank == 0: print('\nNetwork cache not found (key %s); creating network...' % (sim.netCacheKey))
+        return False
+
+    sim.pc.barrier()
+    sim.timing('start', 'createTime')
+    if sim.rank == 0:
+        print(('\nRestoring network of %i cell populations on %i hosts from cache (key %s)...' % (len(data['pops']), sim.nhosts, sim.netCacheKey)))
+
+    sim.net.createPops()
+    for popLabel, popData in data['pops'].items():
+        pop = sim.net.pops[popLabel]
+        pop.cellGids = popData['cellGids']
+        pop._localGids = popData['localGids']
+        if popData.get('numCells') is not None: pop.tags['numCells'] = popData['numCells']
+
+    sim.net._compileCellParamsRules()
+    connFormats, stimFormats = data['connFormats'], data['stimFormats']
+    for cellData in data['cells']:
+        # cells created from rules (same as when building the network); conns and stims from cache
+        cell = sim.net.pops[cellData['tags']['pop']].cellModelClass(cellData['gid'], dict(cellData['tags']))
+        cell.conns = [Dict(zip(connFormats[ifmt], values)) for ifmt, values in cellData['conns']]
+        cell.stims = [Dict(zip(stimFormats[ifmt], values)) for ifmt, values in cellData['stims']]
+        sim.net.cells.append(cell)
+    if sim.net.params.defineCellShapes: sim.net.defineCellShapes()
+
+    # create all NEURON Netcons, NetStims, etc
+    if sim.cfg.createNEURONObj:
+        sim.pc.barrier()
+        for cell in sim.net.cells:
+            cell.addStimsNEURONObj()  # add stims first so can then create conns between netstims
+            cell.addConnsNEURONObj()
+
+    sim.net.lastGid, sim.net.lastGapId, sim.nextHost = data['lastGid'], data['lastGapId'], data['nextHost']
+
+    print(('  Number of cells on node %i: %i ' % (sim.rank, len(sim.net.cells))))
+    print(('  Number of connections on node %i: %i ' % (sim.rank, sum([len(cell.conns) for cell in sim.net.cells]))))
+    print(('  Number of stims on node %i: %i ' % (sim.rank, sum([len(cell.stims) for cell in sim.net.cells]))))
+    sim.pc.barrier()
+    sim.timing('stop', 'createTime')
+    if sim.rank == 0 and sim.cfg.timing: print(('  Done; network restore time = %0.2f s.' % sim.timingData['createTime']))
+
+    return True
+
+
 #------------------------------------------------------------------------------
 # Load all data in file
 #------------------------------------------------------------------------------
@@ -27,9 +27,10 @@ from . import utils
 def preRun ():
     from .. import sim
 
+    sim.instrument('start', 'preRun')
 
     # set initial v of cells
-    for cell in sim.net.cells:
+    for cell in sim.net.cells + getattr(sim.net, 'splitPieces', []):
        sim.fih.append(h.FInitializeHandler(0, cell.initV))
 
     # cvode variables
@@ -50,6 +51,7 @@ def preRun ():
     sim.pc.set_maxstep(10)
     mindelay = sim.pc.allreduce(sim.pc.set_maxstep(10), 2) # flag 2 returns minimum value
     if sim.rank==0 and sim.cfg.verbose: print(('Minimum delay (time-step for queue exchange) is %.2f'%(mindelay)))
+    sim.net._registerGapJunctionVars()  # gap junction vars of conns added after connectCells
     sim.pc.setup_transfer()  # setup transfer of source_var to target_var
 
     # handler for printing out time during simulation run
@@ -67,7 +69,7 @@ def preRun ():
         rand.Random123_globalindex(int(sim.cfg.rand123GlobalIndex))
 
     # reset all netstim randomizers so runs are always equivalent
-    for cell in sim.net.cells:
+    for cell in sim.net.cells + getattr(sim.net, 'splitPieces', []):
         if cell.tags.get('cellModel') == 'NetStim':
             #cell.hRandom.Random123(sim.hashStr('NetStim'), cell.gid, cell.params['seed'])
             utils._init_stim_randomizer(cell.hRandom, 'NetStim', cell.gid, cell.params['seed'])
@@ -87,6 +89,10 @@ def preRun ():
                     if not isinstance(stim['hObj'].noiseFromRandom, dict):
                         stim['hObj'].noiseFromRandom(stim['hRandom'])
 
+    # spike trains of NetStim stims (if cfg.netStimEvents)
+    if getattr(sim.net, '_netStimEvents', None):
+        sim.net._createNetStimPattern()
+
     # handler for recording LFP
     if sim.cfg.recordLFP:
         def recordLFPHandler():
@@ -96,6 +102,29 @@ def preRun ():
         sim.recordLFPHandler = recordLFPHandler
         sim.fih.append(h.FInitializeHandler(0, sim.recordLFPHandler))  # initialize imemb
 
+    # handler for accumulating spike statistics during the run
+    if sim.cfg.recordSpikeStats:
+        def recordSpikeStatsHandler():
+            if h.t == 0: sim._resetSpikeStats()
+            sim.recordSpikeStats()
+            sim.cvode.event(h.t + sim.spikeStats['interval'], recordSpikeStatsHandler)
+
+        sim.recordSpikeStatsHandler = recordSpikeStatsHandler
+        sim.fih.append(h.FInitializeHandler(1, sim.recordSpikeStatsHandler))
+
+    # handler for flushing buffered traces (sampled by NEURON) to file
+    if sim.cfg.recordTracesBuffer and getattr(sim, 'traceRecorders', None):
+        bufferTime = min(recorder['bufferSize'] for recorder in sim.traceRecorders.values()) * sim.cfg.recordStep
+        def recordTracesBufferHandler():
+            if h.t == 0: sim._resetTracesBuffer()
+            else: sim.recordTracesBuffer()
+            sim.cvode.event(h.t + bufferTime, recordTracesBufferHandler)
+
+        sim.recordTracesBufferHandler = recordTracesBufferHandler
+        sim.fih.append(h.FInitializeHandler(1, sim.recordTracesBufferHandler))
+
+    sim.instrument('stop', 'preRun')
+
 
 #------------------------------------------------------------------------------
 # Run Simulation
@@ -117,7 +146,9 @@ def runSim ():
     h.finitialize(float(sim.cfg.hParams['v_init']))
 
     if sim.rank == 0: print('\nRunning simulation for %s ms...'%sim.cfg.duration)
+    sim.instrument('start', 'psolve')
     sim.pc.psolve(sim.cfg.duration)
+    _instrumentPsolve()
 
     sim.pc.barrier() # Wait for all hosts to get to this point
     sim.timing('stop', 'runTime')
@@ -138,9 +169,11 @@ def runSimWithIntervalFunc (interval, func):
 
     if sim.rank == 0: print('\nRunning with interval func  ...')
 
+    sim.instrument('start', 'psolve')
     while round(h.t) < sim.cfg.duration:
         sim.pc.psolve(min(sim.cfg.duration, h.t+interval))
         func(h.t) # function to be called at intervals
+    _instrumentPsolve()
     
     sim.pc.barrier() # Wait for all hosts to get to this point
     sim.timing('stop', 'runTime')
@@ -149,6 +182,17 @@ def runSimWithIntervalFunc (interval, func):
             (sim.timingData['runTime'], sim.cfg.duration/1000/sim.timingData['runTime'])))
 
 
+#------------------------------------------------------------------------------
+# Record psolve phase with time spent integrating and in spike exchange
+#------------------------------------------------------------------------------
+def _instrumentPsolve ():
+    from .. import sim
+
+    if not sim.cfg.instrument: return
+    # time waiting for other nodes in spike exchange identifies stragglers (low wait) and nodes kept idle (high wait)
+    sim.instrument('stop', 'psolve', stepTime=sim.pc.step_time(), waitTime=sim.pc.wait_time(), sendTime=sim.pc.send_time())
+
+
 #------------------------------------------------------------------------------
 # Calculate LFP (fucntion called at every time step)      
 #------------------------------------------------------------------------------
@@ -167,12 +211,124 @@ def calculateLFP():
         tr = sim.net.recXElectrode.getTransferResistance(gid)  # in MOhm
         ecp = np.dot(tr, im)  # in mV (= R * I = MOhm * nA)
 
-        if sim.cfg.saveLFPCells: 
+        if sim.cfg.saveLFPCells and not getattr(cell, '_splitPiece', False):  # pieces of split cells only add to total LFP
             sim.simData['LFPCells'][gid][saveStep - 1,:] = ecp  # contribution of individual cells (stored optionally)
         
         sim.simData['LFP'][saveStep-1, :] += ecp  # sum of all cells
 
     
+#------------------------------------------------------------------------------
+# Reset online spike statistics
+#------------------------------------------------------------------------------
+def _resetSpikeStats():
+    from .. import sim
+
+    numCells = len(sim.spikeStats['gids'])
+    sim.spikeStats['spkCount'] = np.zeros(numCells)
+    sim.spikeStats['lastSpkt'] = np.full(numCells, np.nan)
+    sim.spikeStats['isiCount'] = np.zeros(numCells)
+    sim.spikeStats['isiMean'] = np.zeros(numCells)
+    sim.spikeStats['isiM2'] = np.zeros(numCells)  # sum of squared deviations from isiMean
+    sim.spikeStats['popHist'][:] = 0
+    sim.spikeStats['readIndex'] = 0
+
+
+#------------------------------------------------------------------------------
+# Update online spike statistics with spikes recorded since last call
+#------------------------------------------------------------------------------
+def recordSpikeStats():
+    from .. import sim
+
+    stats = sim.spikeStats
+    spkt, spkid = sim.simData['spkt'], sim.simData['spkid']
+    numSpks = int(spkt.size())
+    start = stats['readIndex']
+    if numSpks > start and len(stats['gids']) > 0:
+        t = np.array(spkt.c(start, numSpks-1))
+        gids = np.array(spkid.c(start, numSpks-1)).astype(int)
+        inds = np.minimum(np.searchsorted(stats['gids'], gids), len(stats['gids'])-1)
+        local = stats['gids'][inds] == gids  # ignore spikes of gids not in stats (not local cells)
+        t, inds = t[local], inds[local]
+        order = np.lexsort((t, inds))  # group spikes by cell, in time order
+        t, inds = t[order], inds[order]
+
+        # ISIs within this chunk, plus first ISI relative to last spike of previous chunk
+        sameCell = np.concatenate(([False], inds[1:] == inds[:-1]))[:len(inds)]
+        prevt = np.where(sameCell, np.roll(t, 1), stats['lastSpkt'][inds])
+        isi = t - prevt
+        valid = ~np.isnan(isi)
+
+        # merge chunk ISI moments into running mean/M2 (Chan et al. parallel variance)
+        numCells = len(stats['gids'])
+        n_b = np.bincount(inds[valid], minlength=numCells)
+        sum_b = np.bincount(inds[valid], weights=isi[valid], minlength=numCells)
+        sumsq_b = np.bincount(inds[valid], weights=isi[valid]**2, minlength=numCells)
+        upd = n_b > 0
+        n_a, mean_a = stats['isiCount'][upd], stats['isiMean'][upd]
+        n_b, mean_b = n_b[upd], sum_b[upd]/n_b[upd]
+        m2_b = sumsq_b[upd] - n_b*mean_b**2
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        stats['isiMean'][upd] = mean_a + delta*n_b/n
+        stats['isiM2'][upd] += m2_b + delta**2*n_a*n_b/n
+        stats['isiCount'][upd] = n
+
+        # spike counts and last spike time per cell
+        stats['spkCount'] += np.bincount(inds, minlength=numCells)
+        last = np.concatenate((inds[1:] != inds[:-1], [True]))[:len(inds)]
+        stats['lastSpkt'][inds[last]] = t[last]
+
+        # population histograms
+        popHist = stats['popHist']
+        binInds = np.clip((t / stats['binSize']).astype(int), 0, popHist.shape[1]-1)
+        flatInds = stats['popInds'][inds]*popHist.shape[1] + binInds
+        popHist += np.bincount(flatInds, minlength=popHist.size).reshape(popHist.shape)
+
+    # discard individual spikes if not required, so memory stays bounded
+    if stats['keepSpikes']:
+        stats['readIndex'] = numSpks
+    else:
+        spkt.resize(0)
+        spkid.resize(0)
+        stats['readIndex'] = 0
+
+
+#------------------------------------------------------------------------------
+# Reset buffered traces (truncates data files)
+#------------------------------------------------------------------------------
+def _resetTracesBuffer():
+    from .. import sim
+
+    for recorder in sim.traceRecorders.values():
+        recorder['numSamples'] = 0  # samples flushed to file
+        open(recorder['filename'], 'wb').close()
+
+
+#------------------------------------------------------------------------------
+# Flush samples recorded so far of each buffered trace
+#------------------------------------------------------------------------------
+def recordTracesBuffer():
+    from .. import sim
+
+    for recorder in sim.traceRecorders.values():
+        _flushTracesBuffer(recorder)
+
+
+#------------------------------------------------------------------------------
+# Append samples recorded by all vectors of a trace to data file and remove them from the vectors
+#------------------------------------------------------------------------------
+def _flushTracesBuffer(recorder):
+    numRows = min(int(vec.size()) for vec in recorder['hVecs'])  # samples at the time of the flush may not be recorded yet in all vectors
+    if numRows > 0:
+        data = np.empty((numRows, len(recorder['hVecs'])))  # samples x vectors
+        for i, vec in enumerate(recorder['hVecs']):
+            data[:, i] = vec.as_numpy()[:numRows]
+            vec.remove(0, numRows-1)
+        with open(recorder['filename'], 'ab') as fileObj:
+            data.tofile(fileObj)
+        recorder['numSamples'] += numRows
+
+
 #------------------------------------------------------------------------------
 # Calculate and print load balance
 #------------------------------------------------------------------------------
@@ -195,5 +351,44 @@ def loadBalance (printNodeTimes = False):
         print('load_balance:',load_balance)
         print('\nspike exchange time (run_time-comp_time): ', sim.timingData['runTime'] - max_comp_time)
 
+    # save measured cost per cell of each pop, to distribute cells in the next run (see cfg.loadBalanceCells)
+    balanceParams = sim.cfg.loadBalanceCells if isinstance(sim.cfg.loadBalanceCells, dict) else {}
+    if balanceParams.get('saveCosts'):
+        _savePopCellCosts(computation_time, balanceParams['saveCosts'])
+
     return [max_comp_time, min_comp_time, avg_comp_time, load_balance]
 
+
+#------------------------------------------------------------------------------
+# Fit cost per cell of each pop from the computation time of each node
+#------------------------------------------------------------------------------
+def _savePopCellCosts (computation_time, filename):
+    from .. import sim
+    import json
+
+    popLabels = list(sim.net.pops.keys())
+    numLocalCells = [len(pop.cellGids) for pop in sim.net.pops.values()]
+    data = [None]*sim.nhosts
+    data[0] = (computation_time, numLocalCells)
+    gather = sim.pc.py_alltoall(data)
+
+    if sim.rank == 0:
+        times = np.array([node[0] for node in gather])
+        counts = np.array([node[1] for node in gather], dtype=float)  # nodes x pops
+
+        # fit a correction factor of the (scaled) estimated cost of each pop, from node times = counts * pop costs;
+        # regularized towards 1, strongly enough that the ratios of the estimates are kept in the directions 
+        # the node times do not determine (there are usually fewer nodes than pops, and all nodes get similar
+        # proportions of each pop)
+        estCosts = np.array([sim.net._popCellCost(pop) for pop in sim.net.pops.values()]) if hasattr(sim.net, '_cellParamsRules') else np.ones(len(popLabels))
+        estCosts *= times.sum() / max(counts.dot(estCosts).sum(), 1e-12)
+        M = counts * estCosts  # node time contributed by each pop at the estimated costs
+        MtM = M.T.dot(M)
+        lam = 0.1 * max(np.trace(MtM), 1e-12)
+        factors = np.linalg.solve(MtM + lam*np.eye(len(popLabels)), M.T.dot(times) + lam)
+        costs = estCosts * np.maximum(factors, 1e-3)
+
+        with open(filename, 'w') as fileObj:
+            json.dump({'nhosts': sim.nhosts, 'duration': sim.cfg.duration, 'costs': dict(zip(popLabels, costs.tolist()))}, fileObj)
+        print('  Saved measured cost per cell of each pop to %s' % (filename))
+
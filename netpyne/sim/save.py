@@ -24,6 +24,7 @@ except NameError:
 from time import time
 from datetime import datetime
 import pickle as pk
+import numpy as np
 from . import gather
 from . import utils
 
@@ -342,6 +343,274 @@ def intervalSave (t):
             sim.allWeights = []
     
     
+#------------------------------------------------------------------------------
+# Setup per-node stream files (called on first interval of each run)
+#------------------------------------------------------------------------------
+def _setupIntervalStream ():
+    from .. import sim
+    import os, json
+
+    streamParams = sim.cfg.intervalStream if isinstance(sim.cfg.intervalStream, dict) else {}
+    targetFolder = streamParams.get('folder', getattr(sim.cfg, 'intervalFolder', os.path.dirname(sim.cfg.filename)))
+    prefix = os.path.join(targetFolder, streamParams.get('filename', os.path.basename(sim.cfg.filename)))
+
+    if targetFolder and not os.path.exists(targetFolder):
+        try:
+            os.makedirs(targetFolder)
+        except OSError:
+            if not os.path.exists(targetFolder):  # may have been created by another node
+                print(' Could not create target folder: %s' % (targetFolder))
+
+    state = {'prefix': prefix, 't': 0.0, 'numSpikes': 0, 'numStims': 0, 'stimLabels': [], 'traces': {}, 'arrays': {}}
+    state['indexFile'] = '%s_stream_node_%d.json' % (prefix, sim.rank)
+    state['spikesFile'] = '%s_stream_spikes_node_%d.dat' % (prefix, sim.rank)
+    state['stimsFile'] = '%s_stream_stims_node_%d.dat' % (prefix, sim.rank)
+    traceKeys = list(sim.cfg.recordTraces.keys()) + (['dipole'] if sim.cfg.recordDipoles else [])
+    for key in traceKeys:
+        if key in sim.simData:
+            # (cellKey, secLoc) of each Vector; secLoc is None unless the trace is recorded from several sections
+            cellKeys = []
+            for cellKey, value in sim.simData[key].items():
+                if isinstance(value, dict):
+                    cellKeys.extend([cellKey, secLoc] for secLoc, vec in value.items() if not isinstance(vec, dict) and hasattr(vec, 'resize'))
+                elif hasattr(value, 'resize'):
+                    cellKeys.append([cellKey, None])
+            state['traces'][key] = {'file': '%s_stream_traces_%s_node_%d.dat' % (prefix, key, sim.rank), 'cellKeys': cellKeys, 'numSamples': 0}
+
+    # LFP of this node (sum of its cells) and of each cell, as (samples x sites) arrays
+    if sim.cfg.recordLFP and 'LFP' in sim.simData:
+        numSites = sim.simData['LFP'].shape[1]
+        state['arrays']['LFP'] = {'file': '%s_stream_LFP_node_%d.dat' % (prefix, sim.rank), 'numSites': numSites, 'numSamples': 0}
+        if sim.cfg.saveLFPCells and sim.simData.get('LFPCells'):
+            state['arrays']['LFPCells'] = {'file': '%s_stream_LFPCells_node_%d.dat' % (prefix, sim.rank), 'numSites': numSites, 
+                'gids': sorted(sim.simData['LFPCells'].keys()), 'numSamples': 0}
+
+    # truncate files from previous runs
+    for filename in [state['spikesFile'], state['stimsFile']] + [trace['file'] for trace in list(state['traces'].values()) + list(state['arrays'].values())]:
+        open(filename, 'wb').close()
+
+    # global index can be written upfront since node file names are known, so data can be loaded while running
+    if sim.rank == 0:
+        index = {'nhosts': sim.nhosts, 'recordStep': sim.cfg.recordStep, 'duration': sim.cfg.duration, 'complete': False,
+            'nodes': ['%s_stream_node_%d.json' % (os.path.basename(prefix), rank) for rank in range(sim.nhosts)]}
+        with open(prefix + '_stream.json', 'w') as fileObj:
+            json.dump(index, fileObj)
+
+    sim.streamState = state
+
+
+#------------------------------------------------------------------------------
+# Write index of data streamed by this node
+#------------------------------------------------------------------------------
+def _writeStreamNodeIndex (complete=False):
+    from .. import sim
+    import os, json
+
+    state = sim.streamState
+    index = {'node': sim.rank, 't': state['t'], 'complete': complete,
+        'spikes': {'file': os.path.basename(state['spikesFile']), 'numSpikes': state['numSpikes'], 'columns': ['spkt', 'spkid']},
+        'stims': {'file': os.path.basename(state['stimsFile']), 'numSpikes': state['numStims'], 'columns': ['spkt', 'gid', 'stim'], 'stimLabels': state['stimLabels']},
+        'traces': {key: {'file': os.path.basename(trace['file']), 'cellKeys': trace['cellKeys'], 'numSamples': trace['numSamples']}
+            for key, trace in state['traces'].items()},
+        'arrays': {name: dict(array, file=os.path.basename(array['file'])) for name, array in state['arrays'].items()},
+        'dtype': 'float64'}
+
+    # write to temporary file and rename so readers never see a partially written index
+    tmpFile = state['indexFile'] + '.tmp'
+    with open(tmpFile, 'w') as fileObj:
+        json.dump(index, fileObj)
+    os.rename(tmpFile, state['indexFile'])
+
+
+#------------------------------------------------------------------------------
+# Append data recorded in this node to stream files mid run (no gathering)
+#------------------------------------------------------------------------------
+def intervalStream (t):
+    from .. import sim
+
+    if getattr(sim, 'streamState', None) is None or t < sim.streamState['t']:
+        _setupIntervalStream()
+    state = sim.streamState
+
+    # spikes: append (spkt, spkid) rows and empty the vectors
+    numSpikes = int(sim.simData['spkt'].size())
+    if numSpikes > 0:
+        with open(state['spikesFile'], 'ab') as fileObj:
+            np.column_stack((np.array(sim.simData['spkt']), np.array(sim.simData['spkid']))).astype('float64').tofile(fileObj)
+        state['numSpikes'] += numSpikes
+    sim.simData['spkt'].resize(0)
+    sim.simData['spkid'].resize(0)
+
+    # stim spikes: append (spkt, gid, stim index) rows and empty the vectors
+    if 'stims' in sim.simData:
+        rows = []
+        for cellKey, cellStims in sim.simData['stims'].items():
+            gid = float(cellKey.split('_')[-1])
+            for stimLabel, vec in cellStims.items():
+                if vec.size() > 0:
+                    if stimLabel not in state['stimLabels']:
+                        state['stimLabels'].append(stimLabel)
+                    stimTimes = np.array(vec)
+                    rows.append(np.column_stack((stimTimes, np.full(len(stimTimes), gid), np.full(len(stimTimes), float(state['stimLabels'].index(stimLabel))))))
+                    vec.resize(0)
+        if rows:
+            rows = np.concatenate(rows)
+            with open(state['stimsFile'], 'ab') as fileObj:
+                rows.astype('float64').tofile(fileObj)
+            state['numStims'] += len(rows)
+
+    # traces: append samples recorded by all cells as (samples x cells) rows and remove them from the vectors
+    for key, trace in state['traces'].items():
+        vecs = [sim.simData[key][cellKey] if secLoc is None else sim.simData[key][cellKey][secLoc] for cellKey, secLoc in trace['cellKeys']]
+        if not vecs: continue
+        numNew = int(min(vec.size() for vec in vecs))  # sample at t may not be recorded yet in all vectors
+        if numNew > 0:
+            block = np.empty((numNew, len(vecs)))
+            for i, vec in enumerate(vecs):
+                block[:, i] = vec.as_numpy()[:numNew]
+                vec.remove(0, numNew - 1)
+            with open(trace['file'], 'ab') as fileObj:
+                block.tofile(fileObj)
+            trace['numSamples'] += numNew
+
+    # LFP: rows calculated up to the previous recordStep (the one at t may not have been calculated yet)
+    _streamArrays(int(np.floor(t / sim.cfg.recordStep + 1e-9)) - 1)
+
+    state['t'] = float(t)
+    _writeStreamNodeIndex()
+
+
+#------------------------------------------------------------------------------
+# Append rows of LFP arrays up to numRows (all rows if None) to stream files
+#------------------------------------------------------------------------------
+def _streamArrays (numRows=None):
+    from .. import sim
+
+    for name, array in sim.streamState['arrays'].items():
+        totalRows = len(sim.simData['LFP'])
+        end = totalRows if numRows is None else max(min(numRows, totalRows), 0)
+        start = array['numSamples']
+        if end <= start: continue
+        if name == 'LFP':
+            block = sim.simData['LFP'][start:end]
+        else:
+            block = np.hstack([sim.simData['LFPCells'][gid][start:end] for gid in array['gids']])
+        with open(array['file'], 'ab') as fileObj:
+            np.ascontiguousarray(block, dtype='float64').tofile(fileObj)
+        array['numSamples'] = end
+
+
+#------------------------------------------------------------------------------
+# Write remaining data and mark stream as complete
+#------------------------------------------------------------------------------
+def finalizeStream ():
+    from .. import sim
+    from neuron import h
+    import json
+
+    intervalStream(h.t)
+    _streamArrays()
+    _writeStreamNodeIndex(complete=True)
+
+    sim.pc.barrier()  # all node indices written
+    if sim.rank == 0:
+        indexFile = sim.streamState['prefix'] + '_stream.json'
+        with open(indexFile, 'r') as fileObj:
+            index = json.load(fileObj)
+        index['complete'] = True
+        index['t'] = float(h.t)
+        with open(indexFile, 'w') as fileObj:
+            json.dump(index, fileObj)
+        print('  Stream index saved to %s' % (indexFile))
+
+    return sim.streamState['prefix'] + '_stream.json'
+    
+#------------------------------------------------------------------------------
+# Save per-node instrumentation records (chrome trace-event or json summary)
+#------------------------------------------------------------------------------
+def saveInstrumentation (filename=None):
+    from .. import sim
+    import json
+
+    instrumentParams = sim.cfg.instrument if isinstance(sim.cfg.instrument, dict) else {}
+    fileFormat = instrumentParams.get('format', 'chrome')
+    if not filename:
+        filename = instrumentParams.get('filename', sim.cfg.filename + '_instrument')
+    filename = filename if filename.endswith('.json') else filename + '.json'
+
+    if fileFormat == 'chrome':  # load in chrome://tracing or ui.perfetto.dev
+        nodeNames = [{'name': 'process_name', 'ph': 'M', 'pid': rank, 'args': {'name': 'node %d' % rank}} for rank in range(sim.allInstrumentData['nhosts'])]
+        data = {'traceEvents': nodeNames + sim.allInstrumentData['events'], 'displayTimeUnit': 'ms'}
+    else:
+        data = {'nhosts': sim.allInstrumentData['nhosts'], 'summary': sim.allInstrumentData['summary'],
+            'phases': [{'name': e['name'], 'node': e['pid'], 'start': e['ts']/1e6, 'duration': e['dur']/1e6, 'info': e['args']}
+                for e in sim.allInstrumentData['events']]}
+
+    print(('  Saving instrumentation to %s ... ' % (filename)))
+    with open(filename, 'w') as fileObj:
+        json.dump(data, fileObj)
+
+    return filename
+
+
+#------------------------------------------------------------------------------
+# Save cells, conns and stims of each node to network cache (see sim.loadNetCache)
+#------------------------------------------------------------------------------
+def saveNetCache ():
+    from .. import sim
+    import os
+
+    if not getattr(sim, 'netCacheKey', None):
+        return None
+    cacheParams = sim.cfg.cacheNetwork if isinstance(sim.cfg.cacheNetwork, dict) else {}
+    folder = cacheParams.get('folder', '.netpyne_cache')
+    if sim.rank == 0 and not os.path.exists(folder):
+        os.makedirs(folder)
+    sim.pc.barrier()
+
+    sim.timing('start', 'saveNetCacheTime')
+
+    # conns and stims stored as tuples of values, with one tuple of keys for each distinct set of keys
+    def compact(items, formats):
+        compactItems = []
+        for item in items:
+            item = sim.copyRemoveItemObj(item, keystart='h', exclude_list=['hebbwt'])
+            keys = tuple(item.keys())
+            if keys not in formats: formats[keys] = len(formats)
+            compactItems.append((formats[keys], tuple(item.values())))
+        return compactItems
+
+    connFormats, stimFormats = {}, {}
+    cells = []
+    for cell in sim.net.cells:
+        tags = dict(cell.tags)
+        if isinstance(cell, sim.PointCell): tags['params'] = cell.params
+        cells.append({'gid': cell.gid, 'tags': tags, 'conns': compact(cell.conns, connFormats), 'stims': compact(cell.stims, stimFormats)})
+
+    data = {'key': sim.netCacheKey, 'cells': cells,
+        'connFormats': [keys for keys, _ in sorted(connFormats.items(), key=lambda x: x[1])],
+        'stimFormats': [keys for keys, _ in sorted(stimFormats.items(), key=lambda x: x[1])],
+        'pops': {popLabel: {'cellGids': pop.cellGids, 'localGids': getattr(pop, '_localGids', []), 'numCells': pop.tags.get('numCells')}
+            for popLabel, pop in sim.net.pops.items()},
+        'lastGid': sim.net.lastGid, 'lastGapId': sim.net.lastGapId, 'nextHost': sim.nextHost}
+
+    # written to temporary file and renamed so other runs never read a partial cache
+    filename = os.path.join(folder, 'netcache_%s_node_%d.pkl' % (sim.netCacheKey, sim.rank))
+    try:
+        with open(filename + '.tmp', 'wb') as fileObj:
+            pk.dump(data, fileObj, protocol=pk.HIGHEST_PROTOCOL)
+        os.rename(filename + '.tmp', filename)
+    except Exception as e:  # eg. functions in cell tags
+        print(('  Unable to save network cache %s: %s' % (filename, e)))
+        if os.path.exists(filename + '.tmp'): os.remove(filename + '.tmp')
+        filename = None
+
+    sim.timing('stop', 'saveNetCacheTime')
+    if sim.rank == 0 and sim.cfg.timing: print(('  Done; network cache saving time = %0.2f s.' % sim.timingData['saveNetCacheTime']))
+
+    return filename
+
+
 #------------------------------------------------------------------------------
 # Save data in each node
 #------------------------------------------------------------------------------
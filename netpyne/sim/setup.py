@@ -47,6 +47,7 @@ def initialize (netParams = None, simConfig = None, net = None):
     sim.rank = 0  # initialize rank
     sim.nextHost = 0  # initialize next host
     sim.timingData = Dict()  # dict to store timing
+    sim.instrumentData = {'events': [], 'open': {}}  # per-node phase records (see cfg.instrument)
 
     sim.createParallelContext()  # inititalize PC, nhosts and rank
     sim.cvode = h.CVode()
@@ -235,6 +236,64 @@ def setupRecordLFP():
         sim.cvode.use_fast_imem(1)   # make i_membrane_ a range variable
         
 
+#------------------------------------------------------------------------------
+# Setup online spike statistics (per-cell counts, ISI moments, pop histograms)
+#------------------------------------------------------------------------------
+def setupRecordSpikeStats():
+    from .. import sim
+
+    statsParams = sim.cfg.recordSpikeStats if isinstance(sim.cfg.recordSpikeStats, dict) else {}
+    binSize = float(statsParams.get('binSize', 5.0))
+    numBins = int(np.ceil(sim.cfg.duration/binSize))
+    popLabels = list(sim.net.pops.keys())
+    localCells = sorted(sim.net.cells, key=lambda c: c.gid)
+
+    sim.spikeStats = Dict()
+    sim.spikeStats['binSize'] = binSize
+    sim.spikeStats['interval'] = float(statsParams.get('interval', 100.0))
+    sim.spikeStats['keepSpikes'] = statsParams.get('keepSpikes', True)
+    sim.spikeStats['popLabels'] = popLabels
+    sim.spikeStats['gids'] = np.array([c.gid for c in localCells], dtype=int)
+    sim.spikeStats['popInds'] = np.array([popLabels.index(c.tags['pop']) for c in localCells], dtype=int)
+    sim.spikeStats['popHist'] = np.zeros((len(popLabels), numBins))
+    sim._resetSpikeStats()
+
+    if not sim.spikeStats['keepSpikes'] and sim.rank == 0:
+        print('  Note: recordSpikeStats keepSpikes=False; spkt and spkid are cleared during the run, so spike-based analysis (eg. plotRaster) will have no spikes; use simData["spikeStats"] instead')
+
+
+#------------------------------------------------------------------------------
+# Setup buffered recording of traces (flushed to a file of each node)
+#------------------------------------------------------------------------------
+def setupRecordTracesBuffer():
+    from .. import sim
+    import json
+
+    bufferParams = sim.cfg.recordTracesBuffer if isinstance(sim.cfg.recordTracesBuffer, dict) else {}
+    bufferSize = int(bufferParams.get('bufferSize', 1000))
+    filename = bufferParams.get('filename', sim.cfg.filename)
+
+    for key, recorder in list(sim.traceRecorders.items()):
+        if len(recorder['ptrs']) == 0:
+            del sim.traceRecorders[key]
+            continue
+        # sampled by NEURON (pointers kept valid if sections are reallocated, eg. cfg.cache_efficient); vectors are emptied at each flush
+        recorder['hVecs'] = []
+        for ptr in recorder['ptrs']:
+            vec = h.Vector(bufferSize+1).resize(0)
+            vec.record(ptr, sim.cfg.recordStep)
+            recorder['hVecs'].append(vec)
+        del recorder['ptrs']
+        recorder['bufferSize'] = bufferSize
+        recorder['filename'] = '%s_traces_%s_node_%d.dat' % (filename, key, sim.rank)
+
+        # index of columns in data file
+        with open(recorder['filename'][:-4]+'.json', 'w') as fileObj:
+            json.dump({'cellKeys': recorder['cellKeys'], 'recordStep': sim.cfg.recordStep, 'dtype': 'float64'}, fileObj)
+
+    sim._resetTracesBuffer()
+
+
 #------------------------------------------------------------------------------
 # Setup Recording
 #------------------------------------------------------------------------------
@@ -252,6 +311,10 @@ def setupRecording ():
         for gid in recordGidsSpikes:
             sim.pc.spike_record(float(gid), sim.simData['spkt'], sim.simData['spkid']) # -1 means to record from all cells on this node
 
+    # online spike statistics (computed from the spike vectors during the run)
+    if sim.cfg.recordSpikeStats:
+        setupRecordSpikeStats()
+
     # stim spike recording
     if 'plotRaster' in sim.cfg.analysis:
         if isinstance(sim.cfg.analysis['plotRaster'],dict) and 'include' in sim.cfg.analysis['plotRaster']:
@@ -274,7 +337,7 @@ def setupRecording ():
 
     if sim.cfg.recordStim:
         sim.simData['stims'] = Dict()
-        for cell in sim.net.cells:
+        for cell in sim.net.cells + getattr(sim.net, 'splitPieces', []):
             cell.recordStimSpikes()
 
     # intrinsic cell variables recording
@@ -293,9 +356,21 @@ def setupRecording ():
         cellsRecord = utils.getCellsList(sim.cfg.recordCells)+cellsPlot
 
         for key in list(sim.cfg.recordTraces.keys()): sim.simData[key] = Dict()  # create dict to store traces
+        if sim.cfg.recordTracesBuffer:
+            sim.traceRecorders = Dict({key: {'cellKeys': [], 'ptrs': []} for key in sim.cfg.recordTraces})
         for cell in cellsRecord: 
             cell.recordTraces()  # call recordTraces function for each cell
 
+        # pieces of split cells record the traces of their sections (merged with rest of cell when gathering)
+        if getattr(sim.net, 'splitPieces', None):
+            include = list(sim.cfg.recordCells) + list(sim.cfg.analysis.get('plotTraces', {}).get('include', []) if isinstance(sim.cfg.analysis.get('plotTraces'), dict) else [])
+            recordAll = 'all' in include or 'allCells' in include
+            for piece in sim.net.splitPieces:  # (pop, index) conditions require the global cell list, so not supported
+                if recordAll or piece.gid in include or piece.tags['pop'] in include:
+                    piece.recordTraces()
+        if sim.cfg.recordTracesBuffer:
+            setupRecordTracesBuffer()
+
         # record h.t
         if sim.cfg.recordTime and len(sim.simData) > 0:
             try:
@@ -93,6 +93,8 @@ def getCellsList (include, returnGids=False):
 def timing (mode, processName):
     from .. import sim
 
+    instrument(mode, processName)  # per-node record of the same phases
+
     if sim.rank == 0 and sim.cfg.timing:
         if mode == 'start':
             sim.timingData[processName] = time()
@@ -100,6 +102,50 @@ def timing (mode, processName):
             sim.timingData[processName] = time() - sim.timingData[processName]
 
 
+#------------------------------------------------------------------------------
+# Record per-node duration, memory and object counts of a phase (see cfg.instrument)
+#------------------------------------------------------------------------------
+def instrument (mode, phase, **args):
+    from .. import sim
+
+    if not getattr(getattr(sim, 'cfg', None), 'instrument', False): return
+    if not hasattr(sim, 'instrumentData'): sim.instrumentData = {'events': [], 'open': {}}
+
+    if mode == 'start':
+        sim.instrumentData['open'][phase] = time()
+    elif mode == 'stop' and phase in sim.instrumentData['open']:
+        start = sim.instrumentData['open'].pop(phase)
+        end = time()
+        instrumentParams = sim.cfg.instrument if isinstance(sim.cfg.instrument, dict) else {}
+
+        # chrome trace event format (complete event with times in us; one process per node)
+        event = {'name': phase, 'ph': 'X', 'pid': sim.rank, 'tid': 0, 'ts': start*1e6, 'dur': (end-start)*1e6, 'args': dict(args)}
+        event['args']['maxrss'] = _maxMemory()
+        if instrumentParams.get('objectCounts', False):  # iterates over all NEURON sections and objects, so off by default
+            event['args'].update(_objectCounts())
+        sim.instrumentData['events'].append(event)
+
+
+#------------------------------------------------------------------------------
+# Memory high-water mark of this process (in kB)
+#------------------------------------------------------------------------------
+def _maxMemory ():
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:  # not available in Windows
+        return None
+
+
+#------------------------------------------------------------------------------
+# Number of NEURON objects in this process
+#------------------------------------------------------------------------------
+def _objectCounts ():
+    return {'sections': sum(1 for sec in h.allsec()),
+            'netcons': int(h.List('NetCon').count()),
+            'vectors': int(h.List('Vector').count())}
+
+
 #------------------------------------------------------------------------------
 # Print netpyne version
 #------------------------------------------------------------------------------
@@ -146,6 +192,49 @@ def hashList(obj):
     return int(hashlib.md5(array.array(chr(ord('L')), obj)).hexdigest()[0:8],16)
 
 
+#------------------------------------------------------------------------------
+# Canonical string of an object used to hash it (dicts sorted, functions by source)
+#------------------------------------------------------------------------------
+def _hashNormalize(obj):
+    import inspect
+    import numpy as np
+
+    if isinstance(obj, dict):
+        return '{' + ','.join('%r:%s' % (str(k), _hashNormalize(v)) for k,v in sorted(obj.items(), key=lambda x: str(x[0]))) + '}'
+    elif isinstance(obj, (list, tuple)):
+        return '[' + ','.join(_hashNormalize(v) for v in obj) + ']'
+    elif isinstance(obj, np.ndarray):
+        return 'ndarray(%s,%s)' % (obj.dtype, hashlib.md5(np.ascontiguousarray(obj).tobytes()).hexdigest())
+    elif callable(obj) and hasattr(obj, '__code__'):
+        try:
+            return 'func(%s)' % inspect.getsource(obj).strip()
+        except (IOError, OSError, TypeError):  # eg. function defined in interactive session
+            return 'func(%r,%s)' % (obj.__code__.co_code, _hashNormalize(list(obj.__code__.co_consts[1:])))
+    elif isinstance(obj, float):
+        return repr(float(obj))
+    else:
+        return repr(obj)
+
+
+#------------------------------------------------------------------------------
+# Key of network cache: hash of netParams, cfg options used to build the network, num of nodes and version
+#------------------------------------------------------------------------------
+# cfg options read by network/ and cell/ when creating pops, cells, conns, stims and subconns, or splitting cells
+# (options only used for output, recording or running are not included, eg. duration: VecStim trains are 
+# regenerated when cells are restored)
+_netBuildCfgKeys = ['seeds', 'createNEURONObj', 'createPyStruct', 'addSynMechs', 'oneSynPerNetcon', 'allowSelfConns', 
+    'allowConnsWithWeight0', 'distributeSynsUniformly', 'connRandomSecFromList', 'includeParamsLabel', 
+    'pt3dRelativeToCellLocation', 'invertedYCoord', 'netStimEvents', 'loadBalanceCells', 'multisplit', 'cvode_active']
+
+def _netCacheKey():
+    from .. import sim
+    from netpyne import __version__
+
+    netCfg = {k: getattr(sim.cfg, k, None) for k in _netBuildCfgKeys}
+    obj = {'netParams': sim.net.params.__dict__, 'cfg': netCfg, 'nhosts': sim.nhosts, 'version': __version__}
+    return hashlib.md5(_hashNormalize(obj).encode('utf-8')).hexdigest()
+
+
 #------------------------------------------------------------------------------
 # Initialize the stim randomizer
 #------------------------------------------------------------------------------
@@ -254,6 +343,36 @@ def copyRemoveItemObj (obj, keystart,  objCopy='ROOT', exclude_list=[]):
     return objCopy
 
 
+#------------------------------------------------------------------------------
+# Copy of object without NEURON objects (keys starting with 'h', except 'hebbwt') and with NeuroML objects
+# replaced by str, in a single pass (same result as copyRemoveItemObj followed by copyReplaceItemObj)
+#------------------------------------------------------------------------------
+def _copyStateObj (obj):
+    if isinstance(obj, dict):
+        objCopy = {}
+        for key,val in obj.items():
+            if isinstance(val, (dict, list)):
+                objCopy[key] = _copyStateObj(val)
+            elif key[:1] == 'h' and key != 'hebbwt':
+                continue
+            elif key[:7] == 'NeuroML':
+                objCopy[key] = '---Removed_NeuroML_obj---'
+            else:
+                objCopy[key] = val
+        return objCopy
+    elif isinstance(obj, list):
+        return [_copyStateObj(item) if isinstance(item, (dict, list)) else item for item in obj]
+    return obj
+
+
+#------------------------------------------------------------------------------
+# Copy of list of dicts without NEURON objects (eg. conns and stims: mostly flat dicts, with NEURON objects but no NeuroML objects)
+#------------------------------------------------------------------------------
+def _copyStateList (items):
+    return [{key: (_copyStateObj(val) if isinstance(val, (dict, list)) else val) for key,val in item.items()
+        if key[:1] != 'h' or key == 'hebbwt' or isinstance(val, (dict, list))} for item in items]
+
+
 #------------------------------------------------------------------------------
 # Replace item with specific key from dict or list (used to remove h objects)
 #------------------------------------------------------------------------------
@@ -559,3 +678,48 @@ class NpSerializer(json.JSONEncoder):
             return obj.tolist()
         else:
             return super(NpSerializer, self).default(obj)
+
+
+#------------------------------------------------------------------------------
+# Module imported on first access to one of its attributes (eg. sim.analysis)
+#------------------------------------------------------------------------------
+import types
+
+class _LazyModule(types.ModuleType):
+    def __init__(self, name, parentName, attrName):
+        super(_LazyModule, self).__init__(name)
+        self.__dict__['_lazyParent'] = (parentName, attrName)
+
+    def _load(self):
+        import importlib, sys
+        module = importlib.import_module(self.__name__)
+        parentName, attrName = self.__dict__['_lazyParent']
+        setattr(sys.modules[parentName], attrName, module)  # replace proxy so next accesses go directly to module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        return "<lazy module '%s'>" % (self.__name__)
+
+
+#------------------------------------------------------------------------------
+# Function whose module is imported on first call (eg. sim.checkOutput)
+#------------------------------------------------------------------------------
+def _lazyFunc(moduleName, funcName, parentName):
+    def lazyFunc(*args, **kwargs):
+        import importlib, sys
+        func = getattr(importlib.import_module(moduleName), funcName)
+        setattr(sys.modules[parentName], funcName, func)  # replace wrapper so next calls go directly to function
+        return func(*args, **kwargs)
+
+    lazyFunc.__name__ = str(funcName)
+    lazyFunc.__doc__ = 'Imports %s on first call and runs %s' % (moduleName, funcName)
+    return lazyFunc
@@ -24,10 +24,16 @@ def create (netParams=None, simConfig=None, output=False):
     if not simConfig: simConfig = top.simConfig
 
     sim.initialize(netParams, simConfig)  # create network object and set cfg and net params
-    pops = sim.net.createPops()                  # instantiate network populations
-    cells = sim.net.createCells()                 # instantiate network cells based on defined populations
-    conns = sim.net.connectCells()                # create connections between cells based on params
-    stims = sim.net.addStims()                    # add external stimulation to cells (IClamps etc)
+    if sim.cfg.cacheNetwork and sim.loadNetCache():  # restore cells, conns and stims from a previous run with same params
+        pops, cells = sim.net.pops, sim.net.cells
+        conns, stims = [cell.conns for cell in cells], [cell.stims for cell in cells]
+    else:
+        pops = sim.net.createPops()                  # instantiate network populations
+        cells = sim.net.createCells()                 # instantiate network cells based on defined populations
+        conns = sim.net.connectCells()                # create connections between cells based on params
+        stims = sim.net.addStims()                    # add external stimulation to cells (IClamps etc)
+        if sim.cfg.cacheNetwork: sim.saveNetCache()   # save network so next runs can skip building it
+    if sim.cfg.multisplit: sim.net.splitCells()   # split large cells across nodes
     rxd = sim.net.addRxD()                    # add reaction-diffusion (RxD)
     simData = sim.setupRecording()             # setup variables to record for each cell (spikes, V traces, etc)
 
@@ -49,7 +55,11 @@ def simulate ():
 def intervalSimulate (interval):
     ''' Sequence of commands to simulate network '''
     from .. import sim
-    sim.runSimWithIntervalFunc(interval, sim.intervalSave)                      # run parallel Neuron simulation  
+    if sim.cfg.intervalStream:
+        sim.runSimWithIntervalFunc(interval, sim.intervalStream)                # each node appends its data to stream files
+        sim.finalizeStream()
+    else:
+        sim.runSimWithIntervalFunc(interval, sim.intervalSave)                      # run parallel Neuron simulation  
     #this gather is justa merging of files
     sim.fileGather()                  # gather spiking data and cell info from saved file
     
@@ -169,10 +179,15 @@ def createExportNeuroML2 (netParams=None, simConfig=None, reference=None, connec
     if not simConfig: simConfig = top.simConfig
 
     sim.initialize(netParams, simConfig)  # create network object and set cfg and net params
-    pops = sim.net.createPops()                  # instantiate network populations
-    cells = sim.net.createCells()                 # instantiate network cells based on defined populations
-    conns = sim.net.connectCells()                # create connections between cells based on params
-    stims = sim.net.addStims()                    # add external stimulation to cells (IClamps etc)
+    if sim.cfg.cacheNetwork and sim.loadNetCache():  # restore cells, conns and stims from a previous run with same params
+        pops, cells = sim.net.pops, sim.net.cells
+        conns, stims = [cell.conns for cell in cells], [cell.stims for cell in cells]
+    else:
+        pops = sim.net.createPops()                  # instantiate network populations
+        cells = sim.net.createCells()                 # instantiate network cells based on defined populations
+        conns = sim.net.connectCells()                # create connections between cells based on params
+        stims = sim.net.addStims()                    # add external stimulation to cells (IClamps etc)
+        if sim.cfg.cacheNetwork: sim.saveNetCache()   # save network so next runs can skip building it
     rxd = sim.net.addRxD()                    # add reaction-diffusion (RxD)
     simData = sim.setupRecording()              # setup variables to record for each cell (spikes, V traces, etc)
     sim.exportNeuroML2(reference,connections,stimulations,format)     # export cells and connectivity to NeuroML 2 format
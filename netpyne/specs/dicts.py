@@ -33,44 +33,41 @@ class Dict(dict):
         if len(args) > 1:
             raise TypeError('expected at most 1 arguments, got %d' % len(args))
         if args:
-            self.update(self.dotify(args[0]))
+            dict.update(self, args[0])
         if len(kwargs):
-            self.update(self.dotify(kwargs))
-
-    # only called if k not found in normal places
+            dict.update(self, kwargs)
+        for v in dict.values(self):
+            if isinstance(v, _containerTypes):
+                self._dotifyValues()  # only if there are nested dicts or lists (flat dicts are just copied)
+                break
+
+    # convert nested dicts and lists to copies with Dicts (including nested Dicts, as dotify does)
+    def _dotifyValues(self):
+        converted = [(k, self.dotify(v)) for k,v in dict.items(self) if isinstance(v, _containerTypes)]
+        for k,v in converted:
+            dict.__setitem__(self, k, v)
+
+    # only called if k not found in normal places (ie. not a method or class attribute)
     def __getattr__(self, k):
         try:
-            # Throws exception if not in prototype chain
-            return object.__getattribute__(self, k)
-        except AttributeError:
-            try:
-                return self[k]
-            except KeyError:
-                raise AttributeError(k)
+            return self[k]
+        except KeyError:
+            raise AttributeError(k)
 
     def __setattr__(self, k, v):
-        try:
-            # Throws exception if not in prototype chain
-            object.__getattribute__(self, k)
-        except AttributeError:
-            try:
-                self[k] = v
-            except:
-                raise AttributeError(k)
-        else:
+        if k in _dictAttrs:
             object.__setattr__(self, k, v)
+        else:
+            self[k] = v
 
     def __delattr__(self, k):
-        try:
-            # Throws exception if not in prototype chain
-            object.__getattribute__(self, k)
-        except AttributeError:
+        if k in _dictAttrs:
+            object.__delattr__(self, k)
+        else:
             try:
                 del self[k]
             except KeyError:
                 raise AttributeError(k)
-        else:
-            object.__delattr__(self, k)
 
 
     def todict(self):
@@ -89,7 +86,9 @@ class Dict(dict):
 
     def dotify(self, x):
         if isinstance(x, dict):
-            return Dict( (k, self.dotify(v)) for k,v in x.items() )
+            d = Dict()
+            dict.update(d, ((k, self.dotify(v)) for k,v in x.items()))  # values already converted
+            return d
         elif isinstance(x, (list, tuple)):
             return type(x)( self.dotify(v) for v in x )
         else:
@@ -130,6 +129,8 @@ class Dict(dict):
         self.__rename__(*args, **kwargs)
 
     def __missing__(self, key):
+        if key and key[:2] == '__':
+            raise KeyError(key)  # eg. __deepcopy__ or __array__ checks shouldn't add keys
         if key and not key.startswith('_ipython'):
             value = self[key] = Dict()
             return value
@@ -154,20 +155,16 @@ class ODict(OrderedDict):
 
     def __contains__(self, k):
         try:
-            return hasattr(self, k) or dict.__contains__(self, k)
-        except:
+            return dict.__contains__(self, k) or hasattr(type(self), k)
+        except TypeError:
             return False
 
-    # only called if k not found in normal places
+    # only called if k not found in normal places (ie. not a method or class attribute)
     def __getattr__(self, k):
         try:
-            # Throws exception if not in prototype chain
-            return super(ODict, self).__getattr__(k)
-        except AttributeError:
-            try:
-                return super(ODict, self).__getitem__(k)
-            except KeyError:
-                raise AttributeError(k)
+            return dict.__getitem__(self, k)
+        except KeyError:
+            raise AttributeError(k)
 
 
     def __setattr__(self, k, v):
@@ -175,29 +172,19 @@ class ODict(OrderedDict):
             super(ODict, self).__setattr__(k,v)
         else:
             try:
-                super(ODict, self).__setitem__(k,v)
+                self[k] = v
             except:
                 raise AttributeError(k)
 
 
-    def __getitem__(self, k):
-        return super(ODict, self).__getitem__(k)
-
-
-    def __setitem__(self, k, v):
-        super(ODict, self).__setitem__(k,v)
-
     def __delattr__(self, k):
-        try:
-            # Throws exception if not in prototype chain
-            object.__getattribute__(self, k)
-        except AttributeError:
+        if hasattr(type(self), k):
+            object.__delattr__(self, k)
+        else:
             try:
-                super(ODict, self).__delattr__(k)
+                del self[k]
             except KeyError:
                 raise AttributeError(k)
-        else:
-            object.__delattr__(self, k)
 
     def toOrderedDict(self):
         return self.undotify(self)
@@ -266,3 +253,9 @@ class ODict(OrderedDict):
         self = self.fromOrderedDict(d)
 
 
+# ----------------------------------------------------------------------------
+# Types of values converted when creating Dict, and names that are not stored as keys
+# ----------------------------------------------------------------------------
+
+_containerTypes = (dict, list, tuple)
+_dictAttrs = frozenset(dir(Dict))  # methods and attributes (not stored as keys when setting attributes)
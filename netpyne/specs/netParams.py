@@ -24,7 +24,6 @@ from future import standard_library
 standard_library.install_aliases()
 from collections import OrderedDict
 from .dicts import Dict, ODict
-from .. import conversion
 
 # ----------------------------------------------------------------------------
 # PopParams class
@@ -336,6 +335,7 @@ class NetParams (object):
         if not label:
             label = int(self._labelid)
             self._labelid += 1
+        from .. import conversion
         secs, secLists, synMechs, globs = conversion.importCell(fileName, cellName, cellArgs, cellInstance)
         cellRule = {'conds': conds, 'secs': secs, 'secLists': secLists, 'globals': globs}
 
@@ -360,6 +360,7 @@ class NetParams (object):
         return self.cellParams[label]
 
     def importCellParamsFromNet(self, labelList, condsList, fileName, cellNameList, importSynMechs=False):
+        from .. import conversion
         conversion.importCellsFromNet(self, fileName, labelList, condsList, cellNameList, importSynMechs)
         return self.cellParams
 
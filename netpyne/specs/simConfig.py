@@ -53,10 +53,15 @@ class SimConfig (object):
         self.allowSelfConns = False  # allow connections from a cell to itself
         self.allowConnsWithWeight0 = True  # allow connections with weight 0
         self.oneSynPerNetcon = True  # create one individual synapse object for each Netcon (if False, same synpase can be shared)
+        self.netStimEvents = False  # if True, NetStim stims (fixed rate) are replaced by spike trains generated for each synapse (independent Random123 streams) and played by a single PatternStim per node, instead of creating a NetStim and Random per synapse (memory proportional to num of spikes)
         self.saveCellSecs = True  # save all the sections info for each cell (False reduces time+space; available in netParams; prevents re-simulation)
         self.saveCellConns = True  # save all the conns info for each cell (False reduces time+space; prevents re-simulation)
         self.timing = True  # show timing of each process
+        self.instrument = False  # record per-node duration, memory and object counts of each build/run phase and save as chrome trace (eg. {'format': 'chrome'|'json', 'filename': 'sim1_instrument', 'objectCounts': False}; objectCounts adds num of sections, NetCons and Vectors at the end of each phase, which takes time in large models)
         self.saveTiming = False  # save timing data to pickle file
+        self.loadBalanceCells = False  # distribute cells to nodes based on estimated costs (greedy LPT) instead of round-robin (eg. {'weights': {'segment': 1, 'mechanism': 1, 'synapse': 0.5, 'artificial': 0.1}, 'costsFile': 'sim1_costs.json', 'saveCosts': 'sim1_costs.json'})
+        self.cacheNetwork = False  # save cells, conns and stims of each node and restore them in later runs with same netParams, seeds and num of nodes (eg. {'folder': '.netpyne_cache'})
+        self.multisplit = False  # split large compartmental cells across nodes with ParallelContext.multisplit (eg. {'pops': ['PT5B'], 'pieces': 4, 'minCost': 1000})
         self.printRunTime = False  # print run time at interval (in sec) specified here (eg. 0.1)
         self.printPopAvgRates = False  # print population avg firing rates after run
         self.printSynsAfterRule = False  # print total of connections after each conn rule is applied 
@@ -70,6 +75,9 @@ class SimConfig (object):
         self.recordLFP = []  # list of 3D locations to record LFP from
         self.recordDipoles = False # record dipoles
         self.saveLFPCells = False  # Store LFP generate individually by each cell 
+        self.recordSpikeStats = False  # accumulate per-cell spike counts, ISI stats and pop histograms during the run (eg. {'binSize': 5, 'interval': 100, 'keepSpikes': True}); keepSpikes=False clears spkt/spkid during the run
+        self.recordTracesBuffer = False  # append traces of all cells to a file of each node every bufferSize samples, so recorded vectors do not grow with duration (eg. {'bufferSize': 1000, 'loadAfterRun': True}); if loadAfterRun is False, traces are not loaded into simData after the run (load them on demand with sim.loadTracesBuffer('<filename>_traces_<key>_node_<rank>.dat', cellKeys))
+        self.intervalStream = False  # in intervalSimulate, append spikes, traces (incl. nested section traces and dipoles) and LFP of each node to binary files at each interval (and empty the spike and trace vectors) instead of gathering pickles in master (eg. {'folder': 'data', 'filename': 'sim1'})
         self.recordStep = 0.1 # Step size in ms to save data (eg. V traces, LFP, etc)
         self.recordTime = True  # record time step of recording
 
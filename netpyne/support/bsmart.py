@@ -34,6 +34,12 @@ for i in range(freq+1): # Loop over frequencies
     [S,H]=spectrum_AR(A,Z,p,i,fs) # Calculate spectrum
     powspec[i]=abs(S**2) # Calculate and store power
 
+pwcausalr fits all pairs of channels together using the vectorized versions (armorfBatch and spectrumARBatch),
+which run Morf's recursion for all pairs at once and evaluate the spectral matrices for all frequencies at once.
+method='lstsq' uses a faster least-squares AR fit instead, which only agrees with armorf on long stationary series.
+pairwiseGranger returns the same quantities as channel x channel matrices, eg. to compare many populations:
+F,G,I=pairwiseGranger(x,p,fs,freq) # G[i,j,:] is the causality from channel i to channel j
+
 In either case (pwcausalr or spectrum_AR), the smoothness of the spectra is determined by the
 polynomial order p. Larger values of p give less-smooth spectra.
 
@@ -110,7 +116,7 @@ def ckchol(M):
 
 
 def armorf(x,ntrls,npts,p):
-    from scipy import shape, array, matrix, zeros, disp, concatenate, eye, dstack
+    from numpy import shape, array, matrix, zeros, concatenate, eye, dstack
     from numpy import linalg # for inverse and Cholesky factorization;
     import numpy as np
     inv=linalg.inv; # Make name consistent with Matlab
@@ -201,7 +207,7 @@ def armorf(x,ntrls,npts,p):
 # Version: 2010jan18
 
 def spectrum_AR(A,Z,M,f,fs): # Get the spectrum in one specific frequency-f
-    from scipy import eye, size, exp, pi, real, disp
+    from numpy import eye, size, exp, pi, real
     from numpy import linalg; inv=linalg.inv
     N = size(Z,0); H = eye(N,N); # identity matrix
     for m in range(M):
@@ -234,49 +240,193 @@ def spectrum_AR(A,Z,M,f,fs): # Get the spectrum in one specific frequency-f
 # revised Jan. 2006 by Yonghong Chen 
 # Note: remove the ensemble mean before using this code 
 
-def pwcausalr(x,Nr,Nl,porder,fs,freq=0): # Note: freq determines whether the frequency points are calculated or chosen
-    from pylab import size, shape, real, log, conj, zeros, arange, disp, array
-    from numpy import linalg; det=linalg.det
-    import numpy as np # Just for "sum"; can't remember what's wrong with pylab's sum
-    [L,N] = shape(x); #L is the number of channels, N is the total points in every channel 
+def pwcausalr(x,Nr,Nl,porder,fs,freq=0,method='morf'): # Note: freq determines whether the frequency points are calculated or chosen
+    import numpy as np
+    [L,N] = np.shape(x); #L is the number of channels, N is the total points in every channel 
      
     if freq==0: F=timefreq(x[0,:],fs) # Define the frequency points
-    else: F=array(list(range(0,int(freq+1)))) # Or just pick them
-    npts=size(F,0)
-    # Initialize arrays
-    maxindex=np.sum(arange(1,L))
-    pp=zeros((L,npts))
-    # Had these all defined on one line, and stupidly they STAY linked!!
-    cohe=zeros((maxindex,npts))
-    Fy2x=zeros((maxindex,npts))
-    Fx2y=zeros((maxindex,npts))
-    Fxy=zeros((maxindex,npts))
-    index = 0
-
-    for i in range(1,L):
-        for j in range(i+1,L+1):
-            y=zeros((2,N)) # Initialize y
-            index = index + 1; 
-            y[0,:] = x[i-1,:]; 
-            y[1,:] = x[j-1,:];   
-            A2,Z2,tmp = armorf(y,Nr,Nl,porder); #fitting a model on every possible pair 
-            eyx = Z2[1,1] - Z2[0,1]**2/Z2[0,0]; #corrected covariance 
-            exy = Z2[0,0] - Z2[1,0]**2/Z2[1,1]; 
-            f_ind = 0; 
-            for f in F:
-                f_ind = f_ind + 1; 
-                S2,H2 = spectrum_AR(A2,Z2,porder,f,fs); 
-                pp[i-1,f_ind-1] = abs(S2[0,0]*2);      # revised 
-                if (i==L-1) & (j==L):
-                    pp[j-1,f_ind-1] = abs(S2[1,1]*2);  # revised 
-                cohe[index-1,f_ind-1] = real(abs(S2[0,1])**2 / S2[0,0]/S2[1,1]);   
-                Fy2x[index-1,f_ind-1] = log(abs(S2[0,0])/abs(S2[0,0]-(H2[0,1]*eyx*conj(H2[0,1]))/fs)); #Geweke's original measure 
-                Fx2y[index-1,f_ind-1] = log(abs(S2[1,1])/abs(S2[1,1]-(H2[1,0]*exy*conj(H2[1,0]))/fs)); 
-                Fxy[index-1,f_ind-1] = log(abs(S2[0,0]-(H2[0,1]*eyx*conj(H2[0,1]))/fs)*abs(S2[1,1]-(H2[1,0]*exy*conj(H2[1,0]))/fs)/abs(det(S2))); 
+    else: F=np.array(list(range(0,int(freq+1)))) # Or just pick them
+
+    # all pairs (i<j) in the same order as the original nested loops, fitted and evaluated together
+    pairs = [(i,j) for i in range(L) for j in range(i+1,L)]
+    y = np.array([[x[i,:],x[j,:]] for i,j in pairs], dtype=float)
+    cohe,Fx2y,Fy2x,Fxy,S00,S11 = grangerPairs(y,Nr,Nl,porder,fs,F,method) #fitting a model on every possible pair 
+
+    pp = np.zeros((L,len(F)))
+    for index,(i,j) in enumerate(pairs):
+        pp[i,:] = abs(S00[index]*2) # revised 
+        if (i==L-2) & (j==L-1):
+            pp[j,:] = abs(S11[index]*2) # revised 
                 
     return F,pp,cohe,Fx2y,Fy2x,Fxy
 
 
+# Vectorized multivariate AR fitting of many groups of channels at once (eg. all pairs)
+#
+#   x is an array of shape (groups, channels, points), each group fitted with its own AR model
+#   method='morf' runs the same recursion as armorf (same results), with the matrix operations of each
+#   step done for all groups together
+#   method='lstsq' builds the lagged design matrices with stride tricks and solves the least-squares normal
+#   equations of all groups at once; faster, but the estimates only agree with armorf on long stationary series
+#
+#   A has shape (groups, channels, channels*porder), with the same convention as armorf: 
+#      x(t) + A_1*x(t-1) + ... + A_p*x(t-p) = e(t)
+#   Z has shape (groups, channels, channels) and is the covariance of the noise e(t)
+
+def armorfBatch(x,ntrls,npts,porder,method='morf'):
+    import numpy as np
+    x = np.asarray(x, dtype=float)
+    if x.ndim == 2: x = x[None,:,:]
+    if method == 'morf':
+        return _armorfMorfBatch(x,ntrls,npts,porder)
+    elif method != 'lstsq':
+        raise ValueError("Unknown AR fitting method %s (use 'morf' or 'lstsq')" % (method))
+    G,L,N = x.shape
+    
+    # lagged design matrix for each trial: row t holds [x(t-1),...,x(t-p)] of all channels
+    Xs, Ys = [], []
+    for k in range(ntrls):
+        xt = np.ascontiguousarray(x[:,:,k*npts:(k+1)*npts])
+        nrows = npts - porder
+        st = xt.strides
+        lags = np.lib.stride_tricks.as_strided(xt, shape=(G,nrows,porder,L), strides=(st[0],st[2],st[2],st[1]))
+        Xs.append(lags[:,:,::-1,:].reshape(G,nrows,porder*L)) # lag 1 first
+        Ys.append(np.transpose(xt[:,:,porder:], (0,2,1)))
+    X = np.concatenate(Xs, axis=1)
+    Y = np.concatenate(Ys, axis=1)
+
+    # solve the normal equations of all groups at once
+    XtX = np.einsum('gni,gnj->gij', X, X)
+    XtY = np.einsum('gni,gnj->gij', X, Y)
+    B = np.linalg.solve(XtX, XtY) # (groups, channels*porder, channels)
+    E = Y - np.einsum('gni,gij->gnj', X, B)
+    Z = np.einsum('gni,gnj->gij', E, E) / E.shape[1]
+
+    # convert to armorf convention: A_m = -Phi_m, stacked horizontally
+    A = -np.transpose(B.reshape(G,porder,L,L), (0,3,1,2)).reshape(G,L,porder*L)
+    return A, Z
+
+
+# Batched Cholesky factor of matrices M (groups, channels, channels); as ckchol, identity for groups where it fails
+
+def _ckcholBatch(M):
+    import numpy as np
+    try:
+        return np.linalg.cholesky(M)
+    except np.linalg.LinAlgError:
+        return np.array([np.asarray(ckchol(m)) for m in M])
+
+
+# Morf's recursion of armorf for x of shape (groups, channels, points) (real data)
+
+def _armorfMorfBatch(x,ntrls,npts,p):
+    import numpy as np
+    inv = np.linalg.inv
+    T = lambda M: np.swapaxes(M,-1,-2)
+    G,L,N = x.shape
+    trials = [x[:,:,k*npts:(k+1)*npts] for k in range(ntrls)]
+
+    # covariance matrices at lag 0
+    En = sum(xk @ T(xk) for xk in trials)
+    ap = sum(xk[:,:,1:] @ T(xk[:,:,1:]) for xk in trials)
+    bp = sum(xk[:,:,:-1] @ T(xk[:,:,:-1]) for xk in trials)
+    ap = inv(_ckcholBatch(ap/ntrls*(npts-1)))
+    bp = inv(_ckcholBatch(bp/ntrls*(npts-1)))
+
+    pf = pb = pfb = 0
+    for xk in trials:
+        efp = ap @ xk[:,:,1:]
+        ebp = bp @ xk[:,:,:-1]
+        pf = pf + efp @ T(efp)
+        pb = pb + ebp @ T(ebp)
+        pfb = pfb + efp @ T(ebp)
+
+    En = _ckcholBatch(En/N) # covariance of the noise
+
+    # coefficients of the forward and backward prediction errors: a[:,i] is the matrix of lag i
+    a = ap[:,None]
+    b = bp[:,None]
+    zero = np.zeros((G,1,L,L))
+    for m in range(p):
+        # next order reflection (parcor) coefficient
+        ck = inv(_ckcholBatch(pf)) @ pfb @ inv(T(_ckcholBatch(pb)))
+        ef = np.eye(L) - ck @ T(ck)
+        eb = np.eye(L) - T(ck) @ ck
+        cef = _ckcholBatch(ef)
+        En = En @ cef # update the prediction error
+
+        # update the coefficients
+        aprev = np.concatenate((a, zero), axis=1)
+        bprev = np.concatenate((b, zero), axis=1)
+        a = inv(cef)[:,None] @ (aprev - ck[:,None] @ bprev[:,::-1])
+        b = inv(_ckcholBatch(eb))[:,None] @ (bprev - T(ck)[:,None] @ aprev[:,::-1])
+
+        # update the forward and backward prediction errors
+        pf = pb = pfb = 0
+        for xk in trials:
+            efp = sum(a[:,i] @ xk[:,:,m+2-i:npts-i] for i in range(m+2))
+            ebp = sum(b[:,m+1-i] @ xk[:,:,m+1-i:npts-i-1] for i in range(m+2))
+            pf = pf + efp @ T(efp)
+            pb = pb + ebp @ T(ebp)
+            pfb = pfb + efp @ T(ebp)
+
+    A = np.concatenate([inv(a[:,0]) @ a[:,j+1] for j in range(p)], axis=2)
+    return A, En @ T(En)
+
+
+# Spectral matrices of many AR models evaluated at all frequencies at once (batched spectrum_AR)
+#   returns S and H with shape (groups, freqs, channels, channels)
+
+def spectrumARBatch(A,Z,M,F,fs):
+    import numpy as np
+    G,N,_ = A.shape
+    F = np.asarray(F, dtype=float)
+    Am = np.transpose(A.reshape(G,N,M,N), (0,2,1,3)) # (groups, lags, channels, channels)
+    phases = np.exp(-1j*np.outer(F, np.arange(1,M+1))*2*np.pi/fs) # (freqs, lags)
+    H = np.eye(N) + np.einsum('fm,gmij->gfij', phases, Am)
+    H = np.linalg.inv(H)
+    S = np.einsum('gfij,gjk,gflk->gfil', H, Z, np.conj(H)) / fs
+    return S,H
+
+
+# Coherence and Granger causality of many independent pairs of channels at once
+#   y is an array of shape (pairs, 2, points); returns arrays of shape (pairs, freqs) 
+
+def grangerPairs(y,Nr,Nl,porder,fs,F,method='morf'):
+    import numpy as np
+    A2,Z2 = armorfBatch(y,Nr,Nl,porder,method) 
+    S2,H2 = spectrumARBatch(A2,Z2,porder,F,fs) 
+    S00, S11, S01 = S2[:,:,0,0], S2[:,:,1,1], S2[:,:,0,1]
+    eyx = (Z2[:,1,1] - Z2[:,0,1]**2/Z2[:,0,0])[:,None] #corrected covariance 
+    exy = (Z2[:,0,0] - Z2[:,1,0]**2/Z2[:,1,1])[:,None]
+    Sy2x = S00 - (H2[:,:,0,1]*eyx*np.conj(H2[:,:,0,1]))/fs
+    Sx2y = S11 - (H2[:,:,1,0]*exy*np.conj(H2[:,:,1,0]))/fs
+    cohe = np.real(abs(S01)**2 / S00 / S11)
+    Fy2x = np.log(abs(S00)/abs(Sy2x)) #Geweke's original measure 
+    Fx2y = np.log(abs(S11)/abs(Sx2y))
+    Fxy = np.log(abs(Sy2x)*abs(Sx2y)/abs(np.linalg.det(S2)))
+    return cohe,Fx2y,Fy2x,Fxy,S00,S11
+
+
+# Pairwise Granger causality between all channels
+#   x is a two dimensional matrix whose each row is one variable's time series 
+#   returns F and matrices Fx2y[i,j,:] with the causality from channel i to channel j (diagonal is zero),
+#   and the instantaneous causality Fxy[i,j,:] (symmetric)
+
+def pairwiseGranger(x,porder=10,fs=200,freq=0,Nr=1,method='morf'):
+    import numpy as np
+    x = np.asarray(x, dtype=float)
+    L,N = x.shape
+    F,pp,cohe,Fx2y,Fy2x,Fxy = pwcausalr(x,Nr,N//Nr,porder,fs,freq,method)
+    G = np.zeros((L,L,len(F)))
+    I = np.zeros((L,L,len(F)))
+    for index,(i,j) in enumerate([(i,j) for i in range(L) for j in range(i+1,L)]):
+        G[i,j,:] = Fx2y[index]
+        G[j,i,:] = Fy2x[index]
+        I[i,j,:] = I[j,i,:] = Fxy[index]
+    return F,G,I
+
+
 def granger(vec1,vec2,order=10,rate=200,maxfreq=0):
     """
     GRANGER
@@ -301,7 +451,7 @@ def granger(vec1,vec2,order=10,rate=200,maxfreq=0):
     Version: 2011jul18
     """
     from .bsmart import timefreq, pwcausalr
-    from scipy import array, size
+    from numpy import array, size
     
     if maxfreq==0: F=timefreq(vec1,rate) # Define the frequency points
     else: F=array(list(range(0,maxfreq+1))) # Or just pick them
@@ -14,9 +14,14 @@ from __future__ import division
 from __future__ import unicode_literals
 from __future__ import absolute_import
 
+from collections import OrderedDict
 import numpy as np
 import scipy.signal as sps
 import matplotlib.pyplot as plt
+try:
+  from scipy.fft import next_fast_len
+except ImportError:
+  from scipy.fftpack import next_fast_len
 
 def index2ms (idx, sampr): return 1e3*idx/sampr # index to millisecond; sampr=sampling rate in Hz
 def ms2index (ms, sampr): return int(sampr*ms/1e3) # millisecond to index; sampr=sampling rate in Hz
@@ -60,10 +65,88 @@ def MorletVec (sig, sampr, freq, width, m=None, getphase=False):
   if getphase: return y[i_lower:i_upper], phs[i_lower:i_upper]
   else: return y[i_lower:i_upper]
 
+# cache of Morlet wavelet banks and their spectra (least recently used entries are dropped)
+_morletBankCache = OrderedDict() # (sampr, freqs, width) -> list of wavelets
+_morletSpectraCache = OrderedDict() # (sampr, freqs, width, nfft) -> (spectra, offsets)
+_morletBankCacheSize = 16 # max number of wavelet banks kept
+_morletSpectraCacheSize = 2 # max number of bank spectra kept (each is nfreqs x nfft complex, eg. ~300 MB for long LFPs)
+_morletBatchMemory = 2**28 # max bytes of the (signals x freqs x nfft) complex arrays of each batch in MorletTransform
+
+def _cacheGet (cache, key):
+  if key in cache:
+    cache[key] = cache.pop(key) # move to end (most recently used)
+    return cache[key]
+  return None
+
+def _cacheSet (cache, key, value, size):
+  cache[key] = value
+  while len(cache) > size:
+    cache.popitem(last=False)
+  return value
+
+# return list of Morlet wavelets for each frequency in freqs (cached per sampr, freqs, width)
+def MorletBank (sampr, freqs, width=7.0):
+  key = (float(sampr), tuple(float(f) for f in freqs), float(width))
+  bank = _cacheGet(_morletBankCache, key)
+  if bank is None:
+    bank = _cacheSet(_morletBankCache, key, [Morlet(sampr, freq, width) for freq in freqs], _morletBankCacheSize)
+  return bank
+
+# return FFT of each wavelet in the bank zero-padded to nfft, and index of first valid sample of each convolution
+def MorletBankSpectra (sampr, freqs, width, nfft):
+  key = (float(sampr), tuple(float(f) for f in freqs), float(width), int(nfft))
+  cached = _cacheGet(_morletSpectraCache, key)
+  if cached is None:
+    bank = MorletBank(sampr, freqs, width)
+    spectra = np.zeros((len(bank), nfft), dtype=complex)
+    for j,m in enumerate(bank): spectra[j, :] = np.fft.fft(m, nfft)
+    offsets = np.array([int(np.ceil(len(m) / 2.)) for m in bank]) # same trimming of the full convolution as MorletVec
+    cached = _cacheSet(_morletSpectraCache, key, (spectra, offsets), _morletSpectraCacheSize)
+  return cached
+
+def clearMorletCache ():
+  _morletBankCache.clear()
+  _morletSpectraCache.clear()
+
+# Batched Morlet transform of one or more signals for all frequencies at once
+def MorletTransform (sigs, sampr, freqs, width=7.0, getphase=False, batchSize=None):
+  """ Equivalent to calling MorletVec for each signal and frequency, but each signal is FFT'd once,
+  multiplied by the precomputed bank of wavelet spectra and inverse FFT'd for all frequencies together
+  sigs: input signal (1D) or signals (2D, one per row)
+  sampr: sampling rate (Hz)
+  freqs: frequencies
+  width: number of cycles of Morlet wavelet
+  batchSize: max number of signals transformed together (limits memory; None = as many as fit in _morletBatchMemory)
+  output returned: power (and phase if getphase==True) with shape (signals, freqs, time), or (freqs, time) for 1D input
+  """
+  sigs = np.asarray(sigs, dtype=float)
+  squeeze = sigs.ndim == 1
+  sigs = np.atleast_2d(sigs)
+  nsig, npts = sigs.shape
+  maxlen = max(len(m) for m in MorletBank(sampr, freqs, width))
+  nfft = next_fast_len(npts + maxlen - 1) # long enough for the full linear convolution of all wavelets
+  spectra, offsets = MorletBankSpectra(sampr, freqs, width, nfft)
+  idx = offsets[:, None] + np.arange(npts)[None, :] # valid part of each convolution
+  batchSize = batchSize or max(1, int(_morletBatchMemory // (16 * len(freqs) * nfft)))
+  TFR = np.zeros((nsig, len(freqs), npts))
+  PHS = np.zeros((nsig, len(freqs), npts)) if getphase else None
+  for i in range(0, nsig, batchSize):
+    sigfft = np.fft.fft(sigs[i:i+batchSize], nfft, axis=-1)
+    y = np.fft.ifft(sigfft[:, None, :] * spectra[None, :, :], axis=-1)
+    y = np.take_along_axis(y, np.broadcast_to(idx, (y.shape[0],) + idx.shape), axis=-1)
+    TFR[i:i+batchSize] = (2. * np.abs(y) / sampr)**2.
+    if getphase: PHS[i:i+batchSize] = np.angle(y)
+  if squeeze:
+    TFR = TFR[0]
+    if getphase: PHS = PHS[0]
+  if getphase: return TFR, PHS
+  else: return TFR
+
 # MorletSpec class based on a time series vec tsvec
 class MorletSpec():
-  def __init__ (self, tsvec, sampr, freqmin=1.0, freqmax=250.0, freqstep=1.0, width=7.0, getphase=False, lfreq=None):
+  def __init__ (self, tsvec, sampr, freqmin=1.0, freqmax=250.0, freqstep=1.0, width=7.0, getphase=False, lfreq=None, TFR=None):
     # Get Morlet Spectrogram from time-series (tsvec); lfreq is optional list of frequencies over which to calculate
+    # TFR is optional spectrogram of tsvec already calculated (eg. by MorletTransform for multiple signals at once)
     self.freqmin = freqmin # minimum frequency of analysis
     self.freqmax = freqmax # maximum frequency of analysis
     self.freqstep = freqstep # frequency step for analysis
@@ -75,7 +158,12 @@ class MorletSpec():
       self.f = np.arange(self.freqmin, self.freqmax + 1, self.freqstep) # Array of frequencies over which to calculate
     self.width = width # Number of cycles in wavelet (>5 advisable)
     self.sampr = sampr # sampling rate
-    self.transform(tsvec,getphase) # perform wavelet transform
+    if TFR is None:
+      self.transform(tsvec,getphase) # perform wavelet transform
+    else:
+      self.t = np.linspace(0, 1e3*len(tsvec)/self.sampr, len(tsvec)) # this is in ms
+      self.PHS = None
+      self.TFR = TFR
   def plot_to_ax (self, ax_spec, dt):
     # plots spec to axis
     pc = ax_spec.imshow(self.TFR, aspect='auto', origin='upper', cmap=plt.get_cmap('jet'))
@@ -84,13 +172,10 @@ class MorletSpec():
     # convert timeseries (tsvec) to wavelet spectrogram, optionally save wavelet phase
     sig = sps.detrend(tsvec - np.mean(tsvec)) # subtract mean and (linear) detrend the input time series
     self.t = np.linspace(0, 1e3*len(sig)/self.sampr, len(sig)) # this is in ms
-    self.TFR = np.zeros((len(self.f), len(sig))) # time frequency representation (spectrogram, organized by frequency)
     self.PHS = None # wavelet phase time-series (organized by frequency)
+    # time frequency representation (spectrogram, organized by frequency)
     if getphase:
-      self.PHS = np.zeros((len(self.f), len(sig)))
-      for j,freq in enumerate(self.f):
-        self.TFR[j, :],self.PHS[j, :] = MorletVec(sig, self.sampr, freq, self.width, getphase=True)
+      self.TFR, self.PHS = MorletTransform(sig, self.sampr, self.f, self.width, getphase=True)
     else:
-      for j,freq in enumerate(self.f):
-        self.TFR[j, :] = MorletVec(sig, self.sampr, freq, self.width, getphase=False)
+      self.TFR = MorletTransform(sig, self.sampr, self.f, self.width, getphase=False)
 
@@ -99,4 +99,243 @@ def checkOutput(modelName, verbose=False):
 					print(('\nMismatch: model %s %s is %s but expected value is %s' %(modelName, feature, actual, expected[modelName])))
 					raise
 
-		return True
\ No newline at end of file
+		return True
+
+def checkImportTime(maxTime=None, repeats=3, lazyModules=None, verbose=True):
+	''' Check time to import netpyne.sim in a new process and that lazy modules (analysis, pandas, ...) are not imported'''
+	import sys, json, subprocess
+
+	if lazyModules is None:
+		lazyModules = ['netpyne.analysis', 'netpyne.tests', 'netpyne.conversion.neuromlFormat', 'netpyne.metadata',
+			'matplotlib', 'pandas', 'scipy', 'neuroml']
+
+	script = ('import time, sys, json; start = time.time(); from netpyne import sim; importTime = time.time() - start; '
+		'print(json.dumps({"time": importTime, "modules": [m for m in %s if m in sys.modules]}))' % (json.dumps(lazyModules)))
+
+	# best of several runs in a new process each (so modules are not cached)
+	results = []
+	for i in range(repeats):
+		output = subprocess.check_output([sys.executable, '-c', script, '-nogui'])
+		results.append(json.loads(output.decode('utf-8').strip().splitlines()[-1]))
+	importTime = min(result['time'] for result in results)
+	loadedModules = sorted(set(m for result in results for m in result['modules']))
+
+	if verbose:
+		print(('  Time to import netpyne.sim: %.3f s (best of %d)' % (importTime, repeats)))
+	try:
+		assert not loadedModules
+	except:
+		print(('\nMismatch: modules %s imported by netpyne.sim but expected to be imported on first use' % (loadedModules)))
+		raise
+	if maxTime is not None:
+		try:
+			assert importTime <= maxTime
+		except:
+			print(('\nMismatch: time to import netpyne.sim is %.3f s but expected at most %.3f s' % (importTime, maxTime)))
+			raise
+
+	return importTime
+
+
+def benchmarkDicts(number=100000, repeats=5, maxRatio=None, verbose=True):
+	''' Compare cost of constructing and accessing specs.Dict/ODict against plain dict (eg. conns and stims)'''
+	import timeit
+	from ..specs import Dict, ODict
+
+	conn = {'preGid': 1, 'sec': 'soma', 'loc': 0.5, 'synMech': 'AMPA', 'weight': 0.01, 'delay': 5, 'label': 'E->I'}
+	nestedConn = dict(conn, plast={'mech': 'STDP', 'params': {'hebbwt': 0.01, 'antiwt': -0.01}})
+	dotConn, odict = Dict(nestedConn), ODict(conn)
+
+	# each benchmark compared with the equivalent operation on a plain dict
+	benchmarks = [
+		('construct', lambda: Dict(conn), lambda: dict(conn)),
+		('construct nested', lambda: Dict(nestedConn), lambda: dict(nestedConn)),
+		('construct from Dict', lambda: Dict(dotConn), lambda: dict(dotConn)),
+		('attribute get', lambda: dotConn.weight, lambda: conn['weight']),
+		('item get', lambda: dotConn['weight'], lambda: conn['weight']),
+		('attribute set', lambda: setattr(dotConn, 'weight', 0.01), lambda: conn.__setitem__('weight', 0.01)),
+		('ODict attribute get', lambda: odict.weight, lambda: conn['weight']),
+		('ODict contains', lambda: 'weight' in odict, lambda: 'weight' in conn)]
+
+	results = {}
+	for name, func, dictFunc in benchmarks:
+		t = min(timeit.Timer(func).repeat(repeats, number)) / number
+		tDict = min(timeit.Timer(dictFunc).repeat(repeats, number)) / number
+		results[name] = {'time': t, 'dictTime': tDict, 'ratio': t / tDict}
+		if verbose:
+			print(('  %-20s %8.1f ns  (dict %6.1f ns, x%.1f)' % (name, t*1e9, tDict*1e9, t / tDict)))
+
+	if maxRatio is not None:
+		for name, result in results.items():
+			try:
+				assert result['ratio'] <= maxRatio
+			except:
+				print(('\nMismatch: %s is x%.1f slower than dict but expected at most x%.1f' % (name, result['ratio'], maxRatio)))
+				raise
+
+	return results
+
+
+def checkNegexpStream(mean=5.0, num=2500, blockSize=1000, verbose=True):
+	''' Check block draws of negexp streams (cell.inputs) match drawing one value at a time after setting the distribution,
+	including when the generator was already used (the stream continues instead of restarting from its first value)'''
+	import numpy as np
+	from neuron import h
+	from ..cell.inputs import createNegexpStream
+
+	def drawOneByOne(rand, n):
+		vec = h.Vector(1)
+		rand.negexp(mean)
+		vals = []
+		for i in range(n):
+			vec.setrand(rand)
+			vals.append(vec.x[0])
+		return np.array(vals)
+
+	rand, randRef = h.Random(), h.Random()
+	rand.Random123(1, 2, 3)
+	randRef.Random123(1, 2, 3)
+	for itrain in range(2):  # second train continues the stream of the first one
+		vals = createNegexpStream(rand, mean, num, blockSize=blockSize)
+		valsRef = drawOneByOne(randRef, num)
+		try:
+			assert np.allclose(vals, valsRef)
+		except:
+			print(('\nMismatch: negexp train %d drawn in blocks differs from drawing one value at a time' % (itrain)))
+			raise
+
+	if verbose:
+		print(('  Negexp stream: %d values in blocks of %d match drawing one at a time' % (num, blockSize)))
+	return True
+
+
+def checkSpikeStats(numCells=20, numSpikes=2000, numChunks=7, seed=1, verbose=True):
+	''' Check online spike stats (sim.recordSpikeStats) accumulated over several chunks match the stats of all spikes,
+	ignoring spikes of gids that are not in the stats (not local)'''
+	import numpy as np
+	from neuron import h
+	from .. import sim
+	from ..specs import Dict
+
+	rand = np.random.RandomState(seed)
+	gids = np.arange(numCells) * 3 + 1
+	spkt = np.sort(rand.uniform(0, 1000, numSpikes))
+	spkid = rand.choice(np.concatenate((gids, gids + 1)), numSpikes)  # half of spikes from gids not in stats
+
+	origStats, origSimData = getattr(sim, 'spikeStats', None), getattr(sim, 'simData', None)
+	sim.spikeStats = Dict({'binSize': 5.0, 'keepSpikes': False, 'gids': gids, 'popInds': np.zeros(numCells, dtype=int), 'popHist': np.zeros((1, 200))})
+	sim._resetSpikeStats()
+	sim.simData = Dict({'spkt': h.Vector(), 'spkid': h.Vector()})
+	for chunk in np.array_split(np.arange(numSpikes), numChunks):
+		sim.simData['spkt'].append(h.Vector(spkt[chunk]))
+		sim.simData['spkid'].append(h.Vector(spkid[chunk]))
+		sim.recordSpikeStats()
+	stats = sim.spikeStats
+	sim.spikeStats, sim.simData = origStats, origSimData
+
+	for i, gid in enumerate(gids):
+		isis = np.diff(spkt[spkid == gid])
+		expected = [np.sum(spkid == gid), len(isis), np.mean(isis) if len(isis) else 0, np.sum((isis - isis.mean())**2) if len(isis) else 0]
+		actual = [stats['spkCount'][i], stats['isiCount'][i], stats['isiMean'][i], stats['isiM2'][i]]
+		try:
+			assert np.allclose(actual, expected)
+		except:
+			print(('\nMismatch: spike stats of gid %d are %s but expected %s (count, ISI count, ISI mean, ISI M2)' % (gid, actual, expected)))
+			raise
+	try:
+		assert stats['popHist'].sum() == np.isin(spkid, gids).sum()
+	except:
+		print(('\nMismatch: pop histogram has %d spikes but expected %d' % (stats['popHist'].sum(), np.isin(spkid, gids).sum())))
+		raise
+
+	if verbose:
+		print(('  Spike stats: %d spikes in %d chunks match stats of all spikes' % (numSpikes, numChunks)))
+	return True
+
+
+def checkMultisplit(nhosts=2, mpiCommand='mpiexec', timeout=600, verbose=True):
+	''' Check a network run on several nodes with cells split across nodes (cfg.multisplit) gives the same spikes and
+	recorded NetStim spikes as without splitting (default cfg otherwise, eg. cfg.oneSynPerNetcon)'''
+	import sys, json, shlex, subprocess
+
+	script = '\n'.join([
+		'import sys, json',
+		'from neuron import h; h.nrnmpi_init()',
+		'from netpyne import specs, sim',
+		'netParams, cfg = specs.NetParams(), specs.SimConfig()',
+		'netParams.popParams["E"] = {"cellType": "PYR", "numCells": 8, "cellModel": "HH"}',
+		'netParams.cellParams["PYR"] = {"conds": {"cellType": "PYR"}, "secs": {',
+		'	"soma": {"geom": {"diam": 18.8, "L": 18.8, "nseg": 1}, "mechs": {"hh": {}}},',
+		'	"dend": {"geom": {"diam": 2, "L": 200, "nseg": 5}, "topol": {"parentSec": "soma", "parentX": 1, "childX": 0}, "mechs": {"pas": {"g": 0.0001, "e": -70}}}}}',
+		'netParams.synMechParams["AMPA"] = {"mod": "Exp2Syn", "tau1": 0.1, "tau2": 1.0, "e": 0}',
+		'netParams.stimSourceParams["bkg"] = {"type": "NetStim", "rate": 50, "noise": 0.5}',
+		'netParams.stimTargetParams["bkg->E"] = {"source": "bkg", "conds": {"pop": "E"}, "weight": 0.02, "delay": 2, "synsPerConn": 3, "sec": "dend", "synMech": "AMPA"}',
+		'netParams.connParams["E->E"] = {"preConds": {"pop": "E"}, "postConds": {"pop": "E"}, "probability": 0.5, "weight": 0.005, "delay": 3, "synMech": "AMPA", "sec": "dend"}',
+		'cfg.duration, cfg.recordStim, cfg.verbose = 200, True, False',
+		'cfg.multisplit = {"pieces": 2} if "split" in sys.argv else False',
+		'sim.createSimulateAnalyze(netParams=netParams, simConfig=cfg)',
+		'if sim.rank == 0:',
+		'	stims = {cell: {label: list(spks) for label, spks in cellStims.items()} for cell, cellStims in sim.allSimData["stims"].items()}',
+		'	print("RESULT " + json.dumps({"spkt": list(sim.allSimData["spkt"]), "spkid": list(sim.allSimData["spkid"]), "stims": stims, "split": len(getattr(sim.net, "splitPieces", []))}))',
+		'sim.pc.barrier()',
+		'sim.pc.done()',
+		'h.quit()'])
+
+	results = {}
+	for mode in ['nosplit', 'split']:
+		command = shlex.split(mpiCommand) + ['-n', str(nhosts), sys.executable, '-c', script, mode]
+		output = subprocess.check_output(command, timeout=timeout).decode('utf-8')
+		results[mode] = json.loads(next(line for line in output.splitlines() if line.startswith('RESULT '))[len('RESULT '):])
+
+	try:
+		assert results['split']['split'] > 0
+	except:
+		print(('\nMismatch: no cells were split across %d nodes' % (nhosts)))
+		raise
+	for key in ['spkt', 'spkid', 'stims']:
+		try:
+			assert results['split'][key] == results['nosplit'][key]
+		except:
+			print(('\nMismatch: %s of network with split cells differs from network without splitting' % (key)))
+			raise
+
+	if verbose:
+		print(('  Multisplit: %d spikes on %d nodes match network without splitting' % (len(results['split']['spkt']), nhosts)))
+	return True
+
+
+def checkSurrogate(numInitPoints=6, numIters=20, batchSize=1, seed=1, maxDist=0.05, verbose=True):
+	''' Check the gaussian process surrogate (batch.surrogate.fitGP and proposePoints, used by the bayesian batch method)
+	finds the minimum of a 2D quadratic function'''
+	import numpy as np
+	from ..batch.surrogate import fitGP, predictGP, latinHypercube, proposePoints
+
+	minimum = np.array([0.3, 0.7])
+	func = lambda X: ((np.atleast_2d(X) - minimum)**2 * [1.0, 2.0]).sum(1)
+
+	rand = np.random.RandomState(seed)
+	X = latinHypercube(numInitPoints, 2, rand)
+	y = func(X)
+	for i in range(numIters):
+		newPoints = proposePoints(X, y, batchSize, rand)
+		X, y = np.vstack((X, newPoints)), np.append(y, func(newPoints))
+
+	# model interpolates evaluated points
+	mean, std = predictGP(fitGP(X, y), X)
+	try:
+		assert np.allclose(mean, y, atol=1e-3)
+	except:
+		print(('\nMismatch: gaussian process predictions at evaluated points differ from their fitness by up to %g' % (np.abs(mean - y).max())))
+		raise
+
+	best = X[np.argmin(y)]
+	dist = np.sqrt(((best - minimum)**2).sum())
+	try:
+		assert dist <= maxDist
+	except:
+		print(('\nMismatch: best point found %s is at distance %.3f from minimum %s but expected at most %.3f' % (best, dist, minimum, maxDist)))
+		raise
+
+	if verbose:
+		print(('  Surrogate: minimum of quadratic found at %s (distance %.4f) after %d evaluations' % (best, dist, len(X))))
+	return True